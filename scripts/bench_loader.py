@@ -0,0 +1,55 @@
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add src to path so we can import eval_pipeline
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.loader import load_json, build_eval_input
+from eval_pipeline.targeting import select_target_pair
+
+def bench(conv_raw, context_raw, trusted: bool, iterations: int):
+    """Returns (microseconds per build, bytes allocated per build)."""
+    # Warm up (imports, caches) before measuring
+    for _ in range(10):
+        build_eval_input(conv_raw, context_raw, trusted=trusted)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        data = build_eval_input(conv_raw, context_raw, trusted=trusted)
+        select_target_pair(data.conversation, data.context)
+    elapsed_us = (time.perf_counter() - start) / iterations * 1e6
+
+    tracemalloc.start()
+    build_eval_input(conv_raw, context_raw, trusted=trusted)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_us, peak
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare validated (Pydantic) and trusted (slotted) input construction",
+        epilog="Example: python bench_loader.py --conversation data/mock_conversation.json --context data/mock_context.json"
+    )
+    parser.add_argument("--conversation", type=str, default="data/mock_conversation.json")
+    parser.add_argument("--context", type=str, default="data/mock_context.json")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    # JSON parsing is identical for both paths, so it is done once up front
+    conv_raw = load_json(args.conversation)
+    context_raw = load_json(args.context)
+
+    results = {}
+    for label, trusted in (("validated", False), ("trusted", True)):
+        results[label] = bench(conv_raw, context_raw, trusted, args.iterations)
+        us, peak = results[label]
+        print(f"{label:<10} {us:10.1f} us/input   {peak / 1024:8.1f} KiB peak alloc")
+
+    speedup = results["validated"][0] / results["trusted"][0]
+    print(f"\nTrusted fast path: {speedup:.1f}x faster per input")
+
+if __name__ == "__main__":
+    main()
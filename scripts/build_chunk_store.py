@@ -0,0 +1,56 @@
+import argparse
+import itertools
+import json
+import sys
+from pathlib import Path
+
+# Add src to path so we can import eval_pipeline
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.loader import load_json, normalize_context, iter_corpus
+from eval_pipeline.schemas import ContextChunk
+from eval_pipeline.chunk_store import ChunkArtifactStore
+from eval_pipeline.metrics import relevance, groundedness
+
+def iter_chunks(context_paths, corpus_path):
+    """Yields every chunk (with an id) from context files and/or a JSONL corpus."""
+    payloads = (load_json(p) for p in context_paths)
+    if corpus_path:
+        corpus_payloads = (json.loads(line)["context"] for _, line in iter_corpus(corpus_path))
+        payloads = itertools.chain(payloads, corpus_payloads)
+    for payload in payloads:
+        for chunks in normalize_context(payload).values():
+            for chunk in chunks:
+                if chunk.get("id") is not None:
+                    yield ContextChunk(**chunk)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build a memory-mapped chunk artifact store (token ids, embeddings, hashes)",
+        epilog="Example: python build_chunk_store.py --context \"Sample Inputs/sample_context_vectors-01.json\" --output chunk_store/"
+    )
+    parser.add_argument("--context", type=str, nargs="*", default=[],
+                       help="Context vector JSON files")
+    parser.add_argument("--corpus", type=str, default=None,
+                       help="JSONL corpus whose records' contexts should be included")
+    parser.add_argument("--output", type=str, required=True,
+                       help="Directory to write the store to")
+    args = parser.parse_args()
+
+    if not args.context and not args.corpus:
+        parser.error("at least one of --context or --corpus is required")
+
+    # Token ids come from the NLI tokenizer, since cross-encoder batches are
+    # where padding (and so accurate lengths) matter most.
+    tokenizer = groundedness.get_model().tokenizer
+
+    def tokenize(text):
+        return tokenizer(text, truncation=True)["input_ids"]
+
+    store = ChunkArtifactStore.build(args.output, iter_chunks(args.context, args.corpus),
+                                     encode_fn=relevance.encode_batch, tokenize_fn=tokenize,
+                                     encoder_name=relevance.MODEL_NAME)
+    print(f"✓ Stored {len(store)} chunks ({store.meta['dim']}-d embeddings) in {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Load reports into an indexed SQLite result store and query it.
+
+    python scripts/query_results.py ingest results.db reports.jsonl
+    python scripts/query_results.py query results.db --since 7d --where "groundedness<0.5"
+    python scripts/query_results.py query results.db --chat-id conv_42 --format jsonl
+    python scripts/query_results.py query results.db --status failed --count
+
+Corpus runs can also write the store directly: run_eval.py --output results.db
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add src to path so we can import eval_pipeline
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.aggregate import EvalReport
+from eval_pipeline.loader import iter_corpus
+from eval_pipeline.result_store import ResultStore, SqliteReportSink, parse_filter
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+_TABLE_COLUMNS = ["chat_id", "status", "evaluated_at", "relevance", "completeness", "groundedness", "toxicity"]
+
+def parse_time(text: str) -> float:
+    """Unix time from "1700000000", "2024-05-01[T12:00]" or a relative "7d" / "12h" ago."""
+    text = text.strip()
+    if text and text[-1] in _UNITS and text[:-1].replace(".", "", 1).isdigit():
+        return time.time() - float(text[:-1]) * _UNITS[text[-1]]
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+def cmd_ingest(args):
+    written = skipped = 0
+    started = time.perf_counter()
+    with SqliteReportSink(args.store, batch_size=args.batch_size,
+                          store_reports=not args.no_reports) as sink:
+        for path in args.reports:
+            for line_no, line in iter_corpus(path):
+                try:
+                    sink.write(EvalReport.model_validate_json(line))
+                    written += 1
+                except ValueError as e:
+                    skipped += 1
+                    print(f"  skipping {path}:{line_no + 1}: {e}")
+    elapsed = time.perf_counter() - started
+    print(f"Ingested {written} reports into {args.store} in {elapsed:.2f}s"
+          + (f" ({skipped} skipped)" if skipped else ""))
+
+def cmd_query(args):
+    filters = {
+        "chat_id": args.chat_id,
+        "status": args.status,
+        "tenant": args.tenant,
+        "since": parse_time(args.since) if args.since else None,
+        "until": parse_time(args.until) if args.until else None,
+        "filters": [parse_filter(f) for f in args.where],
+    }
+    with ResultStore(args.store) as store:
+        if args.count:
+            print(store.count(**filters))
+            return
+        query = dict(order_by=args.order_by, descending=args.desc, limit=args.limit, **filters)
+        if args.format == "jsonl":
+            for report in store.reports(**query):
+                print(report.model_dump_json())
+            return
+        columns = args.columns or _TABLE_COLUMNS
+        print("\t".join(columns))
+        for row in store.query(columns=columns, **query):
+            print("\t".join(_cell(name, row[name]) for name in columns))
+
+def _cell(name, value):
+    if value is None:
+        return "-"
+    if name == "evaluated_at":
+        return datetime.fromtimestamp(value).isoformat(timespec="seconds")
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexed local store of evaluation reports")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="Bulk-load JSONL reports into the store")
+    ingest.add_argument("store", type=str, help="SQLite file (created if missing)")
+    ingest.add_argument("reports", type=str, nargs="+", help="JSONL report files")
+    ingest.add_argument("--batch-size", type=int, default=1000, help="Rows per insert transaction")
+    ingest.add_argument("--no-reports", action="store_true",
+                        help="Store the indexed columns only, not the full report JSON")
+    ingest.set_defaults(func=cmd_ingest)
+
+    query = sub.add_parser("query", help="Filter stored reports")
+    query.add_argument("store", type=str)
+    query.add_argument("--chat-id", type=str, default=None)
+    query.add_argument("--status", type=str, default=None, choices=["success", "partial", "skipped", "failed"])
+    query.add_argument("--tenant", type=str, default=None)
+    query.add_argument("--since", type=str, default=None,
+                       help="Evaluated at or after: unix time, ISO date, or relative (30m, 12h, 7d)")
+    query.add_argument("--until", type=str, default=None, help="Evaluated before (same forms as --since)")
+    query.add_argument("--where", type=str, action="append", default=[],
+                       help="Score threshold such as groundedness<0.5 (repeatable, all must hold)")
+    query.add_argument("--order-by", type=str, default="evaluated_at")
+    query.add_argument("--desc", action="store_true")
+    query.add_argument("--limit", type=int, default=None)
+    query.add_argument("--columns", type=str, nargs="+", default=None, help="Columns of the table output")
+    query.add_argument("--count", action="store_true", help="Print the number of matching reports only")
+    query.add_argument("--format", type=str, choices=["table", "jsonl"], default="table",
+                       help="Tab-separated columns, or the full stored reports as JSONL")
+    query.set_defaults(func=cmd_query)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
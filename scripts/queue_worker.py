@@ -0,0 +1,208 @@
+"""
+Queue worker: evaluate records from a durable local queue.
+
+    python scripts/queue_worker.py enqueue --queue evals.db --corpus corpus.jsonl
+    python scripts/queue_worker.py consume --queue evals.db --output reports.jsonl
+    python scripts/queue_worker.py dlq --queue evals.db [--requeue]
+
+Each message is one corpus record ({"conversation": ..., "context": ...}).
+Records with "priority": "urgent" or "flags": ["user_feedback"] / ["safety"]
+are delivered and evaluated ahead of the rest (see scheduling.py).
+"""
+import argparse
+import json
+import signal
+import sys
+import time
+from pathlib import Path
+
+# Add src to path so we can import eval_pipeline
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.aggregate import run_evaluation, warmup
+from eval_pipeline.autotune import configure_engine
+from eval_pipeline.checkpoint import atomic_write_text
+from eval_pipeline.chunk_store import open_store
+from eval_pipeline.consumer import QueueConsumer
+from eval_pipeline.loader import iter_corpus
+from eval_pipeline.scheduling import PRIORITY_CLASSES, RequestScheduler, priority_class
+from eval_pipeline.sinks import open_sink, infer_format
+from eval_pipeline.stack_profiler import MODES as PROFILE_MODES, start_profiling, stop_profiling
+from eval_pipeline.summary import COHORT_KEYS, RunSummary
+from eval_pipeline.tenants import configure_tenants
+from eval_pipeline.transport import SqliteTransport
+
+# Messages are acked once their reports are checkpointed, and a restarted
+# worker must add to the same output: JSON, Parquet, Arrow and .npz output
+# is rewritten per run (or unreadable until closed), so it is not accepted.
+APPENDABLE_FORMATS = ("jsonl", "sqlite")
+
+def line_priority(line: str, override=None) -> int:
+    if override is not None:
+        return PRIORITY_CLASSES.index(override)
+    try:
+        record = json.loads(line)
+    except ValueError:
+        record = None
+    return PRIORITY_CLASSES.index(priority_class(record))
+
+def cmd_enqueue(args):
+    with SqliteTransport(args.queue, queue=args.name) as transport:
+        batch = []
+        priorities = []
+        total = 0
+        for _, line in iter_corpus(args.corpus):
+            batch.append(line)
+            priorities.append(line_priority(line, args.priority))
+            if len(batch) >= 1000:
+                total += transport.publish(batch, priorities)
+                batch, priorities = [], []
+        total += transport.publish(batch, priorities)
+        print(f"✓ Enqueued {total} records ({transport.depth('ready')} ready in '{args.name}')")
+
+def cmd_consume(args):
+    configure_engine(tune=args.autotune, workers=args.workers_per_host)
+    if args.tenants:
+        configure_tenants(args.tenants)
+    if args.chunk_store:
+        open_store(args.chunk_store)
+    if args.warmup:
+        warmup()
+    if args.profile:
+        start_profiling(args.profile_mode, fraction=args.profile_fraction)
+
+    output_path = args.output
+    sink_format = args.format or infer_format(output_path)
+    # Workers restart often; appending keeps reports from earlier runs
+    state_path = None
+    if sink_format == "jsonl":
+        # After a crash, cut the output back to the last checkpoint: reports past
+        # it (and a torn last line) belong to unacked messages, which come back
+        state_path = Path(f"{output_path}.worker.json")
+        if state_path.exists() and Path(output_path).exists():
+            sink_kwargs = {"resume": json.loads(state_path.read_text(encoding='utf-8'))}
+        else:
+            sink_kwargs = {"append": True}
+    else:
+        sink_kwargs = {"synchronous": "FULL"}  # Acked reports must survive a power loss
+    summary = RunSummary(cohort_key=args.cohort_by)
+
+    def evaluate(data):
+        return run_evaluation(data, deadline_ms=args.deadline_ms)
+
+    with SqliteTransport(args.queue, queue=args.name, max_attempts=args.max_attempts,
+                         visibility_timeout=args.visibility_timeout) as transport, \
+            open_sink(output_path, sink_format, **sink_kwargs) as sink:
+        save_state = None
+        if state_path is not None:
+            def save_state(state):
+                atomic_write_text(str(state_path), json.dumps(state))
+            save_state(sink.checkpoint())
+        consumer = QueueConsumer(transport, sink, prefetch=args.prefetch, ack_batch=args.ack_batch,
+                                 trusted=args.trusted_input, evaluate=evaluate, summary=summary,
+                                 scheduler=RequestScheduler(aging_s=args.aging_s), on_checkpoint=save_state)
+        signal.signal(signal.SIGTERM, lambda *_: consumer.stop())
+        signal.signal(signal.SIGINT, lambda *_: consumer.stop())
+
+        print(f"Consuming '{args.name}' from {args.queue} (prefetch {args.prefetch}); Ctrl+C to stop")
+        start = time.perf_counter()
+        stats = consumer.run(max_messages=args.max_messages, idle_timeout=args.idle_timeout)
+        elapsed = time.perf_counter() - start
+        remaining = transport.depth("ready") + transport.depth("inflight")
+        dead = transport.depth("dead")
+
+    print("\n" + "="*60)
+    print("CONSUMER STOPPED")
+    print("="*60)
+    print(f"Processed: {stats.processed} in {elapsed:.1f}s"
+          + (f" ({stats.processed / elapsed:.1f}/s)" if elapsed else ""))
+    for key, value in stats.to_dict().items():
+        print(f"  {key + ':':<20} {value}")
+    print(f"  Remaining in queue:  {remaining} (dead letters: {dead})")
+    print("Queue wait by priority:")
+    for name, wait in consumer.scheduler.to_dict().items():
+        if wait["served"]:
+            print(f"  {name + ':':<8} {wait['served']} served, p50 {wait['wait_p50_ms']:.0f} ms, "
+                  f"p99 {wait['wait_p99_ms']:.0f} ms, max {wait['wait_max_ms']:.0f} ms"
+                  + (f", {wait['aged']} promoted by aging" if wait["aged"] else ""))
+    if args.summary_output:
+        Path(args.summary_output).write_text(summary.to_json(), encoding='utf-8')
+        print(f"✓ Summary saved to: {args.summary_output}")
+    profiler = stop_profiling()
+    if profiler is not None:
+        profiler.write(args.profile)
+        print(f"✓ Profile of {profiler.requests_profiled} of {profiler.requests_seen} requests "
+              f"saved to: {args.profile}")
+
+def cmd_dlq(args):
+    with SqliteTransport(args.queue, queue=args.name) as transport:
+        if args.requeue:
+            print(f"✓ Requeued {transport.requeue_dead()} dead letters")
+            return
+        letters = transport.dead_letters(limit=args.limit)
+        for letter in letters:
+            print(json.dumps({"id": letter["id"], "attempts": letter["attempts"], "error": letter["error"]}))
+        print(f"{transport.depth('dead')} dead letters in '{args.name}'")
+
+def main():
+    parser = argparse.ArgumentParser(description="Durable queue worker for the evaluation pipeline")
+    parser.add_argument("--queue", type=str, default="evals.db", help="SQLite queue file")
+    parser.add_argument("--name", type=str, default="evals", help="Queue name within the file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = sub.add_parser("enqueue", help="Publish every record of a JSONL corpus")
+    enqueue.add_argument("--corpus", type=str, required=True)
+    enqueue.add_argument("--priority", type=str, choices=PRIORITY_CLASSES, default=None,
+                         help="Class of every record (default: from each record's priority / flags)")
+    enqueue.set_defaults(func=cmd_enqueue)
+
+    consume = sub.add_parser("consume", help="Evaluate queued records")
+    consume.add_argument("--output", type=str, default="reports.jsonl")
+    consume.add_argument("--format", type=str, default=None, choices=APPENDABLE_FORMATS,
+                         help="Output format (default: from the --output extension)")
+    consume.add_argument("--summary-output", type=str, default=None)
+    consume.add_argument("--cohort-by", type=str, choices=sorted(COHORT_KEYS), default=None,
+                         help="Also summarize per tenant or per chat_id (one cohort per chat: small runs only)")
+    consume.add_argument("--prefetch", type=int, default=64,
+                         help="Max messages leased but not yet evaluated (bounds memory)")
+    consume.add_argument("--ack-batch", type=int, default=32, help="Messages acked per transaction")
+    consume.add_argument("--max-attempts", type=int, default=3,
+                         help="Deliveries before a failing message is dead-lettered")
+    consume.add_argument("--visibility-timeout", type=float, default=300.0,
+                         help="Seconds before an unacked message is redelivered")
+    consume.add_argument("--max-messages", type=int, default=None)
+    consume.add_argument("--idle-timeout", type=float, default=None,
+                         help="Exit after the queue has been empty this many seconds")
+    consume.add_argument("--deadline-ms", type=float, default=None)
+    consume.add_argument("--trusted-input", action="store_true")
+    consume.add_argument("--chunk-store", type=str, default=None)
+    consume.add_argument("--warmup", action="store_true")
+    consume.add_argument("--autotune", action="store_true",
+                         help="Calibrate batch sizes and threads if this host has no saved profile")
+    consume.add_argument("--workers-per-host", type=int, default=1)
+    consume.add_argument("--aging-s", type=float, default=None,
+                         help="Seconds of waiting that move a request up one priority class "
+                              "(default: config.PRIORITY_AGING_S)")
+    consume.add_argument("--tenants", type=str, default=None,
+                         help="Per-tenant models and thresholds (JSON), re-read when it changes; "
+                              "messages select a tenant with a \"tenant\" field")
+    consume.add_argument("--profile", type=str, default=None,
+                         help="Profile evaluations and write collapsed stacks to this file on exit")
+    consume.add_argument("--profile-mode", type=str, choices=PROFILE_MODES, default="sample")
+    consume.add_argument("--profile-fraction", type=float, default=None,
+                         help="Share of requests to profile (default: config.PROFILE_FRACTION)")
+    consume.set_defaults(func=cmd_consume)
+
+    dlq = sub.add_parser("dlq", help="Inspect or requeue dead letters")
+    dlq.add_argument("--limit", type=int, default=20)
+    dlq.add_argument("--requeue", action="store_true")
+    dlq.set_defaults(func=cmd_dlq)
+
+    args = parser.parse_args()
+    if args.command == "consume" and (args.format or infer_format(args.output)) not in APPENDABLE_FORMATS:
+        parser.error(f"--output must be {' or '.join(APPENDABLE_FORMATS)} (.jsonl, .db), "
+                     f"so reports can be checkpointed before acking and appended to on restart")
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
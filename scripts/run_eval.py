@@ -1,93 +1,590 @@
 import argparse
 import sys
 import json
+import time
+from collections import Counter
 from pathlib import Path
 
 # Add src to path so we can import eval_pipeline
 sys.path.append(str(Path(__file__).parent.parent / "src"))
 
-from eval_pipeline.loader import load_data
-from eval_pipeline.aggregate import run_evaluation
+from eval_pipeline import config
+from eval_pipeline.loader import load_data, iter_corpus_offsets, load_record, iter_input_pairs, load_pair
+from eval_pipeline.prefetch import PrefetchLoader
+from eval_pipeline.aggregate import run_evaluation, warmup, EvalReport
+from eval_pipeline.autotune import configure_engine
+from eval_pipeline.batching import get_padding_stats
+from eval_pipeline.memory import get_tracker, memory_report, set_memory_budget
+from eval_pipeline.models import get_registry
+from eval_pipeline.tenants import configure_tenants, get_tenant
+from eval_pipeline.sinks import RESUMABLE_FORMATS, open_sink, infer_format
+from eval_pipeline.summary import COHORT_KEYS, RunSummary
+from eval_pipeline.chunk_store import open_store
+from eval_pipeline.checkpoint import RunCheckpoint, CompletedIds, CheckpointPolicy
+from eval_pipeline.sharding import ShardPlan, record_key, record_chat_id
+from eval_pipeline.stack_profiler import MODES as PROFILE_MODES, profile_request, profile_stage
+from eval_pipeline.stack_profiler import start_profiling, stop_profiling
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Run LLM Evaluation Pipeline",
-        epilog="Example: python run_eval.py --conversation data/conv.json --context data/ctx.json"
-    )
-    parser.add_argument("--conversation", type=str, required=True, 
-                       help="Path to conversation JSON file")
-    parser.add_argument("--context", type=str, required=True, 
-                       help="Path to context vectors JSON file")
-    parser.add_argument("--output", type=str, required=False, 
-                       help="Path to output JSON report (default: report.json)", 
-                       default="report.json")
-    
-    args = parser.parse_args()
-    
+SINK_FORMATS = ["json", "jsonl", "parquet", "arrow", "npz", "sqlite"]
+
+def print_batching_stats():
+    padding = get_padding_stats()
+    if padding:
+        print("\nBatching (real / padded tokens):")
+        for name, stats in padding.items():
+            print(f"  {name + ':':<14} {stats['padding_efficiency']:.1%} efficient "
+                  f"in {stats['batches']} batches (fixed-size baseline {stats['baseline_padding_efficiency']:.1%})")
+
+def print_engine(engine, profile):
+    print(f"Engine profile for {profile.host} (batch latency target {profile.latency_target_ms:.0f} ms):")
+    for name, settings in engine.batching.items():
+        print(f"  {name + ':':<14} {settings.max_batch_size} inputs, {settings.token_budget} padded tokens per batch")
+    if engine.torch_threads:
+        print(f"  torch threads: {engine.torch_threads}")
+
+def print_memory_stats():
+    memory = memory_report()
+    print("\nMemory:")
+    if memory["rss_mb"] is not None:
+        print(f"  RSS {memory['rss_mb']:.1f} MB, peak {memory['peak_rss_mb']:.1f} MB")
+    for stage, stats in memory["stages"].items():
+        line = f"  {stage + ':':<14} RSS after {stats['max_rss_after_mb']:.1f} MB (+{stats['max_rss_delta_mb']:.1f} MB)"
+        if stats["max_traced_peak_mb"] is not None:
+            line += f", traced peak {stats['max_traced_peak_mb']:.2f} MB"
+        print(line)
+    if memory["cache_mb"]:
+        print("  Caches: " + ", ".join(f"{name} {mb:.2f} MB" for name, mb in memory["cache_mb"].items()))
+    budget = memory["budget"]
+    if budget:
+        print(f"  Budget: {budget['limit_mb']:.0f} MB, enforced {budget['enforcements']} times, "
+              f"evicted {budget['evicted_mb']:.2f} MB" + (" (under pressure)" if budget["under_pressure"] else ""))
+    models = get_registry().stats()
+    if models["loaded"]:
+        print(f"  Models: {len(models['loaded'])} loaded ({models['in_use']} in use), "
+              f"{models['loads']} loads, {models['unloads']} unloads, {models['hits']} shared hits")
+    for label, lines in get_tracker().snapshots.items():
+        print(f"  Top allocations ({label}):")
+        for line in lines[:5]:
+            print(f"    {line}")
+
+def print_score(label: str, value, threshold: float, note: str = ""):
+    if value is None:
+        print(f"  {label:<15}skipped")
+    else:
+        print(f"  {label:<15}{value:.3f} {'✓' if value > threshold else '⚠'}{note}")
+
+def print_summary(summary: RunSummary):
+    overall = summary.overall.describe()
+    print("\nScore distributions:")
+    print(f"  {'metric':<16}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}")
+    for name, stats in overall["metrics"].items():
+        if not stats["count"]:
+            continue
+        fmt = ".2e" if name == "estimated_cost" else ".3f"
+        row = "".join(f"{stats[col]:>10{fmt}}" for col in ("mean", "p50", "p90", "p99"))
+        print(f"  {name:<16}{row}")
+    if overall["toxicity_rate"] is not None:
+        print(f"  Toxicity rate: {overall['toxicity_rate']:.2%}")
+    if summary.cohort_key is not None:
+        print(f"  Cohorts ({summary.cohort_by or 'custom'}): {len(summary.cohorts)}")
+
+class DedupTally:
+    """Chunks sent to NLI and near-duplicates collapsed over a run."""
+
+    def __init__(self):
+        self.checked = 0
+        self.collapsed = 0
+
+    def update(self, report):
+        if report.scores is not None:
+            self.checked += report.scores.groundedness_chunks or 0
+            self.collapsed += report.scores.collapsed_chunks or 0
+
+    def print(self):
+        if self.collapsed:
+            total = self.checked + self.collapsed
+            print(f"  NLI chunks: {self.checked} checked, {self.collapsed} near-duplicates "
+                  f"collapsed ({self.collapsed / total:.1%} of pairs saved)")
+
+def with_tenant(data, args):
+    """Assigns --tenant to inputs that do not name a tenant themselves."""
+    if args.tenant and getattr(data, "tenant", None) is None:
+        data.tenant = args.tenant
+    return data
+
+def run_warmup():
+    print("\nWarming up models...")
+    start = time.perf_counter()
+    try:
+        timings = warmup()
+    except Exception as e:
+        print(f"✗ Warm-up failed: {e}")
+        sys.exit(1)
+    for name, ms in timings.items():
+        print(f"  - {name}: {ms:.0f} ms")
+    print(f"✓ Models ready in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+def run_single(args):
+    """Evaluates one conversation/context pair and writes its report."""
     # Validate input files exist
     conv_path = Path(args.conversation)
     ctx_path = Path(args.context)
-    
+
     if not conv_path.exists():
         print(f"Error: Conversation file not found: {args.conversation}")
         sys.exit(1)
-    
+
     if not ctx_path.exists():
         print(f"Error: Context file not found: {args.context}")
         sys.exit(1)
-    
+
+    if args.warmup:
+        run_warmup()
+
     print(f"Loading data from:\n  Conversation: {args.conversation}\n  Context: {args.context}")
     print("\nNote: First run may take 1-2 minutes to download models (~200MB)")
-    
-    try:
-        data = load_data(args.conversation, args.context)
-        print("✓ Data loaded and validated successfully.")
-    except ValueError as e:
-        print(f"✗ Data validation error: {e}")
-        print("\nTip: Check that your JSON files match the expected format.")
-        sys.exit(1)
-    except Exception as e:
-        print(f"✗ Unexpected error loading data: {e}")
-        sys.exit(1)
-        
-    print("\nRunning evaluation...")
-    print("  - Computing relevance (semantic similarity)...")
-    print("  - Computing completeness...")
-    print("  - Computing groundedness (hallucination detection)...")
-    print("  - Profiling latency and cost...")
-    
-    try:
-        report = run_evaluation(data)
-    except Exception as e:
-        print(f"\n✗ Evaluation failed: {e}")
-        print("\nTip: Ensure you have sufficient memory (4GB+ recommended)")
-        sys.exit(1)
-    
+
+    # Loading and evaluating the input are one profiled request
+    with profile_request():
+        try:
+            with profile_stage("loading"):
+                data = with_tenant(load_data(args.conversation, args.context, trusted=args.trusted_input), args)
+            print("✓ Data loaded and validated successfully.")
+        except ValueError as e:
+            print(f"✗ Data validation error: {e}")
+            print("\nTip: Check that your JSON files match the expected format.")
+            sys.exit(1)
+        except Exception as e:
+            print(f"✗ Unexpected error loading data: {e}")
+            sys.exit(1)
+
+        print("\nRunning evaluation...")
+        print("  - Computing relevance (semantic similarity)...")
+        print("  - Computing completeness...")
+        print("  - Computing groundedness (hallucination detection)...")
+        print("  - Profiling latency and cost...")
+
+        try:
+            report = run_evaluation(data, deadline_ms=args.deadline_ms)
+        except Exception as e:
+            print(f"\n✗ Evaluation failed: {e}")
+            print("\nTip: Ensure you have sufficient memory (4GB+ recommended)")
+            sys.exit(1)
+
     print("\n" + "="*60)
     print("EVALUATION COMPLETE")
     print("="*60)
     print(f"Status: {report.status}")
-    
-    if report.status == "success" and report.scores:
+
+    if report.status in ("success", "partial") and report.scores:
+        scores = report.scores
+        tenant = get_tenant(report.tenant)
+        if report.tenant:
+            print(f"Tenant: {report.tenant}")
         print(f"\nQuery: {report.target_user_message[:100]}...")
         print(f"Response: {report.target_ai_response[:100]}...")
         print("\nScores:")
-        print(f"  Relevance:     {report.scores.relevance:.3f} {'✓' if report.scores.relevance > 0.7 else '⚠'}")
-        print(f"  Completeness:  {report.scores.completeness:.3f} {'✓' if report.scores.completeness > 0.6 else '⚠'}")
-        print(f"  Groundedness:  {report.scores.groundedness:.3f} {'✓' if report.scores.groundedness > 0.5 else '⚠'}")
-        print(f"  Latency:       {report.scores.latency_ms:.2f} ms")
-        print(f"  Est. Cost:     ${report.scores.estimated_cost:.8f}")
+        note = ""
+        if scores.history_turns:
+            note = f" (turn alone {scores.relevance_turn:.3f}, {scores.history_turns} earlier turns)"
+        print_score("Relevance:", scores.relevance, tenant.relevance_threshold, note)
+        print_score("Completeness:", scores.completeness, tenant.completeness_threshold)
+        if report.aspects and len(report.aspects) > 1:
+            print(f"  Aspects:       {scores.uncovered_aspects} of {scores.completeness_aspects} not addressed")
+            for aspect in report.aspects:
+                marker = "✓" if aspect.coverage >= config.ASPECT_COVERAGE_THRESHOLD else "⚠"
+                print(f"    {marker} {aspect.coverage:.3f}  {aspect.text[:80]}")
+        note = ""
+        if scores.groundedness_approx:
+            note = " (approx, semantic cache)"
+        elif "groundedness" in report.truncated_metrics:
+            note = f" (top {scores.groundedness_chunks} chunks only)"
+        if scores.collapsed_chunks:
+            note += f" ({scores.collapsed_chunks} near-duplicate chunks collapsed)"
+        print_score("Groundedness:", scores.groundedness, tenant.groundedness_threshold, note)
+        if report.claims:
+            print(f"  Claims:        {scores.unsupported_claims} of {scores.groundedness_claims} unsupported")
+            for claim in report.claims:
+                marker = "✓" if claim.support >= tenant.claim_support_threshold else "⚠"
+                print(f"    {marker} {claim.support:.3f}  {claim.text[:80]}")
+        if scores.context_precision is not None:
+            print(f"  Context:       precision {scores.context_precision:.3f}"
+                  + (f", redundancy {scores.context_redundancy:.3f}" if scores.context_redundancy is not None else "")
+                  + (f", score calibration {scores.retrieval_calibration:+.2f}"
+                     if scores.retrieval_calibration is not None else ""))
+        print(f"  Latency:       {scores.latency_ms:.2f} ms")
+        if scores.cold_start_ms:
+            print(f"  Cold Start:    {scores.cold_start_ms:.2f} ms (model loading, excluded from latency)")
+        if scores.estimated_cost is not None:
+            print(f"  Est. Cost:     ${scores.estimated_cost:.8f}")
+        if report.skipped_metrics:
+            print(f"  Skipped (deadline): {', '.join(report.skipped_metrics)}")
+        print_batching_stats()
+        if args.tracemalloc:
+            get_tracker().snapshot("after evaluation")
+        print_memory_stats()
     elif report.error:
         print(f"\n✗ Error: {report.error}")
-    
-    output_path = Path(args.output)
+
+    output_path = Path(args.output or "report.json")
     try:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(report.model_dump_json(indent=2))
+        with open_sink(str(output_path), args.format) as sink:
+            sink.write(report)
         print(f"\n✓ Report saved to: {output_path}")
     except Exception as e:
         print(f"\n✗ Failed to save report: {e}")
         sys.exit(1)
 
+def run_corpus(args):
+    """
+    Evaluates every record of a JSONL corpus, streaming reports to a sink.
+    With --checkpoint / --resume, progress is checkpointed periodically and
+    an interrupted run continues where its last checkpoint left off.
+    """
+    corpus_path = Path(args.corpus)
+    if not corpus_path.exists():
+        print(f"Error: Corpus file not found: {args.corpus}")
+        sys.exit(1)
+
+    output_path = Path(args.output or "reports.jsonl")
+    sink_format = args.format or infer_format(str(output_path))
+    checkpoint_path = None
+    checkpoint = None
+    # Checkpoints are on by default wherever the output can be rolled back
+    if sink_format in RESUMABLE_FORMATS and args.checkpoint_every > 0:
+        checkpoint_path = args.checkpoint or f"{output_path}.ckpt.json"
+    elif args.checkpoint or args.resume:
+        print("Error: checkpointing needs jsonl, npz or sqlite output and --checkpoint-every > 0")
+        sys.exit(1)
+    if checkpoint_path and args.cohort_by == "chat_id":
+        # Every checkpoint rewrites the summary: per-chat cohorts would make each one O(run)
+        print("Error: --cohort-by chat_id cannot be checkpointed; use --cohort-by tenant or --checkpoint-every 0")
+        sys.exit(1)
+    if args.resume:
+        if not Path(checkpoint_path).exists():
+            print(f"Error: Checkpoint not found: {checkpoint_path}")
+            sys.exit(1)
+        checkpoint = RunCheckpoint.load(checkpoint_path)
+        if not checkpoint.matches(str(corpus_path), str(output_path), sink_format):
+            print(f"Error: {checkpoint_path} belongs to a different run "
+                  f"({checkpoint.corpus} -> {checkpoint.output}, {checkpoint.format})")
+            sys.exit(1)
+        print(f"Resuming from line {checkpoint.line_no + 1} "
+              f"({sum(checkpoint.counts.values())} reports already written)")
+    shard_plan = None
+    if args.shard_plan:
+        shard_plan = ShardPlan.load(args.shard_plan)
+        if args.shard is None or not 0 <= args.shard < shard_plan.num_shards:
+            print(f"Error: --shard must be between 0 and {shard_plan.num_shards - 1}")
+            sys.exit(1)
+        print(f"Running shard {args.shard} of {shard_plan.num_shards} "
+              f"({shard_plan.shard_records[args.shard]} planned records)")
+    print(f"Evaluating corpus: {corpus_path}\nWriting {sink_format} reports to: {output_path}")
+
+    if args.warmup:
+        run_warmup()
+
+    counts = Counter(checkpoint.counts if checkpoint else {})
+    summary = RunSummary.from_dict(checkpoint.summary) if checkpoint and checkpoint.summary else RunSummary(cohort_key=args.cohort_by)
+    offset, line_no = (checkpoint.offset, checkpoint.line_no) if checkpoint else (0, 0)
+    sink_kwargs = {"resume": checkpoint.sink_state} if checkpoint else {}
+    completed = None
+    if checkpoint_path:
+        completed = CompletedIds(f"{checkpoint_path}.ids",
+                                 resume_bytes=checkpoint.ids_bytes if checkpoint else None)
+    policy = CheckpointPolicy(every_records=args.checkpoint_every)
+    already_done = 0
+    start = time.perf_counter()
+    evaluated = 0
+    dedup = DedupTally()
+
+    def save_checkpoint(sink):
+        # Sink first: the checkpoint must never point past durable reports
+        sink_state = sink.checkpoint()
+        RunCheckpoint(str(corpus_path), str(output_path), sink_format, offset=offset, line_no=line_no,
+                      sink_state=sink_state, summary=summary.to_dict(), counts=dict(counts),
+                      ids_bytes=completed.sync()).save(checkpoint_path)
+        policy.reset()
+
+    try:
+        with open_sink(str(output_path), sink_format, **sink_kwargs) as sink:
+            for record_line, line, next_offset in iter_corpus_offsets(str(corpus_path), offset, line_no):
+                record_id = None
+                try:
+                    record = json.loads(line)
+                    if isinstance(record, dict) and record.get("id") is not None:
+                        record_id = str(record["id"])
+                except ValueError:
+                    record = line  # load_record reports the parse error
+                if shard_plan is not None and shard_plan.shard_of(record_chat_id(record, record_line)) != args.shard:
+                    offset, line_no = next_offset, record_line + 1
+                    continue
+                if record_id is not None and completed is not None and record_id in completed:
+                    already_done += 1
+                    offset, line_no = next_offset, record_line + 1
+                    continue
+
+                with profile_request():
+                    try:
+                        with profile_stage("loading"):
+                            data = with_tenant(load_record(record, trusted=args.trusted_input), args)
+                    except ValueError as e:
+                        report = EvalReport(status="failed", target_user_message="", target_ai_response="",
+                                            evaluated_at=time.time(), error=f"line {record_line + 1}: {e}")
+                    else:
+                        report = run_evaluation(data, deadline_ms=args.deadline_ms)
+                report.record_id = record_key(record, record_line)
+                sink.write(report)
+                summary.update(report)
+                counts[report.status] += 1
+                evaluated += 1
+                dedup.update(report)
+                offset, line_no = next_offset, record_line + 1
+                if completed is not None:
+                    if record_id is not None:
+                        completed.add(record_id)
+                    if policy.record_done():
+                        save_checkpoint(sink)
+
+                if args.progress_every and evaluated % args.progress_every == 0:
+                    rate = evaluated / (time.perf_counter() - start)
+                    print(f"  {sum(counts.values())} reports ({rate:.1f}/s)")
+            if completed is not None:
+                save_checkpoint(sink)
+                completed.close()
+    except Exception as e:
+        print(f"\n✗ Corpus run failed: {e}")
+        if checkpoint_path:
+            print(f"  Re-run with --resume to continue from the last checkpoint ({checkpoint_path})")
+        sys.exit(1)
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    print("\n" + "="*60)
+    print("CORPUS EVALUATION COMPLETE")
+    print("="*60)
+    print(f"Reports: {total} ({evaluated} in this run, {elapsed:.1f}s"
+          + (f", {evaluated / elapsed:.1f}/s)" if elapsed else ")"))
+    if already_done:
+        print(f"  Skipped {already_done} records completed before resuming")
+    for status, n in sorted(counts.items()):
+        print(f"  {status + ':':<10} {n}")
+    print_summary(summary)
+    dedup.print()
+    print_batching_stats()
+    if args.tracemalloc:
+        get_tracker().snapshot("end of run")
+    print_memory_stats()
+    print(f"\n✓ Reports saved to: {output_path}")
+    if args.summary_output:
+        Path(args.summary_output).write_text(summary.to_json(), encoding='utf-8')
+        print(f"✓ Summary saved to: {args.summary_output}")
+
+def run_directory(args):
+    """
+    Evaluates every conversation / context file pair found in a directory or
+    glob. Files are read and parsed on --io-workers threads, up to --prefetch
+    pairs ahead of the evaluation.
+    """
+    output_path = Path(args.output or "reports.jsonl")
+    sink_format = args.format or infer_format(str(output_path))
+    print(f"Evaluating file pairs in: {args.input_dir}\nWriting {sink_format} reports to: {output_path}")
+    if args.warmup:
+        run_warmup()
+
+    counts = Counter()
+    dedup = DedupTally()
+    summary = RunSummary(cohort_key=args.cohort_by)
+    unmatched = []
+    def load(pair):
+        # Runs on the I/O threads, so loads are profiled as requests of their own
+        with profile_request(), profile_stage("loading"):
+            return load_pair(pair, trusted=args.trusted_input)
+
+    loader = PrefetchLoader(iter_input_pairs(args.input_dir, unmatched), load,
+                            workers=args.io_workers, depth=args.prefetch)
+    start = time.perf_counter()
+    try:
+        with open_sink(str(output_path), sink_format) as sink:
+            for pair, data, error in loader:
+                if error is not None:
+                    report = EvalReport(status="failed", target_user_message="", target_ai_response="",
+                                        evaluated_at=time.time(), error=f"{pair.conversation}: {error}")
+                else:
+                    report = run_evaluation(with_tenant(data, args), deadline_ms=args.deadline_ms)
+                report.record_id = pair.key
+                sink.write(report)
+                summary.update(report)
+                counts[report.status] += 1
+                dedup.update(report)
+                total = sum(counts.values())
+                if args.progress_every and total % args.progress_every == 0:
+                    print(f"  {total} reports ({total / (time.perf_counter() - start):.1f}/s)")
+    except Exception as e:
+        print(f"\n✗ Directory run failed: {e}")
+        sys.exit(1)
+
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    io = loader.stats
+    print("\n" + "="*60)
+    print("DIRECTORY EVALUATION COMPLETE")
+    print("="*60)
+    print(f"Reports: {total} ({elapsed:.1f}s" + (f", {total / elapsed:.1f}/s)" if elapsed else ")"))
+    for status, n in sorted(counts.items()):
+        print(f"  {status + ':':<10} {n}")
+    if unmatched:
+        print(f"  Unpaired files skipped: {len(unmatched)}, e.g. {unmatched[:3]}")
+    print(f"\nLoading: {io.load_ms / 1000:.1f}s on {args.io_workers} threads; evaluation waited on it "
+          f"{io.waits} times ({io.wait_ms / 1000:.1f}s, {io.wait_ms / 10 / elapsed if elapsed else 0:.1f}% of the run)")
+    print_summary(summary)
+    dedup.print()
+    print_batching_stats()
+    print_memory_stats()
+    print(f"\n✓ Reports saved to: {output_path}")
+    if args.summary_output:
+        Path(args.summary_output).write_text(summary.to_json(), encoding='utf-8')
+        print(f"✓ Summary saved to: {args.summary_output}")
+
+def write_profile(profiler, path):
+    lines = profiler.write(path)
+    stats = profiler.to_dict()
+    unit = "samples" if profiler.mode == "sample" else "us"
+    print(f"\nProfile ({profiler.mode}): {stats['requests_profiled']} of {stats['requests_seen']} requests profiled")
+    total = sum(stats["stages"].values())
+    for stage, weight in stats["stages"].items():
+        print(f"  {stage + ':':<14} {weight:>10} {unit} ({weight / total:.1%})")
+    print(f"✓ {lines} collapsed stacks saved to: {path} (flamegraph.pl, speedscope)")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run LLM Evaluation Pipeline",
+        epilog="Example: python run_eval.py --conversation data/conv.json --context data/ctx.json"
+    )
+    parser.add_argument("--conversation", type=str, required=False,
+                       help="Path to conversation JSON file")
+    parser.add_argument("--context", type=str, required=False,
+                       help="Path to context vectors JSON file")
+    parser.add_argument("--corpus", type=str, required=False,
+                       help="Path to a JSONL corpus for bulk runs; each line holds "
+                            "{\"conversation\": ..., \"context\": ...}")
+    parser.add_argument("--input-dir", type=str, required=False,
+                       help="Directory or glob of *-conversation-*.json / *_context_vectors-*.json "
+                            "file pairs to evaluate in bulk")
+    parser.add_argument("--io-workers", type=int, default=4,
+                       help="Threads reading and parsing input files ahead of evaluation (--input-dir)")
+    parser.add_argument("--prefetch", type=int, default=64,
+                       help="Max file pairs loaded ahead of evaluation (--input-dir)")
+    parser.add_argument("--output", type=str, required=False,
+                       help="Path to output report(s) (default: report.json, or reports.jsonl with "
+                            "--corpus / --input-dir)",
+                       default=None)
+    parser.add_argument("--format", type=str, choices=SINK_FORMATS, default=None,
+                       help="Report format (default: inferred from the output extension)")
+    parser.add_argument("--summary-output", type=str, default=None,
+                       help="Write the mergeable run summary (quantile sketches) to this JSON file")
+    parser.add_argument("--cohort-by", type=str, choices=sorted(COHORT_KEYS), default=None,
+                       help="Also summarize per tenant or per chat_id (one cohort per chat: small runs only)")
+    parser.add_argument("--progress-every", type=int, default=1000,
+                       help="Print progress every N reports in corpus mode (0 disables)")
+    parser.add_argument("--checkpoint", type=str, default=None,
+                       help="Checkpoint file for corpus runs (default: <output>.ckpt.json)")
+    parser.add_argument("--checkpoint-every", type=int, default=1000,
+                       help="Reports between checkpoints, also taken every 60s (0 disables)")
+    parser.add_argument("--resume", action="store_true",
+                       help="Continue an interrupted corpus run from its checkpoint")
+    parser.add_argument("--shard-plan", type=str, default=None,
+                       help="Shard plan from scripts/shard.py; only records of --shard are evaluated")
+    parser.add_argument("--shard", type=int, default=None,
+                       help="Index of the shard to run (0-based) with --shard-plan")
+    parser.add_argument("--trusted-input", action="store_true",
+                       help="Skip schema validation (trusted internal data only)")
+    parser.add_argument("--chunk-store", type=str, default=None,
+                       help="Directory of a chunk artifact store (see build_chunk_store.py)")
+    parser.add_argument("--deadline-ms", type=float, default=None,
+                       help="Per-evaluation latency budget; stages that would overrun it are "
+                            "skipped or truncated and the report is marked \"partial\"")
+    parser.add_argument("--autotune", action="store_true",
+                       help="Use this host's tuned batch sizes and threads, calibrating first if "
+                            "no saved profile fits (a saved profile is used even without this flag)")
+    parser.add_argument("--retune", action="store_true",
+                       help="Re-run the calibration and replace this host's saved profile")
+    parser.add_argument("--latency-target-ms", type=float, default=None,
+                       help="Max latency of one model batch when tuning")
+    parser.add_argument("--workers-per-host", type=int, default=1,
+                       help="Worker processes sharing this machine; limits the threads tried when tuning")
+    parser.add_argument("--retrieval-metrics", action="store_true",
+                       help="Also score the retrieved context (precision, redundancy, calibration); "
+                            "encodes chunks missing from the chunk store")
+    parser.add_argument("--claim-level", action="store_true",
+                       help="Check groundedness per claim (sentence) against its most similar chunks")
+    parser.add_argument("--history-relevance", action="store_true",
+                       help="Score relevance against the earlier turns too (decay-weighted history embedding)")
+    parser.add_argument("--memory-budget-mb", type=float, default=None,
+                       help="RSS budget for this process; caches are shrunk and model batches "
+                            "made smaller before it is exceeded")
+    parser.add_argument("--tracemalloc", action="store_true",
+                       help="Trace Python allocations per stage and list the top allocation sites "
+                            "(slows evaluation down)")
+    parser.add_argument("--tenants", type=str, default=None,
+                       help="JSON file of per-tenant models and thresholds, re-read when it changes")
+    parser.add_argument("--tenant", type=str, default=None,
+                       help="Tenant for inputs that do not name one (default: config.py settings)")
+    parser.add_argument("--profile", type=str, default=None,
+                       help="Profile evaluation and write collapsed stacks (flamegraph input) to this file")
+    parser.add_argument("--profile-mode", type=str, choices=PROFILE_MODES, default="sample",
+                       help="Stack sampling (low overhead) or cProfile (exact, slower)")
+    parser.add_argument("--profile-interval-ms", type=float, default=None,
+                       help="Time between stack samples (default: config.PROFILE_INTERVAL_MS)")
+    parser.add_argument("--profile-fraction", type=float, default=None,
+                       help="Share of requests to profile (default: config.PROFILE_FRACTION)")
+    parser.add_argument("--warmup", action="store_true",
+                       help="Load models and run dummy batches before evaluating, "
+                            "so model loading is not counted as request latency")
+
+    args = parser.parse_args()
+    # Before any setup: tuning and opening stores are wasted on bad arguments
+    if not (args.corpus or args.input_dir or (args.conversation and args.context)):
+        parser.error("either --corpus, --input-dir, or both --conversation and --context, are required")
+
+    if args.claim_level:
+        config.GROUNDEDNESS_MODE = "claims"
+    if args.retrieval_metrics:
+        config.RETRIEVAL_METRICS = True
+    if args.history_relevance:
+        config.RELEVANCE_MODE = "history"
+    if args.memory_budget_mb:
+        set_memory_budget(args.memory_budget_mb)
+    if args.tracemalloc:
+        get_tracker().enable_tracemalloc()
+    if args.tenants:
+        configure_tenants(args.tenants)
+
+    if args.autotune or args.retune:
+        print("Tuning batch sizes and threads for this host...")
+    engine, profile = configure_engine(tune=args.autotune, force=args.retune,
+                                       latency_target_ms=args.latency_target_ms,
+                                       workers=args.workers_per_host)
+    if profile is not None:
+        print_engine(engine, profile)
+
+    if args.chunk_store:
+        store = open_store(args.chunk_store)
+        print(f"Using chunk store: {args.chunk_store} ({len(store)} chunks)")
+
+    if args.profile:
+        start_profiling(args.profile_mode, args.profile_interval_ms, args.profile_fraction)
+
+    if args.corpus:
+        run_corpus(args)
+    elif args.input_dir:
+        run_directory(args)
+    else:
+        run_single(args)
+
+    profiler = stop_profiling()
+    if profiler is not None:
+        write_profile(profiler, args.profile)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,84 @@
+"""
+Plan and merge sharded corpus runs.
+
+    python scripts/shard.py plan --corpus corpus.jsonl --shards 8 --output plan.json
+    # on node i (0..7):
+    python scripts/run_eval.py --corpus corpus.jsonl --shard-plan plan.json --shard i \\
+        --output shard-i.jsonl
+    python scripts/shard.py merge --plan plan.json --inputs shard-*.jsonl --output merged.jsonl
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Add src to path so we can import eval_pipeline
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.sharding import ShardPlan, plan_shards, merge_shards
+from eval_pipeline.sinks import open_sink
+from eval_pipeline.summary import RunSummary
+
+def cmd_plan(args):
+    plan = plan_shards(args.corpus, args.shards, buckets_per_shard=args.buckets_per_shard)
+    plan.save(args.output)
+    print(f"✓ Plan for {plan.num_shards} shards saved to: {args.output}")
+    print(f"  {'shard':<8}{'records':>10}{'est. cost':>14}")
+    for shard in range(plan.num_shards):
+        print(f"  {shard:<8}{plan.shard_records[shard]:>10}{plan.shard_costs[shard]:>14}")
+    print(f"  Imbalance (max / mean cost): {plan.imbalance():.3f}")
+
+def cmd_merge(args):
+    plan = ShardPlan.load(args.plan)
+    summary = RunSummary()
+    with open_sink(args.output, args.format) as sink:
+        result = merge_shards(plan, args.inputs, sink=sink, summary=summary, corpus=args.corpus)
+
+    print(f"Merged {result.reports} reports into: {args.output} (expected {result.expected})")
+    for shard in range(plan.num_shards):
+        marker = "" if result.shard_reports[shard] == plan.shard_records[shard] else "  ✗"
+        print(f"  shard {shard}: {result.shard_reports[shard]} / {plan.shard_records[shard]}{marker}")
+    if result.duplicates:
+        print(f"✗ {len(result.duplicates)} duplicate reports dropped, e.g. {result.duplicates[:5]}")
+    if result.missing:
+        print(f"✗ {len(result.missing)} records missing, e.g. {result.missing[:5]}")
+    if args.summary_output:
+        Path(args.summary_output).write_text(summary.to_json(), encoding='utf-8')
+        print(f"✓ Summary saved to: {args.summary_output}")
+    if args.verify_output:
+        Path(args.verify_output).write_text(json.dumps(result.to_dict(), indent=2), encoding='utf-8')
+    if not result.ok:
+        print("✗ Verification failed: the merged reports do not match the plan")
+        sys.exit(1)
+    print("✓ Verified: every planned record reported exactly once")
+
+def main():
+    parser = argparse.ArgumentParser(description="Shard planning and merging for corpus runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    plan = sub.add_parser("plan", help="Partition a corpus into cost-balanced shards")
+    plan.add_argument("--corpus", type=str, required=True)
+    plan.add_argument("--shards", type=int, required=True)
+    plan.add_argument("--buckets-per-shard", type=int, default=64,
+                      help="Hash buckets per shard; more buckets balance costs more finely")
+    plan.add_argument("--output", type=str, default="shard_plan.json")
+    plan.set_defaults(func=cmd_plan)
+
+    merge = sub.add_parser("merge", help="Combine and verify shard outputs")
+    merge.add_argument("--plan", type=str, required=True)
+    merge.add_argument("--inputs", type=str, nargs="+", required=True, help="Shard JSONL reports")
+    merge.add_argument("--output", type=str, default="reports.jsonl")
+    merge.add_argument("--format", type=str, default=None,
+                       choices=["json", "jsonl", "parquet", "arrow", "npz"])
+    merge.add_argument("--summary-output", type=str, default=None)
+    merge.add_argument("--verify-output", type=str, default=None,
+                       help="Write the verification result as JSON")
+    merge.add_argument("--corpus", type=str, default=None,
+                       help="Rescan the corpus to list exactly which records are missing")
+    merge.set_defaults(func=cmd_merge)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
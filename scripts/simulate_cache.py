@@ -0,0 +1,98 @@
+"""
+Size the embedding and NLI caches from recorded traffic.
+
+    python scripts/simulate_cache.py --corpus corpus.jsonl
+    python scripts/simulate_cache.py --input-dir archive/ --sizes 1000 5000 20000 --policies lru opt
+
+No model is loaded: inputs are replayed through the cache keys only.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Add src to path so we can import eval_pipeline
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.cache_sim import CACHES, POLICIES, KeyTrace, default_sizes, simulate_cache
+from eval_pipeline.engine import get_engine_config
+from eval_pipeline.loader import iter_corpus, iter_input_pairs, load_pair, load_record
+from eval_pipeline.tenants import configure_tenants
+
+def iter_inputs(args):
+    if args.corpus:
+        for line_no, line in iter_corpus(args.corpus):
+            try:
+                yield load_record(line, trusted=args.trusted_input)
+            except ValueError as e:
+                print(f"  skipping line {line_no + 1}: {e}")
+    else:
+        for pair in iter_input_pairs(args.input_dir):
+            try:
+                yield load_pair(pair, trusted=args.trusted_input)
+            except ValueError as e:
+                print(f"  skipping {pair.conversation}: {e}")
+
+def print_simulation(sim, current_size):
+    print(f"\n{sim.cache} cache: {sim.lookups} lookups, {sim.unique_keys} distinct keys, "
+          f"at most {sim.max_hit_rate:.1%} hits; a miss costs ~{sim.miss_cost_ms:.2f} ms")
+    policies = list(dict.fromkeys(p.policy for p in sim.points))
+    sizes = sorted({p.size for p in sim.points})
+    print(f"  {'size':>9}" + "".join(f"{policy:>9}" for policy in policies) + f"{'saved (lru)':>14}")
+    for size in sizes:
+        rates = "".join(f"{sim.hit_rate(policy, size):>9.1%}" for policy in policies)
+        saved = next((p.saved_ms for p in sim.points if p.policy == "lru" and p.size == size), None)
+        marker = "  <- current" if size == current_size else ""
+        print(f"  {size:>9}{rates}" + (f"{saved / 1000:>13.2f}s" if saved is not None else "") + marker)
+    if "lru" in policies and sim.max_hit_rate:
+        best = sim.smallest_size("lru")
+        if best is not None:
+            print(f"  Smallest LRU size within 95% of the best hit rate: {best}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate cache sizes and eviction policies on recorded inputs")
+    parser.add_argument("--corpus", type=str, default=None,
+                        help="JSONL corpus or log of evaluation inputs, one record per line")
+    parser.add_argument("--input-dir", type=str, default=None,
+                        help="Directory or glob of conversation / context file pairs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=None,
+                        help="Cache sizes (entries) to simulate (default: 100, 300, 1000, ... up to all keys)")
+    parser.add_argument("--policies", type=str, nargs="+", choices=POLICIES, default=list(POLICIES))
+    parser.add_argument("--embedding-ms", type=float, default=None,
+                        help="Time one embedding miss costs (default: from this host's tuning profile)")
+    parser.add_argument("--nli-ms", type=float, default=None,
+                        help="Time one NLI miss costs (default: from this host's tuning profile)")
+    parser.add_argument("--tenants", type=str, default=None,
+                        help="Tenants file, so tenants with their own models get their own keys")
+    parser.add_argument("--trusted-input", action="store_true",
+                        help="Skip schema validation (trusted internal data only)")
+    parser.add_argument("--output", type=str, default=None, help="Write the curves to this JSON file")
+    args = parser.parse_args()
+    if not (args.corpus or args.input_dir):
+        parser.error("either --corpus or --input-dir is required")
+    if args.tenants:
+        configure_tenants(args.tenants)
+
+    trace = KeyTrace()
+    for data in iter_inputs(args):
+        trace.add(data)
+    print(f"Replayed {trace.evaluations} evaluations ({trace.skipped} without a target pair)")
+
+    engine = get_engine_config()
+    costs = {"embeddings": args.embedding_ms, "nli": args.nli_ms}
+    results = []
+    for cache in CACHES:
+        keys = trace.keys[cache]
+        current = engine.cache_size(cache)
+        sizes = set(args.sizes or default_sizes(len(set(keys))))
+        if current:
+            sizes.add(current)
+        sim = simulate_cache(cache, keys, sizes=sizes, policies=args.policies, cost_ms=costs[cache])
+        print_simulation(sim, current)
+        results.append(sim.model_dump())
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding='utf-8')
+        print(f"\n✓ Curves saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
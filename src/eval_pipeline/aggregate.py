@@ -1,41 +1,145 @@
+import time
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
+from . import config
 from .schemas import EvalInput
 from .targeting import select_target_pair
+from .metrics import relevance, groundedness
 from .metrics.relevance import score_relevance
-from .metrics.completeness import score_completeness
-from .metrics.groundedness import score_groundedness
+from .metrics.history import HistoryRelevance, evaluate_history_relevance, prior_turns
+from .metrics.completeness import AspectScore, evaluate_completeness, score_completeness
+from .metrics.claims import ClaimScore, evaluate_claims
+from .metrics.groundedness import evaluate_groundedness
+from .metrics.retrieval import evaluate_retrieval
 from .metrics.toxicity import score_toxicity
-from .profiling import LatencyProfiler, estimate_cost
+from .profiling import LatencyProfiler, estimate_cost, total_model_load_ms
+from .budget import PER_CHUNK_STAGES, get_estimator, select_top_chunks
+from .dedup import collapse_chunks
+from .memory import check_memory_budget, peak_rss_bytes, rss_bytes, to_mb, track_stage
+from .models import use_models
+from .stack_profiler import profile_request, profile_stage
+from .tenants import TenantConfig, get_tenant, model_overrides
 
 class MetricScores(BaseModel):
-    relevance: float
-    completeness: float
-    groundedness: float
-    toxicity: float
+    # Metric fields are None when the stage was skipped to meet a deadline
+    relevance: Optional[float] = None
+    relevance_turn: Optional[float] = None  # Target turn alone, in history-aware relevance
+    history_turns: Optional[int] = None  # Earlier turns behind history-aware relevance
+    completeness: Optional[float] = None
+    groundedness: Optional[float] = None
+    toxicity: Optional[float] = None
     latency_ms: float
-    estimated_cost: float
+    estimated_cost: Optional[float] = None
+    cold_start_ms: float = 0.0  # Model loading paid by this run, excluded from latency_ms
+    groundedness_approx: bool = False  # Groundedness reused from a near-duplicate response
+    groundedness_chunks: Optional[int] = None  # Context chunks checked by NLI
+    collapsed_chunks: Optional[int] = None  # Near-duplicate chunks not sent to NLI (see dedup.py)
+    groundedness_claims: Optional[int] = None  # Claims checked in claim-level mode
+    unsupported_claims: Optional[int] = None
+    completeness_aspects: Optional[int] = None  # Query aspects checked in aspect mode
+    uncovered_aspects: Optional[int] = None
+    # Retrieval quality of the context itself (see metrics/retrieval.py)
+    context_precision: Optional[float] = None
+    context_redundancy: Optional[float] = None
+    retrieval_calibration: Optional[float] = None
+    # Process memory (see memory.py); None where RSS cannot be read
+    rss_delta_mb: Optional[float] = None  # RSS growth during this evaluation
+    peak_rss_mb: Optional[float] = None  # Process RSS high-water mark so far
 
 class EvalReport(BaseModel):
     status: str
+    chat_id: Optional[str] = None
+    tenant: Optional[str] = None
+    record_id: Optional[str] = None  # Corpus record key ("id", or line number) in corpus runs
+    evaluated_at: Optional[float] = None  # Unix timestamp
     target_user_message: str
     target_ai_response: str
     scores: Optional[MetricScores] = None
+    skipped_metrics: List[str] = []  # Stages dropped to meet the deadline
+    truncated_metrics: List[str] = []  # Stages run on a subset of the context
+    claims: Optional[List[ClaimScore]] = None  # Per-claim support in claim-level groundedness
+    aspects: Optional[List[AspectScore]] = None  # Per-aspect coverage in aspect-level completeness
+    verdicts: Dict[str, bool] = {}  # Pass/fail per metric under the tenant's thresholds
     error: Optional[str] = None
 
-def run_evaluation(data: EvalInput) -> EvalReport:
+def warmup() -> Dict[str, float]:
+    """
+    Loads all models and runs a dummy batch through each one.
+    Call this once at process start (batch jobs, autoscaled workers) so the
+    first real request does not pay for model loading.
+    Returns the wall time (ms) spent warming each model.
+    """
+    timings = {}
+    for name, module in (("relevance", relevance), ("groundedness", groundedness)):
+        start = time.perf_counter()
+        module.warmup()
+        timings[name] = (time.perf_counter() - start) * 1000
+    return timings
+
+# Evaluation stages, cheapest first by default; with a deadline they are
+# re-ordered by their current cost estimates.
+STAGES = ("toxicity", "cost", "relevance", "completeness", "retrieval", "groundedness")
+
+def _run_stage(stage: str, user_msg, ai_msg, chunks, tenant: TenantConfig, conversation=None):
+    if stage == "toxicity":
+        return score_toxicity(ai_msg.content)
+    if stage == "cost":
+        return estimate_cost(ai_msg.content)  # Cost of response generation (proxy)
+    if stage == "relevance":
+        if config.RELEVANCE_MODE == "history" and conversation is not None:
+            return evaluate_history_relevance(user_msg.content, ai_msg.content,
+                                              prior_turns(conversation, user_msg), conversation.id)
+        return score_relevance(user_msg.content, ai_msg.content)
+    if stage == "completeness":
+        if config.COMPLETENESS_MODE == "aspects":
+            return evaluate_completeness(user_msg.content, ai_msg.content)
+        return score_completeness(user_msg.content, ai_msg.content)
+    if stage == "retrieval":
+        return evaluate_retrieval(user_msg.content, chunks, tenant.context_relevance_threshold)
+    if stage == "groundedness":
+        if config.GROUNDEDNESS_MODE == "claims":
+            return evaluate_claims(ai_msg.content, chunks, support_threshold=tenant.claim_support_threshold)
+        return evaluate_groundedness(ai_msg.content, chunks)
+    raise ValueError(f"Unknown stage: {stage}")
+
+def run_evaluation(data: EvalInput, deadline_ms: Optional[float] = None) -> EvalReport:
     """
     Orchestrates the evaluation pipeline.
+    Time spent loading models during this call is reported as cold_start_ms
+    and excluded from latency_ms.
+
+    With `deadline_ms`, stages run cheapest first and each one is checked
+    against the time left using recent timings: stages that would overrun
+    are skipped, and groundedness is truncated to the top-scoring chunks
+    that fit. The report then has status "partial" and lists what was
+    skipped or truncated.
+
+    The input's tenant (see tenants.py) selects the thresholds behind the
+    report's verdicts and, where it differs from the default, the models.
+
+    While a stack profiler is running (stack_profiler.py), each call is a
+    profiled request with targeting and every metric tagged as a stage.
     """
+    with profile_request():
+        return _evaluate(data, deadline_ms)
+
+def _evaluate(data: EvalInput, deadline_ms: Optional[float]) -> EvalReport:
     profiler = LatencyProfiler()
+    tenant = get_tenant(getattr(data, "tenant", None))
+    report_meta = {"chat_id": data.conversation.id, "tenant": getattr(data, "tenant", None),
+                   "evaluated_at": time.time()}
+    load_ms_before = total_model_load_ms()
+    rss_before = rss_bytes()
     profiler.start()
     
     # 1. Select Target Pair
-    target = select_target_pair(data.conversation, data.context)
+    with profile_stage("targeting"):
+        target = select_target_pair(data.conversation, data.context)
     if not target:
         profiler.stop()
         return EvalReport(
             status="skipped",
+            **report_meta,
             target_user_message="",
             target_ai_response="",
             error="Could not identify a valid User-AI pair with Context."
@@ -47,36 +151,100 @@ def run_evaluation(data: EvalInput) -> EvalReport:
     context_chunks = data.context.entries.get(context_key, [])
     
     # 3. Compute Metrics
+    estimator = get_estimator()
+    stages = [s for s in STAGES if s != "retrieval" or config.RETRIEVAL_METRICS]
+    if deadline_ms is not None:
+        stages = sorted(stages, key=lambda s: estimator.estimate(s, len(context_chunks)))
+    results = {}
+    skipped: List[str] = []
+    truncated: List[str] = []
+    ground_chunks = None
+    collapsed = None
     try:
-        rel = score_relevance(user_msg.content, ai_msg.content)
-        comp = score_completeness(user_msg.content, ai_msg.content)
-        ground = score_groundedness(ai_msg.content, context_chunks)
-        toxic = score_toxicity(ai_msg.content)
-        cost = estimate_cost(ai_msg.content) # Cost of response generation (proxy)
+        with use_models(model_overrides(tenant)):
+            for stage in stages:
+                chunks = context_chunks
+                if stage == "groundedness" and config.DEDUP_CHUNKS and len(chunks) > 1:
+                    # NLI runs on one representative per cluster of near-duplicates
+                    with profile_stage("dedup"):
+                        dedup = collapse_chunks(chunks)
+                    chunks = dedup.chunks
+                    collapsed = dedup.collapsed
+                if deadline_ms is not None:
+                    remaining = deadline_ms - profiler.elapsed_ms()
+                    if stage == "groundedness" and chunks:
+                        affordable = estimator.affordable_units(stage, remaining)
+                        if affordable == 0:
+                            skipped.append(stage)
+                            continue
+                        if affordable < len(chunks):
+                            chunks = select_top_chunks(chunks, affordable)
+                            truncated.append(stage)
+                    elif estimator.estimate(stage, len(chunks)) > remaining:
+                        skipped.append(stage)
+                        continue
+
+                with profile_stage(stage), track_stage(stage), \
+                        estimator.timed(stage, units=len(chunks) if stage in PER_CHUNK_STAGES else 1):
+                    results[stage] = _run_stage(stage, user_msg, ai_msg, chunks, tenant, data.conversation)
+                check_memory_budget()
+                if stage == "groundedness":
+                    ground_chunks = len(chunks)
         
     except Exception as e:
         profiler.stop()
         return EvalReport(
             status="failed",
+            **report_meta,
             target_user_message=user_msg.content,
             target_ai_response=ai_msg.content,
             error=str(e)
         )
 
     profiler.stop()
+    cold_start_ms = total_model_load_ms() - load_ms_before
+    ground = results.get("groundedness")
+    claims = getattr(ground, "claims", None)
+    complete = results.get("completeness")
+    aspects = getattr(complete, "aspects", None)
+    retrieval = results.get("retrieval")
+    relevant = results.get("relevance")
+    history = relevant if isinstance(relevant, HistoryRelevance) else None
+    rss_after = rss_bytes()
     
     scores = MetricScores(
-        relevance=rel,
-        completeness=comp,
-        groundedness=ground,
-        toxicity=toxic,
-        latency_ms=profiler.get_latency_ms(),
-        estimated_cost=cost
+        relevance=history.score if history is not None else relevant,
+        relevance_turn=history.turn if history is not None else None,
+        history_turns=history.history_turns if history is not None else None,
+        completeness=complete.score if aspects is not None else complete,
+        groundedness=ground.score if ground is not None else None,
+        toxicity=results.get("toxicity"),
+        latency_ms=max(profiler.get_latency_ms() - cold_start_ms, 0.0),
+        estimated_cost=results.get("cost"),
+        cold_start_ms=cold_start_ms,
+        groundedness_approx=ground.approximate if ground is not None else False,
+        groundedness_chunks=ground_chunks,
+        collapsed_chunks=collapsed,
+        groundedness_claims=len(claims) if claims is not None else None,
+        unsupported_claims=ground.unsupported if claims is not None else None,
+        completeness_aspects=len(aspects) if aspects is not None else None,
+        uncovered_aspects=len(aspects) - complete.covered if aspects is not None else None,
+        context_precision=retrieval.context_precision if retrieval is not None else None,
+        context_redundancy=retrieval.redundancy if retrieval is not None else None,
+        retrieval_calibration=retrieval.score_calibration if retrieval is not None else None,
+        rss_delta_mb=to_mb(rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+        peak_rss_mb=to_mb(peak_rss_bytes())
     )
     
     return EvalReport(
-        status="success",
+        status="partial" if skipped or truncated else "success",
+        **report_meta,
         target_user_message=user_msg.content,
         target_ai_response=ai_msg.content,
-        scores=scores
+        scores=scores,
+        skipped_metrics=skipped,
+        truncated_metrics=truncated,
+        claims=claims,
+        aspects=aspects,
+        verdicts=tenant.verdicts(scores)
     )
@@ -0,0 +1,226 @@
+"""
+Start-up auto-tuning of batch sizes and torch threads.
+
+The best batch size and thread count differ between machine types, so they
+are measured rather than guessed. Calibration times the encoder and the NLI
+model on synthetic inputs at a short and a long representative length, for
+each candidate thread count and batch size. Per model and length, it keeps
+the batch size with the highest throughput whose batch latency stays within
+the target. The long length fixes the scheduler's token budget and the short
+one its maximum batch size. The thread count with the best combined
+throughput wins.
+
+The chosen profile is saved per host with a hardware fingerprint, so later
+starts on the same machine reuse it and a changed machine is re-tuned.
+"""
+import json
+import os
+import platform
+import socket
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from . import config
+from .checkpoint import atomic_write_text
+from .engine import BATCHED_MODELS, BatchSettings, EngineConfig, set_torch_threads, startup
+
+PROFILE_VERSION = 1
+# Representative (short, long) token lengths per model: queries / responses
+# for the encoder, (chunk, response) pairs for NLI
+CALIBRATION_LENGTHS = {"relevance": (16, 128), "groundedness": (64, 384)}
+BATCH_SIZES = (1, 4, 8, 16, 32, 64)
+_FILLER = "the clinic offers consultations and treatment plans for patients every weekday "
+
+class Measurement(BaseModel):
+    model: str
+    threads: Optional[int] = None
+    batch_size: int
+    length: int
+    latency_ms: float  # Best of the repeats, for one batch
+    items_per_s: float
+
+class TuningProfile(BaseModel):
+    version: int = PROFILE_VERSION
+    host: str
+    fingerprint: Dict[str, str]
+    created_at: float
+    latency_target_ms: float
+    engine: EngineConfig
+    measurements: List[Measurement] = []
+
+def host_fingerprint() -> Dict[str, str]:
+    """What the tuned settings depend on; a profile is reused only if it matches."""
+    try:
+        import torch
+        torch_version = torch.__version__
+    except ImportError:
+        torch_version = ""
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": str(os.cpu_count()),
+        "python": platform.python_version(),
+        "torch": torch_version,
+        "models": f"{config.RELEVANCE_MODEL}|{config.GROUNDEDNESS_MODEL}",
+    }
+
+def profile_path(host: Optional[str] = None) -> Path:
+    base = Path(config.ENGINE_PROFILE_DIR) if config.ENGINE_PROFILE_DIR else Path.home() / ".cache" / "eval_pipeline"
+    return base / f"engine-{host or socket.gethostname()}.json"
+
+def save_profile(profile: TuningProfile, path: Optional[Path] = None) -> Path:
+    path = path or profile_path(profile.host)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(str(path), profile.model_dump_json(indent=2))
+    return path
+
+def load_profile(path: Optional[Path] = None) -> Optional[TuningProfile]:
+    """This host's saved profile, or None if missing, unreadable or from other hardware."""
+    path = path or profile_path()
+    try:
+        profile = TuningProfile.model_validate(json.loads(path.read_text(encoding='utf-8')))
+    except (OSError, ValueError):
+        return None
+    if profile.version != PROFILE_VERSION or profile.fingerprint != host_fingerprint():
+        return None
+    return profile
+
+def thread_candidates(workers: int = 1) -> List[Optional[int]]:
+    """Thread counts worth trying when `workers` processes share the machine."""
+    try:
+        import torch  # noqa: F401
+    except ImportError:
+        return [None]  # Nothing to tune without torch
+    available = max(1, (os.cpu_count() or 1) // max(workers, 1))
+    return sorted({1, max(1, available // 2), available})
+
+def _synthetic_text(tokens: int) -> str:
+    words = _FILLER.split()
+    return " ".join(words[i % len(words)] for i in range(max(tokens - 2, 1)))
+
+def _model_runner(model: str) -> Callable[[int, int], Callable[[], None]]:
+    """Returns make(batch_size, length) -> a function running one batch."""
+    if model == "relevance":
+        from .metrics.relevance import get_model
+        encoder = get_model()
+
+        def make(batch_size, length):
+            texts = [_synthetic_text(length)] * batch_size
+            return lambda: encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                          normalize_embeddings=True)
+        return make
+    if model == "groundedness":
+        from .metrics.groundedness import get_model
+        cross_encoder = get_model()
+
+        def make(batch_size, length):
+            pairs = [(_synthetic_text(length - 24), _synthetic_text(24))] * batch_size
+            return lambda: cross_encoder.predict(pairs, batch_size=batch_size, apply_softmax=True)
+        return make
+    raise ValueError(f"Unknown model: {model}")
+
+def measure(run: Callable[[], None], batch_size: int, repeats: int = 2) -> Dict[str, float]:
+    run()  # Warm-up: allocator and kernel selection
+    best = min(_timed(run) for _ in range(repeats))
+    return {"latency_ms": best, "items_per_s": batch_size / (best / 1000) if best else float("inf")}
+
+def _timed(run: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    run()
+    return (time.perf_counter() - start) * 1000
+
+def best_batch_size(measurements: Sequence[Measurement], latency_target_ms: float) -> int:
+    """Highest-throughput batch size within the latency target (the smallest if none is)."""
+    within = [m for m in measurements if m.latency_ms <= latency_target_ms]
+    if not within:
+        return min(m.batch_size for m in measurements)
+    return max(within, key=lambda m: (m.items_per_s, -m.batch_size)).batch_size
+
+def choose_engine(measurements: Sequence[Measurement], latency_target_ms: float,
+                  base: Optional[EngineConfig] = None) -> EngineConfig:
+    """Builds the engine configuration from calibration measurements."""
+    engine = (base or EngineConfig.from_config()).model_copy(deep=True)
+    threads = sorted({m.threads for m in measurements}, key=lambda t: (t is None, t or 0))
+
+    def settings_for(t):
+        chosen, throughput = {}, 0.0
+        for model in {m.model for m in measurements}:
+            short, long = CALIBRATION_LENGTHS[model]
+            rows = [m for m in measurements if m.model == model and m.threads == t]
+            long_rows = [m for m in rows if m.length == long]
+            short_rows = [m for m in rows if m.length == short]
+            long_batch = best_batch_size(long_rows, latency_target_ms)
+            short_batch = best_batch_size(short_rows, latency_target_ms)
+            chosen[model] = BatchSettings(token_budget=long_batch * long,
+                                          max_batch_size=max(short_batch, long_batch))
+            best = max(m.items_per_s for m in long_rows if m.batch_size == long_batch)
+            # Relative to this model's best at any thread count, so models weigh equally
+            throughput += best / max(m.items_per_s for m in measurements
+                                     if m.model == model and m.length == long)
+        return throughput, chosen
+
+    scored = [(settings_for(t), t) for t in threads]
+    (_, batching), best_threads = max(scored, key=lambda item: item[0][0])
+    engine.batching.update(batching)
+    engine.torch_threads = best_threads
+    return engine
+
+def calibrate(latency_target_ms: Optional[float] = None, workers: int = 1,
+              models: Sequence[str] = BATCHED_MODELS, batch_sizes: Sequence[int] = BATCH_SIZES,
+              threads: Optional[Sequence[Optional[int]]] = None, repeats: int = 2) -> TuningProfile:
+    """Measures the models on this host and returns the tuned profile (not yet saved)."""
+    latency_target_ms = latency_target_ms or config.AUTOTUNE_LATENCY_TARGET_MS
+    threads = list(threads) if threads is not None else thread_candidates(workers)
+    measurements = []
+    runners = {model: _model_runner(model) for model in models}
+    for t in threads:
+        set_torch_threads(t)
+        for model in models:
+            for length in CALIBRATION_LENGTHS[model]:
+                for batch_size in batch_sizes:
+                    result = measure(runners[model](batch_size, length), batch_size, repeats)
+                    measurements.append(Measurement(model=model, threads=t, batch_size=batch_size,
+                                                    length=length, **result))
+                    if result["latency_ms"] > latency_target_ms:
+                        break  # Larger batches only take longer
+    engine = choose_engine(measurements, latency_target_ms)
+    set_torch_threads(engine.torch_threads)
+    return TuningProfile(host=socket.gethostname(), fingerprint=host_fingerprint(), created_at=time.time(),
+                         latency_target_ms=latency_target_ms, engine=engine, measurements=measurements)
+
+def ensure_profile(force: bool = False, latency_target_ms: Optional[float] = None, **kwargs) -> TuningProfile:
+    """
+    This host's saved profile; calibrates and saves a new one if it is
+    missing, from other hardware, tuned for another latency target, or `force`d.
+    """
+    latency_target_ms = latency_target_ms or config.AUTOTUNE_LATENCY_TARGET_MS
+    if not force:
+        profile = load_profile()
+        if profile is not None and profile.latency_target_ms == latency_target_ms:
+            return profile
+    profile = calibrate(latency_target_ms=latency_target_ms, **kwargs)
+    save_profile(profile)
+    return profile
+
+def tuned_engine(profile: TuningProfile, base: Optional[EngineConfig] = None) -> EngineConfig:
+    """
+    `base` (default: config.py) with the profile's tuned batch limits and
+    threads; caching and loading settings stay as currently configured.
+    """
+    engine = (base or EngineConfig.from_config()).model_copy(deep=True)
+    engine.batching.update(profile.engine.batching)
+    engine.torch_threads = profile.engine.torch_threads
+    return engine
+
+def configure_engine(tune: bool = False, force: bool = False,
+                     **kwargs) -> Tuple[EngineConfig, Optional[TuningProfile]]:
+    """
+    Starts the engine with this host's saved profile if there is one. With
+    `tune`, a missing or stale profile is calibrated first; `force`
+    re-calibrates regardless.
+    """
+    profile = ensure_profile(force=force, **kwargs) if tune or force else load_profile()
+    return startup(tuned_engine(profile) if profile is not None else None), profile
@@ -0,0 +1,154 @@
+"""
+Length-bucketed batch scheduling for model calls.
+
+Transformer batches are padded to their longest sequence, so mixing a short
+greeting with a 512-token context chunk wastes most of the batch's compute.
+The scheduler sorts inputs by tokenized length, packs them into batches under
+a token budget (batch_size * longest_length), runs the model once per batch
+and returns results in the caller's original order.
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .memory import batch_scale, check_memory_budget
+
+# Rough characters-per-token ratio for WordPiece/SentencePiece on English text,
+# used when no tokenizer is available.
+CHARS_PER_TOKEN = 4
+
+class PaddingStats:
+    """
+    Counts real vs padded tokens across scheduled batches.
+    `baseline_padded_tokens` is what the same inputs would have cost with
+    fixed-size batches in arrival order, so the gain is directly visible.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.batches = 0
+        self.sequences = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.baseline_padded_tokens = 0
+
+    def record_batch(self, lengths: Sequence[int]) -> None:
+        self.batches += 1
+        self.sequences += len(lengths)
+        self.real_tokens += sum(lengths)
+        self.padded_tokens += len(lengths) * max(lengths)
+
+    def record_baseline(self, lengths: Sequence[int], batch_size: int) -> None:
+        for i in range(0, len(lengths), batch_size):
+            window = lengths[i:i + batch_size]
+            self.baseline_padded_tokens += len(window) * max(window)
+
+    @property
+    def efficiency(self) -> float:
+        """Fraction of computed token positions that were real tokens (1.0 = no padding)."""
+        return self.real_tokens / self.padded_tokens if self.padded_tokens else 1.0
+
+    @property
+    def baseline_efficiency(self) -> float:
+        return self.real_tokens / self.baseline_padded_tokens if self.baseline_padded_tokens else 1.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "sequences": self.sequences,
+            "real_tokens": self.real_tokens,
+            "padded_tokens": self.padded_tokens,
+            "padding_efficiency": round(self.efficiency, 4),
+            "baseline_padding_efficiency": round(self.baseline_efficiency, 4),
+        }
+
+def tokenizer_length_fn(model: Any, max_length: int = 512) -> Callable[[Any], int]:
+    """
+    Builds a length function from a model's tokenizer.
+    Accepts either a text or a (premise, hypothesis) pair, matching what the
+    encoder and the cross-encoder consume. Falls back to a character estimate
+    when the model exposes no tokenizer.
+    """
+    tokenizer = getattr(model, "tokenizer", None)
+    max_length = getattr(model, "max_seq_length", None) or getattr(model, "max_length", None) or max_length
+
+    def length(item: Any) -> int:
+        parts = item if isinstance(item, (tuple, list)) else (item,)
+        if tokenizer is not None:
+            try:
+                encoded = tokenizer(*parts, truncation=True, max_length=max_length)
+                return len(encoded["input_ids"])
+            except Exception:
+                pass
+        approx = sum(len(p) for p in parts) // CHARS_PER_TOKEN + 2 * len(parts)
+        return max(1, min(approx, max_length))
+
+    return length
+
+class LengthBucketScheduler:
+    """
+    Forms batches of similar-length inputs under a padded-token budget.
+    """
+
+    def __init__(self, name: str, token_budget: int = 8192, max_batch_size: int = 64):
+        self.name = name
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.stats = PaddingStats()
+
+    def plan(self, lengths: Sequence[int]) -> List[List[int]]:
+        """
+        Returns batches as lists of indices into `lengths`.
+        Inputs are visited shortest-first, so the newest item always sets the
+        batch's padded length; a batch is closed when adding the next input
+        would exceed the token budget or the maximum batch size. An input
+        longer than the whole budget still gets a batch of its own.
+        Under memory pressure both limits are scaled down.
+        """
+        scale = batch_scale()
+        token_budget = self.token_budget * scale
+        max_batch_size = max(1, int(self.max_batch_size * scale))
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        batches: List[List[int]] = []
+        current: List[int] = []
+        for idx in order:
+            padded_if_added = (len(current) + 1) * lengths[idx]
+            if current and (padded_if_added > token_budget or len(current) >= max_batch_size):
+                batches.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            batches.append(current)
+        return batches
+
+    def run(self, items: Sequence[Any], fn: Callable[[List[Any]], Sequence[Any]],
+            length_fn: Callable[[Any], int], lengths: Optional[Sequence[int]] = None) -> List[Any]:
+        """
+        Runs `fn` over length-bucketed batches of `items` and returns one
+        result per item, in the original order.
+        """
+        if not items:
+            return []
+        if lengths is None:
+            lengths = [length_fn(item) for item in items]
+        results: List[Any] = [None] * len(items)
+        check_memory_budget(force=False)
+        for batch in self.plan(lengths):
+            outputs = fn([items[i] for i in batch])
+            for i, out in zip(batch, outputs):
+                results[i] = out
+            self.stats.record_batch([lengths[i] for i in batch])
+        self.stats.record_baseline(list(lengths), self.max_batch_size)
+        return results
+
+_schedulers: Dict[str, LengthBucketScheduler] = {}
+
+def get_scheduler(name: str, **kwargs) -> LengthBucketScheduler:
+    """Returns the process-wide scheduler for a model, creating it on first use."""
+    if name not in _schedulers:
+        _schedulers[name] = LengthBucketScheduler(name, **kwargs)
+    return _schedulers[name]
+
+def get_padding_stats() -> Dict[str, Dict[str, float]]:
+    """Padding-efficiency statistics for every scheduler used in this process."""
+    return {name: s.stats.to_dict() for name, s in _schedulers.items()}
@@ -0,0 +1,91 @@
+"""
+Latency-budget support for run_evaluation.
+
+Stage costs are estimated from recent timings (exponentially weighted moving
+averages), so the pipeline can decide before running a stage whether it fits
+in the time left. Groundedness is costed per (chunk, response) pair, which
+lets it be truncated to the top-scoring chunks rather than skipped outright.
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+from .profiling import total_model_load_ms
+
+# Conservative CPU starting points (ms), replaced by observed timings
+DEFAULT_STAGE_COSTS_MS = {
+    "toxicity": 0.05,
+    "cost": 0.01,
+    "relevance": 20.0,
+    "completeness": 20.0,
+    "retrieval": 2.0,  # Per context chunk (encoding chunks not already embedded)
+    "groundedness": 25.0,  # Per context chunk
+}
+
+# Stages whose cost scales with the number of context chunks
+PER_CHUNK_STAGES = {"retrieval", "groundedness"}
+
+class StageCostEstimator:
+    def __init__(self, alpha: float = 0.2, defaults: Optional[Dict[str, float]] = None):
+        self.alpha = alpha
+        self._estimates: Dict[str, float] = dict(defaults or DEFAULT_STAGE_COSTS_MS)
+        self.samples: Dict[str, int] = {}
+
+    def unit_cost(self, stage: str) -> float:
+        """Expected cost (ms) of one unit of the stage (one call, or one chunk)."""
+        return self._estimates.get(stage, 0.0)
+
+    def estimate(self, stage: str, chunks: int = 1) -> float:
+        """Expected cost (ms) of running the stage over `chunks` context chunks."""
+        units = chunks if stage in PER_CHUNK_STAGES else 1
+        return self.unit_cost(stage) * units
+
+    def affordable_units(self, stage: str, remaining_ms: float) -> int:
+        """How many units of the stage fit in the remaining budget."""
+        cost = self.unit_cost(stage)
+        if remaining_ms <= 0:
+            return 0
+        if cost <= 0:
+            return 1 << 30
+        return int(remaining_ms // cost)
+
+    def record(self, stage: str, elapsed_ms: float, units: int = 1) -> None:
+        """Folds an observed timing into the stage's moving average."""
+        if units <= 0:
+            return
+        observed = elapsed_ms / units
+        n = self.samples.get(stage, 0)
+        if n == 0:
+            # The first real observation replaces the default outright
+            self._estimates[stage] = observed
+        else:
+            self._estimates[stage] += self.alpha * (observed - self._estimates[stage])
+        self.samples[stage] = n + 1
+
+    @contextmanager
+    def timed(self, stage: str, units: int = 1):
+        """Times the enclosed block and records it, minus any model loading."""
+        start = time.perf_counter()
+        load_before = total_model_load_ms()
+        yield
+        # Model loading is a one-off and would inflate the estimate
+        elapsed = (time.perf_counter() - start) * 1000 - (total_model_load_ms() - load_before)
+        self.record(stage, elapsed, units)
+
+    def snapshot(self) -> Dict[str, float]:
+        return dict(self._estimates)
+
+_estimator = StageCostEstimator()
+
+def get_estimator() -> StageCostEstimator:
+    """Process-wide estimator shared by all evaluations."""
+    return _estimator
+
+def select_top_chunks(chunks: Sequence, k: int) -> List:
+    """
+    The k chunks with the highest retriever score. Chunks without a score
+    rank after scored ones, keeping their retrieval order.
+    """
+    ranked = sorted(range(len(chunks)),
+                    key=lambda i: (chunks[i].score is None, -(chunks[i].score or 0.0), i))
+    return [chunks[i] for i in ranked[:k]]
@@ -0,0 +1,116 @@
+"""
+Bounded in-process caches shared by the metrics.
+"""
+import sys
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import numpy as np
+
+_MISSING = object()
+
+def approx_sizeof(obj: Any) -> int:
+    """Approximate memory held by a cached key or value, in bytes."""
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes + 112  # Data plus the array object itself
+    if isinstance(obj, (tuple, list)):
+        return sys.getsizeof(obj) + sum(approx_sizeof(item) for item in obj)
+    return sys.getsizeof(obj)
+
+class LRUCache:
+    """
+    Least-recently-used mapping with a fixed maximum number of entries.
+    Unlike functools.lru_cache it supports lookups without computing, which
+    lets callers collect all misses first and fill them in one batched call.
+
+    Entry sizes are accounted in `nbytes`; with `max_bytes` the cache also
+    evicts to stay under a byte limit (see memory.MemoryBudget).
+    """
+
+    def __init__(self, maxsize: int = 1000, max_bytes: Optional[int] = None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._configured_max_bytes = _MISSING  # max_bytes before shrink_bytes(), until restore_caps()
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: "dict[Hashable, int]" = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if key in self._data:
+            self.nbytes -= self._sizes[key]
+        size = approx_sizeof(key) + approx_sizeof(value)
+        self._data[key] = value
+        self._sizes[key] = size
+        self.nbytes += size
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize or (
+                self.max_bytes is not None and self.nbytes > self.max_bytes and len(self._data) > 1):
+            self._evict_oldest()
+
+    def _evict_oldest(self) -> int:
+        key, _ = self._data.popitem(last=False)
+        size = self._sizes.pop(key)
+        self.nbytes -= size
+        self.evictions += 1
+        return size
+
+    def shrink_bytes(self, nbytes: int) -> int:
+        """
+        Evicts least-recently-used entries totalling at least `nbytes` and
+        lowers `max_bytes` so the cache does not grow back until
+        restore_caps(). Returns bytes freed.
+        """
+        if self._configured_max_bytes is _MISSING:
+            self._configured_max_bytes = self.max_bytes
+        freed = 0
+        while self._data and freed < nbytes:
+            freed += self._evict_oldest()
+        self.max_bytes = self.nbytes if self.max_bytes is None else min(self.max_bytes, self.nbytes)
+        return freed
+
+    def restore_caps(self) -> None:
+        """Puts back the byte limit shrink_bytes() lowered."""
+        if self._configured_max_bytes is not _MISSING:
+            self.max_bytes = self._configured_max_bytes
+            self._configured_max_bytes = _MISSING
+
+    def resize(self, maxsize: int) -> None:
+        """Changes the entry limit, evicting least-recently-used entries if needed."""
+        self.maxsize = maxsize
+        while len(self._data) > self.maxsize:
+            self._evict_oldest()
+
+    # dict-style access so existing `key in cache` / `cache[key]` call sites keep working
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.put(key, value)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
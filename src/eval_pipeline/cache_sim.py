@@ -0,0 +1,217 @@
+"""
+Offline cache sizing.
+
+Replays evaluation inputs through the same cache keys the metrics use (the
+embedding cache of relevance.encode_batch and the NLI cache keyed by
+groundedness._hash_text_pair) without running any model, and simulates
+each cache under several eviction policies and sizes:
+
+- "lru": what LRUCache does
+- "fifo": insertion order, hits do not refresh an entry
+- "lfu": least frequently used first, least recently used among ties
+- "opt": Belady's optimal policy (evicts the key reused furthest in the
+  future); no real cache does better, so it bounds what tuning can gain
+
+The hit rate at each size, times the inference time a hit saves, gives the
+curves that EMBEDDING_CACHE_SIZE and NLI_CACHE_SIZE are set from.
+Key streams follow response-level groundedness; claim-level keys depend on
+embedding similarities and cannot be derived without the encoder.
+"""
+import heapq
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence
+
+from pydantic import BaseModel
+
+from . import config
+from .autotune import load_profile
+from .chunk_store import fast_hash
+from .dedup import collapse_chunks
+from .metrics import relevance
+from .metrics.claims import split_claims
+from .metrics.completeness import split_aspects
+from .metrics.history import prior_turns
+from .metrics.groundedness import _hash_text_pair
+from .models import use_models
+from .targeting import select_target_pair
+from .tenants import get_tenant, model_overrides
+
+POLICIES = ("lru", "fifo", "lfu", "opt")
+CACHES = ("embeddings", "nli")
+# Rough CPU cost of one miss (ms per text / per pair, batched) when this host has no tuning profile
+DEFAULT_MISS_MS = {"embeddings": 2.0, "nli": 8.0}
+_PROFILE_MODELS = {"embeddings": "relevance", "nli": "groundedness"}
+
+def _embedding_key(text: str) -> Hashable:
+    # The cache key of relevance.encode_batch, with the text hashed to keep traces small
+    key = relevance._cache_key(text)
+    return fast_hash(key) if isinstance(key, str) else (key[0], fast_hash(key[1]))
+
+class KeyTrace:
+    """Cache lookups of a sequence of evaluations, in the order the pipeline makes them."""
+
+    def __init__(self):
+        self.keys: Dict[str, List[Hashable]] = {name: [] for name in CACHES}
+        self.evaluations = 0
+        self.skipped = 0  # Inputs without a target pair (no lookups)
+        self._history: Dict[str, int] = {}  # Conversation id -> turns in its history embedding
+
+    def _encode(self, texts: Sequence[str]) -> None:
+        # encode_batch looks each distinct text up once per call
+        self.keys["embeddings"].extend(_embedding_key(t) for t in dict.fromkeys(texts))
+
+    def add(self, data) -> None:
+        """Records the lookups run_evaluation makes for `data`."""
+        target = select_target_pair(data.conversation, data.context)
+        if not target:
+            self.skipped += 1
+            return
+        user_msg, ai_msg, context_key = target
+        chunks = data.context.entries.get(context_key, [])
+        with use_models(model_overrides(get_tenant(getattr(data, "tenant", None)))):
+            if config.RELEVANCE_MODE == "history":
+                # Only turns not yet in the conversation's history embedding are looked up
+                history = prior_turns(data.conversation, user_msg)
+                folded = self._history.get(data.conversation.id, -1)
+                start = folded if 0 <= folded <= len(history) else max(len(history) - config.HISTORY_MAX_TURNS, 0)
+                self._history[data.conversation.id] = len(history)
+                self._encode([user_msg.content, ai_msg.content] + history[start:])
+            else:
+                self._encode([user_msg.content, ai_msg.content])  # relevance
+            if config.COMPLETENESS_MODE != "aspects":
+                self._encode([user_msg.content, ai_msg.content])  # completeness
+            elif ai_msg.content and ai_msg.content.strip():
+                self._encode(split_aspects(user_msg.content) + split_claims(ai_msg.content))
+            if chunks and config.RETRIEVAL_METRICS:
+                self._encode([user_msg.content])  # retrieval: query, then chunks
+                self._encode([c.text for c in chunks])
+            if ai_msg.content and ai_msg.content.strip():
+                if config.DEDUP_CHUNKS:
+                    chunks = collapse_chunks(chunks).chunks
+                response_fp = fast_hash(ai_msg.content)
+                self.keys["nli"].extend(_hash_text_pair(c.text, ai_msg.content, None, response_fp)
+                                        for c in chunks)
+        self.evaluations += 1
+
+def _next_uses(keys: Sequence[Hashable]) -> List[int]:
+    # Index of the next access to the same key, or len(keys) if none
+    nxt = [len(keys)] * len(keys)
+    last: Dict[Hashable, int] = {}
+    for i in range(len(keys) - 1, -1, -1):
+        nxt[i] = last.get(keys[i], len(keys))
+        last[keys[i]] = i
+    return nxt
+
+def simulate(keys: Sequence[Hashable], policy: str, size: int,
+             next_uses: Optional[List[int]] = None) -> int:
+    """Hits of a `size`-entry cache under `policy` for the lookups `keys` (misses are inserted)."""
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown eviction policy: {policy}")
+    if size <= 0:
+        return 0
+    hits = 0
+    if policy in ("lru", "fifo"):
+        cache: "OrderedDict[Hashable, None]" = OrderedDict()
+        for key in keys:
+            if key in cache:
+                hits += 1
+                if policy == "lru":
+                    cache.move_to_end(key)
+                continue
+            cache[key] = None
+            if len(cache) > size:
+                cache.popitem(last=False)
+        return hits
+
+    # lfu and opt keep a heap of (priority, key) with stale entries skipped on eviction
+    heap: list = []
+    priority: Dict[Hashable, tuple] = {}
+    if policy == "opt" and next_uses is None:
+        next_uses = _next_uses(keys)
+    freq: Dict[Hashable, int] = {}
+    for i, key in enumerate(keys):
+        hit = key in priority
+        hits += hit
+        if policy == "lfu":
+            freq[key] = freq.get(key, 0) + 1 if hit else 1
+            entry = (freq[key], i)
+        else:
+            entry = (-next_uses[i], i)
+        if not hit and len(priority) >= size:
+            while True:
+                item = heapq.heappop(heap)
+                if priority.get(item[-1]) == item[:-1]:
+                    del priority[item[-1]]
+                    break
+        priority[key] = entry
+        heapq.heappush(heap, entry + (key,))
+    return hits
+
+def miss_cost_ms(cache: str) -> float:
+    """Inference time one miss costs, from this host's tuning profile when there is one."""
+    profile = load_profile()
+    model = _PROFILE_MODELS[cache]
+    measurements = [m for m in profile.measurements if m.model == model] if profile is not None else []
+    if not measurements:
+        return DEFAULT_MISS_MS[cache]
+    # Best per-item cost at each calibration length, averaged over lengths
+    per_length: Dict[int, float] = {}
+    for m in measurements:
+        per_length[m.length] = min(per_length.get(m.length, float("inf")), m.latency_ms / m.batch_size)
+    return sum(per_length.values()) / len(per_length)
+
+def default_sizes(unique_keys: int) -> List[int]:
+    """1-3-10 steps from 100 up to the size that holds every key."""
+    sizes = []
+    size = 100
+    while size < unique_keys:
+        sizes.append(size)
+        size = size * 3 if str(size)[0] == "1" else size * 10 // 3
+    sizes.append(max(unique_keys, 1))
+    return sizes
+
+class CurvePoint(BaseModel):
+    policy: str
+    size: int
+    hits: int
+    hit_rate: float
+    saved_ms: float
+
+class CacheSimulation(BaseModel):
+    cache: str
+    lookups: int
+    unique_keys: int  # Compulsory misses: even an unbounded cache misses each key once
+    max_hit_rate: float
+    miss_cost_ms: float
+    points: List[CurvePoint]
+
+    def hit_rate(self, policy: str, size: int) -> Optional[float]:
+        for point in self.points:
+            if point.policy == policy and point.size == size:
+                return point.hit_rate
+        return None
+
+    def smallest_size(self, policy: str = "lru", fraction: float = 0.95) -> Optional[int]:
+        """Smallest simulated size reaching `fraction` of the unbounded hit rate."""
+        for point in sorted((p for p in self.points if p.policy == policy), key=lambda p: p.size):
+            if point.hit_rate >= fraction * self.max_hit_rate:
+                return point.size
+        return None
+
+def simulate_cache(cache: str, keys: Sequence[Hashable], sizes: Optional[Iterable[int]] = None,
+                   policies: Iterable[str] = POLICIES, cost_ms: Optional[float] = None) -> CacheSimulation:
+    """Hit-rate curve of one cache's lookups across `sizes` and `policies`."""
+    unique = len(set(keys))
+    sizes = sorted(set(sizes)) if sizes else default_sizes(unique)
+    cost_ms = miss_cost_ms(cache) if cost_ms is None else cost_ms
+    next_uses = _next_uses(keys) if "opt" in policies else None
+    points = []
+    for policy in policies:
+        for size in sizes:
+            hits = simulate(keys, policy, size, next_uses)
+            points.append(CurvePoint(policy=policy, size=size, hits=hits,
+                                     hit_rate=hits / len(keys) if keys else 0.0,
+                                     saved_ms=hits * cost_ms))
+    return CacheSimulation(cache=cache, lookups=len(keys), unique_keys=unique,
+                           max_hit_rate=(len(keys) - unique) / len(keys) if keys else 0.0,
+                           miss_cost_ms=cost_ms, points=points)
@@ -0,0 +1,153 @@
+"""
+Checkpoints for resumable corpus runs.
+
+A checkpoint records how far a run got: the byte offset in the corpus, the
+state of the report sink, the run summary and status counts. It is written
+atomically (temp file, fsync, rename), always after the sink has made its
+reports durable. On resume the sink is rolled back to the checkpointed state
+and the corpus is read from the checkpointed offset, so records after the
+last checkpoint are evaluated again but never reported twice.
+
+Ids of completed records (the corpus "id" field) are appended to a sidecar
+file, `<checkpoint>.ids`, rather than rewritten into every checkpoint. The
+checkpoint stores the sidecar's length; ids past it are ignored on resume.
+A resumed run skips any record whose id is already there, even if the
+corpus was re-generated in a different order.
+"""
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+CHECKPOINT_VERSION = 1
+
+def _fsync_dir(path: Path) -> None:
+    # Makes a rename durable; not supported on every platform
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write_text(path: str, text: str) -> None:
+    """Replaces `path` with `text` so readers see either the old or the new file."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path.parent)
+
+class RunCheckpoint:
+    def __init__(self, corpus: str, output: str, format: str, offset: int = 0, line_no: int = 0,
+                 sink_state: Optional[Dict] = None, summary: Optional[Dict] = None,
+                 counts: Optional[Dict[str, int]] = None, ids_bytes: int = 0):
+        self.corpus = corpus
+        self.output = output
+        self.format = format
+        self.offset = offset  # Byte offset of the first record not yet reported
+        self.line_no = line_no
+        self.sink_state = sink_state or {}
+        self.summary = summary
+        self.counts = counts or {}
+        self.ids_bytes = ids_bytes
+        self.saved_at: Optional[float] = None
+
+    def matches(self, corpus: str, output: str, format: str) -> bool:
+        return (Path(self.corpus).resolve() == Path(corpus).resolve()
+                and Path(self.output).resolve() == Path(output).resolve()
+                and self.format == format)
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": CHECKPOINT_VERSION,
+            "corpus": self.corpus,
+            "output": self.output,
+            "format": self.format,
+            "offset": self.offset,
+            "line_no": self.line_no,
+            "sink_state": self.sink_state,
+            "summary": self.summary,
+            "counts": self.counts,
+            "ids_bytes": self.ids_bytes,
+            "saved_at": self.saved_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RunCheckpoint":
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {data.get('version')}")
+        checkpoint = cls(data["corpus"], data["output"], data["format"], offset=data["offset"],
+                         line_no=data["line_no"], sink_state=data["sink_state"],
+                         summary=data["summary"], counts=data["counts"], ids_bytes=data["ids_bytes"])
+        checkpoint.saved_at = data.get("saved_at")
+        return checkpoint
+
+    def save(self, path: str) -> None:
+        self.saved_at = time.time()
+        atomic_write_text(path, json.dumps(self.to_dict()))
+
+    @classmethod
+    def load(cls, path: str) -> "RunCheckpoint":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding='utf-8')))
+
+class CompletedIds:
+    """
+    Append-only sidecar of completed record ids. Membership is checked
+    against the ids loaded on resume only, so duplicate ids within one run
+    are still evaluated.
+    """
+
+    def __init__(self, path: str, resume_bytes: Optional[int] = None):
+        self.path = Path(path)
+        self.previous: Set[str] = set()
+        if resume_bytes is not None and self.path.exists():
+            with open(self.path, 'r+b') as f:
+                f.truncate(resume_bytes)  # Drop ids written after the checkpoint
+                f.seek(0)
+                self.previous.update(line.decode('utf-8') for line in f.read().splitlines() if line)
+            self._file = open(self.path, 'ab')
+        else:
+            self._file = open(self.path, 'wb')
+
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self.previous
+
+    def add(self, record_id: str) -> None:
+        self._file.write(record_id.replace("\n", " ").encode('utf-8') + b"\n")
+
+    def sync(self) -> int:
+        """Makes appended ids durable; returns the sidecar length to checkpoint."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self) -> None:
+        self._file.close()
+
+class CheckpointPolicy:
+    """Checkpoint every `every_records` reports or `every_seconds`, whichever comes first."""
+
+    def __init__(self, every_records: int = 1000, every_seconds: float = 60.0):
+        self.every_records = every_records
+        self.every_seconds = every_seconds
+        self._records = 0
+        self._last = time.monotonic()
+
+    def record_done(self) -> bool:
+        """Counts one report; True when a checkpoint is due."""
+        self._records += 1
+        return bool((self.every_records and self._records >= self.every_records)
+                    or (self.every_seconds and time.monotonic() - self._last >= self.every_seconds))
+
+    def reset(self) -> None:
+        self._records = 0
+        self._last = time.monotonic()
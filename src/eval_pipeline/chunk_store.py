@@ -0,0 +1,181 @@
+"""
+Knowledge-base chunk artifact store.
+
+The same clinic pages are retrieved for thousands of chats, so per-chunk work
+(hashing, tokenizing, embedding) is done once, offline, and stored by chunk id
+plus a content fingerprint. At request time the pipeline looks artifacts up
+instead of recomputing them.
+
+On disk a store is a directory of .npy arrays opened with mmap_mode="r", so
+several worker processes on one box share the same physical pages:
+
+    meta.json          count, embedding dim, encoder name
+    keys.npy           chunk ids (fixed-width unicode)
+    fingerprints.npy   uint64 content fingerprint (full-text hash) per chunk
+    tok_offsets.npy    int64 offsets into tokens.npy (count + 1 entries)
+    tokens.npy         int32 pre-tokenized ids, concatenated
+    embeddings.npy     float32 (count, dim) L2-normalized embeddings
+"""
+import hashlib
+import json
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from .schemas import ContextChunk
+
+STORE_VERSION = 2
+# Version 1 stores also hold probes.npy (length + head/tail hashes), no longer read
+_READABLE_VERSIONS = (1, 2)
+
+def fast_hash(text: str) -> int:
+    """64-bit content hash (blake2b, much cheaper than MD5 hexdigests)."""
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+class ChunkArtifact(NamedTuple):
+    fingerprint: int
+    token_ids: np.ndarray
+    embedding: np.ndarray
+
+class ChunkArtifactStore:
+    def __init__(self, path: str, keys: np.ndarray, fingerprints: np.ndarray,
+                 tok_offsets: np.ndarray, tokens: np.ndarray, embeddings: np.ndarray, meta: Dict):
+        self.path = Path(path)
+        self.meta = meta
+        self._fingerprints = fingerprints
+        self._tok_offsets = tok_offsets
+        self._tokens = tokens
+        self._embeddings = embeddings
+        self._rows: Dict[str, int] = {str(k): i for i, k in enumerate(keys)}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def open(cls, path: str, mmap: bool = True) -> "ChunkArtifactStore":
+        """Opens a store; arrays are memory-mapped read-only unless mmap=False."""
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("version") not in _READABLE_VERSIONS:
+            raise ValueError(f"Unsupported chunk store version: {meta.get('version')}")
+        mode = "r" if mmap else None
+
+        def load(name):
+            return np.load(path / f"{name}.npy", mmap_mode=mode)
+
+        return cls(path, load("keys"), load("fingerprints"),
+                   load("tok_offsets"), load("tokens"), load("embeddings"), meta)
+
+    @classmethod
+    def build(cls, path: str, chunks: Iterable[ContextChunk],
+              encode_fn: Callable[[List[str]], np.ndarray],
+              tokenize_fn: Callable[[str], List[int]],
+              encoder_name: str = "", batch_size: int = 256) -> "ChunkArtifactStore":
+        """
+        Builds a store from chunks with ids (later duplicates of an id are
+        ignored). `encode_fn` must return L2-normalized embeddings for a list
+        of texts; `tokenize_fn` returns token ids for one text.
+        """
+        unique: Dict[str, str] = {}
+        for chunk in chunks:
+            if chunk.id is not None and chunk.id not in unique:
+                unique[chunk.id] = chunk.text
+        ids = list(unique)
+        texts = [unique[i] for i in ids]
+
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        token_lists = [np.asarray(tokenize_fn(t), dtype=np.int32) for t in texts]
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(t) for t in token_lists])
+        tokens = np.concatenate(token_lists) if token_lists else np.zeros(0, dtype=np.int32)
+
+        dim = 0
+        embeddings = None
+        for start in range(0, len(texts), batch_size):
+            batch = np.asarray(encode_fn(texts[start:start + batch_size]), dtype=np.float32)
+            if embeddings is None:
+                dim = batch.shape[1]
+                # Written straight to disk so large stores never sit fully in RAM
+                embeddings = np.lib.format.open_memmap(
+                    path / "embeddings.npy", mode="w+", dtype=np.float32, shape=(len(texts), dim))
+            embeddings[start:start + len(batch)] = batch
+        if embeddings is None:
+            np.save(path / "embeddings.npy", np.zeros((0, 0), dtype=np.float32))
+        else:
+            embeddings.flush()
+            del embeddings
+
+        np.save(path / "keys.npy", np.array(ids, dtype=np.str_))
+        np.save(path / "fingerprints.npy", np.array([fast_hash(t) for t in texts], dtype=np.uint64))
+        np.save(path / "tok_offsets.npy", offsets)
+        np.save(path / "tokens.npy", tokens)
+        meta = {"version": STORE_VERSION, "count": len(texts), "dim": dim, "encoder": encoder_name}
+        (path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        return cls.open(str(path))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def row(self, chunk: ContextChunk) -> Optional[int]:
+        """
+        Row of the chunk in the store, or None if unknown or its content
+        changed. The full text is hashed: one pass over it, far cheaper than
+        the encode or tokenization the stored artifacts replace.
+        """
+        if chunk.id is None:
+            self.misses += 1
+            return None
+        row = self._rows.get(chunk.id)
+        if row is None or int(self._fingerprints[row]) != fast_hash(chunk.text):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row
+
+    def get(self, chunk: ContextChunk) -> Optional[ChunkArtifact]:
+        row = self.row(chunk)
+        if row is None:
+            return None
+        return ChunkArtifact(
+            fingerprint=int(self._fingerprints[row]),
+            token_ids=self._tokens[self._tok_offsets[row]:self._tok_offsets[row + 1]],
+            embedding=self._embeddings[row],
+        )
+
+    def fingerprint(self, chunk: ContextChunk) -> Optional[int]:
+        row = self.row(chunk)
+        return None if row is None else int(self._fingerprints[row])
+
+    def token_length(self, chunk: ContextChunk) -> Optional[int]:
+        row = self.row(chunk)
+        return None if row is None else int(self._tok_offsets[row + 1] - self._tok_offsets[row])
+
+    def embedding(self, chunk: ContextChunk) -> Optional[np.ndarray]:
+        row = self.row(chunk)
+        return None if row is None else self._embeddings[row]
+
+# Process-wide store used by the metrics; None means every artifact is computed
+_store: Optional[ChunkArtifactStore] = None
+
+def set_store(store: Optional[ChunkArtifactStore]) -> None:
+    global _store
+    _store = store
+
+def get_store() -> Optional[ChunkArtifactStore]:
+    return _store
+
+def open_store(path: str) -> ChunkArtifactStore:
+    """Memory-maps the store at `path` and makes it the process-wide store."""
+    store = ChunkArtifactStore.open(path)
+    set_store(store)
+    return store
+
+def chunk_fingerprint(chunk: ContextChunk) -> int:
+    """Content fingerprint of a chunk, from the store when possible."""
+    if _store is not None:
+        fingerprint = _store.fingerprint(chunk)
+        if fingerprint is not None:
+            return fingerprint
+    return fast_hash(chunk.text)
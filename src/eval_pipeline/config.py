@@ -7,10 +7,48 @@ Centralizes all configurable parameters for easy modification.
 RELEVANCE_MODEL = 'all-MiniLM-L6-v2'  # ~80MB, fast semantic similarity
 GROUNDEDNESS_MODEL = 'cross-encoder/nli-deberta-v3-small'  # NLI for hallucination detection
 
+# Groundedness granularity: "response" checks the whole response as one
+# hypothesis; "claims" checks each sentence against its most similar chunks.
+GROUNDEDNESS_MODE = "response"
+CLAIM_TOP_K = 3  # Candidate chunks per claim sent to NLI
+CLAIM_AGGREGATE = "min"  # "min" flags any unsupported claim; "mean" averages support
+CLAIM_SUPPORT_THRESHOLD = 0.5  # Claims below this count as unsupported
+
+# Near-duplicate chunks are collapsed before NLI (see dedup.py): "minhash"
+# compares word shingles; "vectors" compares the retriever's stored vectors,
+# which can also merge passages that differ in a number or name.
+DEDUP_CHUNKS = True
+DEDUP_METHOD = "minhash"
+DEDUP_JACCARD_THRESHOLD = 0.9  # Estimated shingle Jaccard at which chunks are duplicates
+DEDUP_COSINE_THRESHOLD = 0.98  # Stored-vector cosine at which chunks are duplicates
+DEDUP_CACHE_SIZE = 10000  # Chunk MinHash signatures kept
+
+# Completeness: "relevance" (default) is query-response similarity; "aspects"
+# checks that each part of the question is addressed by some response sentence.
+COMPLETENESS_MODE = "relevance"
+ASPECT_COVERAGE_THRESHOLD = 0.5  # Aspect-sentence similarity at which an aspect counts as covered
+MAX_ASPECTS = 8  # Aspects checked per query
+
+# Relevance: "turn" compares the target user message with the response;
+# "history" also scores the response against a decay-weighted embedding of
+# the earlier turns, so follow-up questions are judged in context.
+RELEVANCE_MODE = "turn"
+HISTORY_DECAY = 0.7  # Weight kept by the history per later turn
+HISTORY_RELEVANCE_WEIGHT = 0.3  # Share of the score from history-response similarity
+HISTORY_MAX_TURNS = 20  # Earlier turns encoded when a conversation's history is (re)built
+HISTORY_CACHE_SIZE = 10000  # Conversations whose history embedding is kept
+
 # Cache Configuration
 EMBEDDING_CACHE_SIZE = 1000  # LRU cache size for embeddings
 NLI_CACHE_SIZE = 5000  # Cache size for NLI predictions
 
+# Semantic (approximate) cache for groundedness: reuse the score of a
+# near-duplicate response for the same context set instead of running NLI.
+ENABLE_SEMANTIC_CACHE = False  # Off by default: trades exactness for speed
+SEMANTIC_CACHE_SIZE = 10000  # Max cached responses (one embedding each)
+SEMANTIC_CACHE_MAX_DISTANCE = 0.03  # Max cosine distance for a reuse
+SEMANTIC_CACHE_AUDIT_RATE = 0.05  # Fraction of approximate hits re-scored exactly to measure error
+
 # Cost Estimation (adjust based on your model/provider)
 COST_PER_1K_CHARS = 0.0001  # USD per 1000 characters
 
@@ -18,10 +56,34 @@ COST_PER_1K_CHARS = 0.0001  # USD per 1000 characters
 RELEVANCE_THRESHOLD = 0.7  # Minimum relevance score
 COMPLETENESS_THRESHOLD = 0.6  # Minimum completeness score
 GROUNDEDNESS_THRESHOLD = 0.5  # Minimum groundedness score
+CONTEXT_RELEVANCE_THRESHOLD = 0.35  # Query-chunk similarity at which a retrieved chunk counts as relevant
 
-# Performance Settings
+# Retrieval-quality metrics (see metrics/retrieval.py). Off by default: chunks
+# missing from the chunk store and embedding cache are encoded on every request.
+RETRIEVAL_METRICS = False
+
+# Performance Settings (defaults for engine.EngineConfig; a tuned host profile overrides them)
 ENABLE_CACHING = True  # Enable/disable caching for performance
 LAZY_MODEL_LOADING = True  # Load models only when needed
+BATCH_TOKEN_BUDGET = 8192  # Max padded tokens per model batch
+MAX_BATCH_SIZE = 64  # Max inputs per model batch
+TORCH_THREADS = None  # torch intra-op threads; None keeps torch's default
+ENGINE_PROFILE_DIR = None  # Where tuned host profiles are kept (default: ~/.cache/eval_pipeline)
+AUTOTUNE_LATENCY_TARGET_MS = 250  # Max latency of one model batch when auto-tuning
+MEMORY_BUDGET_MB = None  # Per-process RSS budget; caches shrink and batches halve near it
+MODEL_MEMORY_BUDGET_MB = None  # Max memory of loaded models; idle ones are unloaded beyond it
+
+# Multi-tenant settings: JSON mapping tenant name -> models and thresholds
+# overriding the defaults here (see tenants.py). Re-read when it changes.
+TENANTS_FILE = None
+
+# Queue scheduling (see scheduling.py)
+DEFAULT_PRIORITY = "normal"  # Class of records without a priority or urgent flags
+PRIORITY_AGING_S = 30.0  # Waiting this long moves a request up one priority class
+
+# Profiling (see stack_profiler.py; off unless started, e.g. run_eval.py --profile)
+PROFILE_INTERVAL_MS = 5.0  # Time between stack samples of a profiled thread
+PROFILE_FRACTION = 1.0  # Share of requests profiled; lower it for long-running workers
 
 # Logging
 LOG_LEVEL = "INFO"  # DEBUG, INFO, WARNING, ERROR
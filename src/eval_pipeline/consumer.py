@@ -0,0 +1,222 @@
+"""
+Queue-consumer runtime: evaluates records pulled from a Transport.
+
+A fetcher thread keeps a bounded prefetch buffer full, so the worker (the
+thread running inference) never waits on the queue. The fetcher only leases
+as many messages as there are free buffer slots. When inference falls
+behind, the buffer stays full and fetching pauses (backpressure): pending
+work stays in the durable queue, not in memory.
+
+Buffered messages are handed to the worker by a RequestScheduler
+(scheduling.py): urgent records first, with aging, and fair shares across
+tenants. The fetcher parses each body to classify it, so the worker gets
+the record already parsed.
+
+Reports are written to a sink. Acks are batched, and sent only after
+sink.checkpoint() has made the reports durable (fsync), so a crash can cause
+redelivery but never a lost report. The sink must support checkpoint()
+(JSONL, .npz or SQLite; see sinks.py), and a worker that restarts should
+append to its output, so queue_worker.py takes JSONL or SQLite. A worker
+that saves each checkpoint's state (`on_checkpoint`) can reopen its sink
+with `resume=` after a crash, dropping reports of messages it never acked. Each
+checkpoint ends the sink's current row group or transaction, so `ack_batch`
+also bounds how many reports those hold. Malformed records are
+dead-lettered at once; evaluation failures are retried by the transport
+until its attempt limit, then dead-lettered.
+"""
+import json
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import config
+from .aggregate import EvalReport, run_evaluation
+from .loader import load_record
+from .scheduling import RequestScheduler, priority_class
+from .sinks import ReportSink
+from .stack_profiler import profile_request, profile_stage
+from .transport import QueueMessage, Transport
+
+class ConsumerStats:
+    def __init__(self):
+        self.received = 0
+        self.processed = 0
+        self.acked = 0
+        self.ack_batches = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.backpressure_waits = 0  # Fetches postponed because the buffer was full
+        self.max_buffered = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(vars(self))
+
+class QueueConsumer:
+    def __init__(self, transport: Transport, sink: ReportSink, prefetch: int = 64,
+                 fetch_batch: int = 16, ack_batch: int = 32, ack_interval: float = 1.0,
+                 poll_interval: float = 0.2, trusted: bool = False,
+                 evaluate: Optional[Callable] = None, summary=None,
+                 scheduler: Optional[RequestScheduler] = None,
+                 on_checkpoint: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.transport = transport
+        self.sink = sink
+        self.prefetch = prefetch
+        self.fetch_batch = fetch_batch
+        self.ack_batch = ack_batch
+        self.ack_interval = ack_interval
+        self.poll_interval = poll_interval
+        self.trusted = trusted
+        self.evaluate = evaluate or run_evaluation
+        self.summary = summary
+        self.on_checkpoint = on_checkpoint
+        self.stats = ConsumerStats()
+        self.scheduler = scheduler or RequestScheduler()
+        self._pending_acks: List[int] = []
+        self._last_ack = time.monotonic()
+        self._stop = threading.Event()
+        self._queue_empty = threading.Event()
+        self._fetch_error: Optional[BaseException] = None
+        self._max_messages: Optional[int] = None
+
+    def stop(self) -> None:
+        """Stops fetching; run() drains the buffered messages and returns."""
+        self._stop.set()
+
+    def _fetch_loop(self) -> None:
+        try:
+            while not self._stop.is_set():
+                free = self.prefetch - self.scheduler.qsize()
+                if free <= 0:
+                    self.stats.backpressure_waits += 1
+                    time.sleep(self.poll_interval / 4)
+                    continue
+                if self._max_messages is not None:
+                    # Never lease more than run() will process
+                    free = min(free, self._max_messages - self.stats.received)
+                    if free <= 0:
+                        self._stop.wait(self.poll_interval)
+                        continue
+                messages = self.transport.receive(min(free, self.fetch_batch))
+                if not messages:
+                    self._queue_empty.set()
+                    time.sleep(self.poll_interval)
+                    continue
+                self._queue_empty.clear()
+                self.stats.received += len(messages)
+                for message in messages:
+                    # Never over capacity: only the worker takes from the buffer
+                    record, priority, tenant = self._classify(message)
+                    self.scheduler.put((message, record), priority, tenant)
+                self.stats.max_buffered = max(self.stats.max_buffered, self.scheduler.qsize())
+        except BaseException as e:
+            self._fetch_error = e
+            self._stop.set()
+
+    @staticmethod
+    def _classify(message: QueueMessage) -> Tuple[Any, str, Optional[str]]:
+        try:
+            record = json.loads(message.body)
+        except ValueError:
+            # load_record reports the parse error when the worker gets to it
+            return message.body, config.DEFAULT_PRIORITY, None
+        tenant = record.get("tenant") if isinstance(record, dict) else None
+        return record, priority_class(record), tenant
+
+    def _flush_acks(self) -> None:
+        if not self._pending_acks:
+            return
+        # Reports must be durable before their messages are acked
+        state = self.sink.checkpoint()
+        if self.on_checkpoint is not None:
+            self.on_checkpoint(state)
+        self.transport.ack(self._pending_acks)
+        self.stats.acked += len(self._pending_acks)
+        self.stats.ack_batches += 1
+        self._pending_acks = []
+        self._last_ack = time.monotonic()
+
+    def _write(self, report: EvalReport) -> None:
+        self.sink.write(report)
+        if self.summary is not None:
+            self.summary.update(report)
+
+    def _fail(self, message: QueueMessage, error: str, retry: bool) -> None:
+        if self.transport.nack(message.id, error, retry=retry):
+            self.stats.dead_lettered += 1
+            # The final failure is reported once, not on every attempt
+            self._write(EvalReport(status="failed", target_user_message="", target_ai_response="",
+                                   evaluated_at=time.time(), error=f"message {message.id}: {error}"))
+        else:
+            self.stats.retried += 1
+
+    def _process(self, message: QueueMessage, record: Any) -> None:
+        with profile_request():
+            try:
+                with profile_stage("loading"):
+                    data = load_record(record, trusted=self.trusted)
+            except ValueError as e:
+                # Malformed input will not get better on retry
+                self._fail(message, str(e), retry=False)
+                return
+            try:
+                report = self.evaluate(data)
+            except Exception as e:
+                self._fail(message, str(e), retry=True)
+                return
+        if report.status == "failed":
+            self._fail(message, report.error or "evaluation failed", retry=True)
+            return
+        self._write(report)
+        self._pending_acks.append(message.id)
+
+    def run(self, max_messages: Optional[int] = None, idle_timeout: Optional[float] = None) -> ConsumerStats:
+        """
+        Consumes until stop() is called, `max_messages` have been processed,
+        or the queue has been empty for `idle_timeout` seconds.
+        """
+        self._max_messages = max_messages
+        fetcher = threading.Thread(target=self._fetch_loop, name="queue-fetcher", daemon=True)
+        fetcher.start()
+        idle_since = None
+        try:
+            while True:
+                if max_messages is not None and self.stats.processed >= max_messages:
+                    break
+                try:
+                    message, record = self.scheduler.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    self._flush_acks()
+                    if self._stop.is_set():
+                        break
+                    if idle_timeout is not None and self._queue_empty.is_set():
+                        idle_since = idle_since or time.monotonic()
+                        if time.monotonic() - idle_since >= idle_timeout:
+                            break
+                    continue
+                idle_since = None
+                self._process(message, record)
+                self.stats.processed += 1
+                if (len(self._pending_acks) >= self.ack_batch
+                        or time.monotonic() - self._last_ack >= self.ack_interval):
+                    self._flush_acks()
+        finally:
+            # On an error, unacked messages are simply redelivered later
+            self._stop.set()
+            fetcher.join()
+        if self._fetch_error is not None:
+            self._flush_acks()
+            raise self._fetch_error
+        # Finish messages already leased rather than leaving them to time out;
+        # past max_messages, hand them back for immediate redelivery
+        unprocessed = []
+        while not self.scheduler.empty():
+            message, record = self.scheduler.get_nowait()
+            if max_messages is not None and self.stats.processed >= max_messages:
+                unprocessed.append(message.id)
+                continue
+            self._process(message, record)
+            self.stats.processed += 1
+        self._flush_acks()
+        self.transport.release(unprocessed)
+        return self.stats
@@ -0,0 +1,116 @@
+"""
+Near-duplicate context chunks, collapsed before NLI.
+
+Retrieved context often holds the same passage more than once (a page
+scraped under several URLs, overlapping windows), and groundedness pays one
+cross-encoder pass per chunk. Since it keeps the best entailment over
+chunks, near-identical premises add cost but almost never change the score,
+so each cluster of near-duplicates is checked through one representative.
+
+Chunks are compared by:
+- "minhash": estimated Jaccard similarity of their word 3-shingle sets
+  (NUM_PERM-value MinHash signatures, cached per chunk text);
+- "vectors": cosine similarity of the retriever's stored vectors. It is
+  cheaper, but embeddings can be close for passages that differ in the facts
+  NLI is checking (a price, a date), so it is opt-in.
+
+Either way, a long passage with one figure changed stays similar, and a
+reply citing the dropped copy's figure would lose its only premise. So two
+chunks are only duplicates if they also state the same facts: the same
+numbers (prices, dates, quantities) and month names, compared exactly.
+
+A request has tens of chunks, so all pairs are compared directly. Clusters
+are formed greedily in retriever-score order, so each representative is the
+best-ranked chunk of its cluster.
+"""
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from . import config
+from .budget import select_top_chunks
+from .cache import LRUCache
+from .chunk_store import fast_hash
+from .memory import register_cache
+from .metrics.retrieval import _stored_vectors
+from .schemas import ContextChunk
+
+METHODS = ("minhash", "vectors")
+NUM_PERM = 64
+SHINGLE_WORDS = 3
+
+# Multiply-add hash family over 64-bit shingle hashes (arithmetic wraps mod 2^64)
+_rng = np.random.default_rng(20240501)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+_FACT = re.compile(r"\d(?:[\d,.:/-]*\d)?|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\b",
+                   re.IGNORECASE)
+
+_signature_cache = LRUCache(maxsize=config.DEDUP_CACHE_SIZE)
+register_cache("dedup", _signature_cache)
+
+class DedupResult(BaseModel):
+    chunks: List[ContextChunk]  # One representative per cluster, in retrieval order
+    collapsed: int = 0  # Chunks dropped as near-duplicates of a representative
+    method: Optional[str] = None
+
+def _shingles(text: str) -> List[str]:
+    words = text.lower().split()
+    if len(words) <= SHINGLE_WORDS:
+        return [" ".join(words)]
+    return list({" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)})
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint64 values) of the text's word shingles."""
+    key = fast_hash(text)
+    signature = _signature_cache.get(key)
+    if signature is None:
+        shingles = _shingles(text)
+        # hash() is salted per process; signatures are only compared within one
+        hashes = np.fromiter((hash(s) for s in shingles), dtype=np.int64, count=len(shingles)).view(np.uint64)
+        signature = (_A[:, None] * hashes[None, :] + _B[:, None]).min(axis=1)
+        _signature_cache[key] = signature
+    return signature
+
+def facts(text: str) -> Tuple[str, ...]:
+    """Numbers and month names in the text, normalized and sorted; duplicates must agree on them."""
+    return tuple(sorted(match.replace(",", "").lower()[:3] if match[0].isalpha() else match.replace(",", "")
+                        for match in _FACT.findall(text)))
+
+def _similarities(chunks: Sequence[ContextChunk], method: str) -> Optional[np.ndarray]:
+    if method == "vectors":
+        vectors = _stored_vectors(list(chunks))
+        return vectors @ vectors.T if vectors is not None else None
+    signatures = np.stack([minhash(c.text) for c in chunks])
+    return (signatures[:, None, :] == signatures[None, :, :]).mean(axis=2)
+
+def collapse_chunks(chunks: Sequence[ContextChunk], method: Optional[str] = None,
+                    threshold: Optional[float] = None) -> DedupResult:
+    """
+    Clusters chunks whose similarity to a cluster's representative reaches
+    `threshold` and keeps the representatives. With method="vectors", chunks
+    without stored vectors of one size are left as they are.
+    """
+    method = method or config.DEDUP_METHOD
+    if method not in METHODS:
+        raise ValueError(f"Unknown dedup method: {method}")
+    if threshold is None:
+        threshold = config.DEDUP_COSINE_THRESHOLD if method == "vectors" else config.DEDUP_JACCARD_THRESHOLD
+    if len(chunks) < 2:
+        return DedupResult(chunks=list(chunks))
+    similarity = _similarities(chunks, method)
+    if similarity is None:
+        return DedupResult(chunks=list(chunks))
+
+    index = {id(chunk): i for i, chunk in enumerate(chunks)}
+    chunk_facts = [facts(c.text) for c in chunks]
+    representatives: List[int] = []
+    for chunk in select_top_chunks(chunks, len(chunks)):
+        i = index[id(chunk)]
+        if not any(similarity[i, r] >= threshold and chunk_facts[i] == chunk_facts[r] for r in representatives):
+            representatives.append(i)
+    kept = sorted(representatives)
+    return DedupResult(chunks=[chunks[i] for i in kept], collapsed=len(chunks) - len(kept), method=method)
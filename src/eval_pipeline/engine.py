@@ -0,0 +1,110 @@
+"""
+Runtime engine configuration.
+
+The performance knobs in config.py are only defaults. The engine
+configuration actually used by the metrics lives here: cache sizes (0 when
+caching is disabled), per-model batch scheduler limits and torch thread
+counts. It can be replaced at runtime, typically with a profile chosen by the
+auto-tuner for this host (see autotune.py).
+"""
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+from . import config
+from .batching import get_scheduler
+
+# Models scheduled through batching.get_scheduler
+BATCHED_MODELS = ("relevance", "groundedness")
+
+class BatchSettings(BaseModel):
+    token_budget: int = 8192  # Max padded tokens per batch
+    max_batch_size: int = 64
+
+class EngineConfig(BaseModel):
+    enable_caching: bool = True
+    lazy_model_loading: bool = True
+    embedding_cache_size: int = 1000
+    nli_cache_size: int = 5000
+    batching: Dict[str, BatchSettings] = {}
+    torch_threads: Optional[int] = None  # None leaves torch's default
+    torch_interop_threads: Optional[int] = None
+
+    @classmethod
+    def from_config(cls) -> "EngineConfig":
+        """The engine described by config.py."""
+        batch = BatchSettings(token_budget=config.BATCH_TOKEN_BUDGET, max_batch_size=config.MAX_BATCH_SIZE)
+        return cls(
+            enable_caching=config.ENABLE_CACHING,
+            lazy_model_loading=config.LAZY_MODEL_LOADING,
+            embedding_cache_size=config.EMBEDDING_CACHE_SIZE,
+            nli_cache_size=config.NLI_CACHE_SIZE,
+            batching={name: batch.model_copy() for name in BATCHED_MODELS},
+            torch_threads=config.TORCH_THREADS,
+        )
+
+    def cache_size(self, name: str) -> int:
+        """Entry limit for the "embeddings" or "nli" cache; 0 disables it."""
+        if not self.enable_caching:
+            return 0
+        return {"embeddings": self.embedding_cache_size, "nli": self.nli_cache_size}[name]
+
+    def batch_settings(self, model: str) -> BatchSettings:
+        return self.batching.get(model) or BatchSettings(token_budget=config.BATCH_TOKEN_BUDGET,
+                                                         max_batch_size=config.MAX_BATCH_SIZE)
+
+_engine: Optional[EngineConfig] = None
+
+def get_engine_config() -> EngineConfig:
+    global _engine
+    if _engine is None:
+        _engine = EngineConfig.from_config()
+    return _engine
+
+def model_scheduler(model: str):
+    """The batch scheduler for `model`, created with the engine's limits."""
+    return get_scheduler(model, **get_engine_config().batch_settings(model).model_dump())
+
+def set_torch_threads(threads: Optional[int], interop_threads: Optional[int] = None) -> bool:
+    """Applies torch thread counts; False when torch is not installed."""
+    try:
+        import torch
+    except ImportError:
+        return False
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            pass  # Can only be set before torch starts parallel work
+    return True
+
+def apply_engine_config(engine: EngineConfig) -> None:
+    """
+    Makes `engine` current: resizes the caches, updates the batch schedulers
+    and sets torch threads. Models already loaded are kept.
+    """
+    global _engine
+    _engine = engine
+    from .metrics import groundedness, relevance
+    relevance._embedding_cache.resize(engine.cache_size("embeddings"))
+    groundedness._nli_cache.resize(engine.cache_size("nli"))
+    for model in BATCHED_MODELS:
+        settings = engine.batch_settings(model)
+        batch_scheduler = get_scheduler(model)
+        batch_scheduler.token_budget = settings.token_budget
+        batch_scheduler.max_batch_size = settings.max_batch_size
+    set_torch_threads(engine.torch_threads, engine.torch_interop_threads)
+
+def startup(engine: Optional[EngineConfig] = None) -> EngineConfig:
+    """
+    Applies `engine` (default: the one from config.py) and, unless model
+    loading is lazy, loads and warms the models now.
+    """
+    engine = engine or EngineConfig.from_config()
+    apply_engine_config(engine)
+    if not engine.lazy_model_loading:
+        from .aggregate import warmup
+        warmup()
+    return engine
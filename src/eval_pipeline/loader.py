@@ -1,7 +1,15 @@
+import ast
+import glob
 import json
+import os
+import re
 from pathlib import Path
-from typing import Tuple, Dict, List, Any
-from .schemas import Conversation, ContextData, EvalInput, Message, ContextChunk
+from typing import Tuple, Dict, List, Any, Iterator, NamedTuple, Optional
+from .memory import track_stage
+from .schemas import (
+    Conversation, ContextData, EvalInput, Message, ContextChunk,
+    TrustedConversation, TrustedContextData, TrustedEvalInput, TrustedMessage, TrustedContextChunk,
+)
 
 # Try to import json5 for lenient parsing (handles trailing commas)
 try:
@@ -84,6 +92,23 @@ def normalize_conversation(conv_raw: Any) -> Dict:
     # Already in our format
     return conv_data
 
+def _retriever_scores(sources: Dict) -> Dict[str, float]:
+    """
+    Retriever scores keyed by chunk id, from the assignment format's
+    `sources.vectors_info` (a list, or its Python repr as a string).
+    """
+    info = sources.get('vectors_info') or []
+    if isinstance(info, str):
+        try:
+            info = ast.literal_eval(info)
+        except (ValueError, SyntaxError):
+            return {}
+    scores = {}
+    for entry in info:
+        if isinstance(entry, dict) and entry.get('vector_id') is not None and entry.get('score') is not None:
+            scores[str(entry['vector_id'])] = float(entry['score'])
+    return scores
+
 def normalize_context(context_raw: Any) -> Dict[str, List[Dict]]:
     """
     Normalizes context data from different formats to our standard schema.
@@ -92,15 +117,23 @@ def normalize_context(context_raw: Any) -> Dict[str, List[Dict]]:
     # Check if this is assignment format (has 'data' wrapper with 'vector_data')
     if isinstance(context_raw, dict) and 'data' in context_raw:
         vector_data = context_raw['data'].get('vector_data', [])
+        # Chunks carry no score themselves; the retriever's scores are in sources
+        retriever_scores = _retriever_scores(context_raw['data'].get('sources') or {})
         
         # Since assignment format doesn't have message_id mapping,
         # we'll create a generic key that can be matched later
         chunks = []
         for item in vector_data:
+            score = item.get('score')
+            if score is None and item.get('id') is not None:
+                score = retriever_scores.get(str(item['id']))
             chunk = {
                 'text': item.get('text', ''),
                 'vector': item.get('vector', []),
-                'score': item.get('score')
+                'score': score,
+                # Keep the KB chunk id so per-chunk artifacts can be looked up
+                'id': str(item['id']) if item.get('id') is not None else None,
+                'source_url': item.get('source_url')
             }
             chunks.append(chunk)
         
@@ -110,24 +143,157 @@ def normalize_context(context_raw: Any) -> Dict[str, List[Dict]]:
     # Already in our format (dict with message_id keys)
     return context_raw
 
-def load_data(conversation_path: str, context_path: str) -> EvalInput:
+def build_eval_input(conv_raw: Any, context_raw: Any, trusted: bool = False,
+                     tenant: Optional[str] = None) -> EvalInput:
+    """
+    Normalizes and validates already-parsed conversation and context payloads.
+    With trusted=True, validation is skipped and lightweight slotted objects
+    are built instead (see build_trusted_input).
+    """
+    # Normalize to our schema format
+    conv_data = normalize_conversation(conv_raw)
+    context_data = normalize_context(context_raw)
+    
+    if trusted:
+        return build_trusted_input(conv_data, context_data, tenant)
+    
+    # Validate against Pydantic schemas
+    conversation = Conversation(**conv_data)
+    context = ContextData(entries=context_data)
+
+    return EvalInput(conversation=conversation, context=context, tenant=tenant)
+
+def build_trusted_input(conv_data: Dict, context_data: Dict[str, List[Dict]],
+                        tenant: Optional[str] = None) -> TrustedEvalInput:
+    """
+    Builds the evaluation input without Pydantic validation, for trusted
+    internal traffic only. Normalized data is assumed to be well-formed;
+    malformed data fails later with a KeyError/AttributeError rather than a
+    validation error.
+    """
+    messages = [
+        TrustedMessage(m['role'], m['content'], m.get('id'), m.get('timestamp'))
+        for m in conv_data['messages']
+    ]
+    entries = {
+        key: [
+            TrustedContextChunk(c['text'], c.get('vector'), c.get('score'), c.get('id'), c.get('source_url'))
+            for c in chunks
+        ]
+        for key, chunks in context_data.items()
+    }
+    return TrustedEvalInput(TrustedConversation(str(conv_data['id']), messages), TrustedContextData(entries), tenant)
+
+def load_data(conversation_path: str, context_path: str, trusted: bool = False) -> EvalInput:
     """
     Loads conversation and context data from JSON files and validates them against schemas.
     Handles multiple input formats (mock data and assignment samples).
+    Strict validation is the default; pass trusted=True only for internal data.
     """
     try:
-        conv_raw = load_json(conversation_path)
-        context_raw = load_json(context_path)
-        
-        # Normalize to our schema format
-        conv_data = normalize_conversation(conv_raw)
-        context_data = normalize_context(context_raw)
-        
-        # Validate against Pydantic schemas
-        conversation = Conversation(**conv_data)
-        context = ContextData(entries=context_data)
-
-        return EvalInput(conversation=conversation, context=context)
+        with track_stage("load"):
+            conv_raw = load_json(conversation_path)
+            context_raw = load_json(context_path)
+            return build_eval_input(conv_raw, context_raw, trusted=trusted)
     
     except Exception as e:
         raise ValueError(f"Failed to load or validate input data: {e}")
+
+def iter_corpus(path: str) -> Iterator[Tuple[int, str]]:
+    """
+    Iterates a JSONL corpus for bulk runs, yielding (line_number, line).
+    Each line is an object with "conversation" and "context" payloads in
+    any format accepted by load_data, plus an optional "id". Blank lines
+    are skipped; parsing is left to load_record so one bad line does not
+    stop the run.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f):
+            if line.strip():
+                yield line_no, line
+
+def iter_corpus_offsets(path: str, offset: int = 0, line_no: int = 0) -> Iterator[Tuple[int, str, int]]:
+    """
+    Like iter_corpus, but starts at byte `offset` (which is line `line_no`)
+    and also yields the byte offset just past each line, so a run can be
+    checkpointed and resumed mid-file.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for raw in f:
+            offset += len(raw)
+            if raw.strip():
+                yield line_no, raw.decode('utf-8'), offset
+            line_no += 1
+
+# Archive file names: "<prefix>-conversation-<key>.json" pairs with "<prefix>_context_vectors-<key>.json"
+_CONVERSATION_FILE = re.compile(r"-conversation-(?P<key>.+)\.json$")
+_CONTEXT_FILE = re.compile(r"_context_vectors-(?P<key>.+)\.json$")
+
+class InputPair(NamedTuple):
+    key: str  # Pairing key: the conversation file name without ".json"
+    conversation: str
+    context: str
+
+def _iter_paths(target: str) -> Iterator[str]:
+    """Files under a directory (recursively), or matching a glob pattern."""
+    if os.path.isdir(target):
+        for root, _, files in os.walk(target):
+            for name in files:
+                yield os.path.join(root, name)
+    else:
+        yield from glob.iglob(target, recursive=True)
+
+def iter_input_pairs(target: str, unmatched: Optional[List[str]] = None) -> Iterator[InputPair]:
+    """
+    Discovers conversation / context file pairs in a directory or glob.
+    Files pair up within a directory by the key after "-conversation-" and
+    "_context_vectors-". Pairs are yielded as soon as both files are seen, so
+    only files still waiting for their partner are held in memory. Files left
+    without a partner are appended to `unmatched`.
+    """
+    pending: Dict[Tuple[str, str], Tuple[str, str]] = {}  # (dir, key) -> (kind, path)
+    for path in _iter_paths(target):
+        name = os.path.basename(path)
+        for kind, pattern in (("conversation", _CONVERSATION_FILE), ("context", _CONTEXT_FILE)):
+            match = pattern.search(name)
+            if match:
+                break
+        else:
+            continue
+        slot = (os.path.dirname(path), match.group("key"))
+        other = pending.get(slot)
+        if other is None or other[0] == kind:
+            if other is not None and unmatched is not None:
+                unmatched.append(other[1])  # Same key twice: keep the newer file
+            pending[slot] = (kind, path)
+            continue
+        del pending[slot]
+        conversation, context = (path, other[1]) if kind == "conversation" else (other[1], path)
+        yield InputPair(Path(conversation).stem, conversation, context)
+    if unmatched is not None:
+        unmatched.extend(path for _, path in pending.values())
+
+def load_pair(pair: InputPair, trusted: bool = False) -> EvalInput:
+    """
+    Like load_data for a discovered pair, without per-stage memory tracking,
+    so it can run on loader threads alongside evaluation.
+    """
+    try:
+        return build_eval_input(load_json(pair.conversation), load_json(pair.context), trusted=trusted)
+    except Exception as e:
+        raise ValueError(f"Failed to load or validate input data: {e}")
+
+def load_record(record: Any, trusted: bool = False) -> EvalInput:
+    """
+    Builds an EvalInput from one corpus record (a JSONL line or parsed dict).
+    An optional "tenant" field selects the tenant's models and thresholds.
+    """
+    try:
+        with track_stage("load"):
+            if isinstance(record, str):
+                record = json.loads(record)
+            return build_eval_input(record["conversation"], record["context"], trusted=trusted,
+                                    tenant=record.get("tenant"))
+    except Exception as e:
+        raise ValueError(f"Failed to load or validate input data: {e}")
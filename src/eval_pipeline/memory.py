@@ -0,0 +1,272 @@
+"""
+Memory instrumentation and the process-wide memory budget.
+
+Several workers share a box, so each one must stay under its share of RAM.
+The tracker records resident set size (RSS) around the loader and every
+metric stage, and can optionally take `tracemalloc` readings, which are
+precise but slow Python allocations down. Caches register here so their
+size in bytes can be reported.
+
+A `MemoryBudget` is checked after every stage and before every model batch.
+Once RSS crosses the high-water mark, it evicts from the registered caches,
+largest first, until usage is back under the low-water mark, and caps each
+cache at its shrunken size. While the pressure lasts, batch schedulers halve
+their token budgets, because activation memory grows with batch size. Once
+RSS falls below the low-water mark, the caches get their configured caps
+back.
+"""
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from . import config
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:  # Windows
+    HAS_RESOURCE = False
+
+MB = 1024 * 1024
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, or None if it cannot be read."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if HAS_PSUTIL:
+        return psutil.Process().memory_info().rss
+    return None
+
+def peak_rss_bytes() -> Optional[int]:
+    """Highest resident set size this process has reached."""
+    if HAS_RESOURCE:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+    if HAS_PSUTIL:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss)
+    return None
+
+def to_mb(nbytes: Optional[int]) -> Optional[float]:
+    return None if nbytes is None else round(nbytes / MB, 2)
+
+# Registered caches: anything with `nbytes`, `shrink_bytes(n) -> freed` and `restore_caps()`
+_caches: Dict[str, Any] = {}
+
+def register_cache(name: str, cache: Any) -> None:
+    """Accounts `cache` under `name`; re-registering a name replaces it."""
+    _caches[name] = cache
+
+def unregister_cache(name: str) -> None:
+    _caches.pop(name, None)
+
+def cache_bytes() -> Dict[str, int]:
+    """Bytes held by each registered cache."""
+    return {name: int(cache.nbytes) for name, cache in _caches.items()}
+
+class StageMemory:
+    """
+    Memory readings for one stage, aggregated over every time it ran. RSS is
+    read when the stage returns, so a transient spike inside the stage shows
+    up only in the traced peak (Python allocations) or the process peak.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.max_rss_after = 0
+        self.max_rss_delta = 0
+        self.max_traced_peak: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Optional[float]]:
+        return {
+            "calls": self.calls,
+            "max_rss_after_mb": to_mb(self.max_rss_after),
+            "max_rss_delta_mb": to_mb(self.max_rss_delta),
+            "max_traced_peak_mb": to_mb(self.max_traced_peak),
+        }
+
+class MemoryTracker:
+    def __init__(self):
+        self.stages: Dict[str, StageMemory] = {}
+        self.snapshots: Dict[str, List[str]] = {}
+        self.tracing = False
+
+    def enable_tracemalloc(self, frames: int = 1) -> None:
+        """Also record the traced Python allocation peak of each stage."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.tracing = True
+
+    def disable_tracemalloc(self) -> None:
+        if self.tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.tracing = False
+
+    @contextmanager
+    def track(self, stage: str):
+        """
+        Records RSS after `stage` and its growth during it. With tracemalloc
+        enabled, also records the stage's allocation peak above what was
+        already allocated (stages are not expected to nest).
+        """
+        before = rss_bytes() or 0
+        traced_before = 0
+        if self.tracing:
+            traced_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            after = rss_bytes() or 0
+            stats = self.stages.setdefault(stage, StageMemory())
+            stats.calls += 1
+            stats.max_rss_after = max(stats.max_rss_after, after)
+            stats.max_rss_delta = max(stats.max_rss_delta, after - before)
+            if self.tracing and tracemalloc.is_tracing():
+                peak = tracemalloc.get_traced_memory()[1] - traced_before
+                stats.max_traced_peak = max(stats.max_traced_peak or 0, peak)
+
+    def snapshot(self, label: str, limit: int = 10) -> List[str]:
+        """Top allocation sites by size, kept under `label` (needs tracemalloc)."""
+        if not tracemalloc.is_tracing():
+            return []
+        top = tracemalloc.take_snapshot().statistics("lineno")[:limit]
+        self.snapshots[label] = [str(stat) for stat in top]
+        return self.snapshots[label]
+
+    def to_dict(self) -> Dict[str, Dict[str, Optional[float]]]:
+        return {stage: stats.to_dict() for stage, stats in self.stages.items()}
+
+    def reset(self) -> None:
+        self.stages.clear()
+        self.snapshots.clear()
+
+_tracker = MemoryTracker()
+
+def get_tracker() -> MemoryTracker:
+    return _tracker
+
+def track_stage(stage: str):
+    """Context manager recording memory for `stage` on the process-wide tracker."""
+    return _tracker.track(stage)
+
+# Scale applied to batch token budgets; lowered while the memory budget is under pressure
+_batch_scale = 1.0
+
+def batch_scale() -> float:
+    return _batch_scale
+
+class MemoryBudget:
+    """
+    Keeps RSS under `limit_bytes`. Enforcement starts at `high_water` of the
+    limit and frees enough to get back to `low_water`.
+    """
+
+    def __init__(self, limit_bytes: int, high_water: float = 0.9, low_water: float = 0.75,
+                 pressure_batch_scale: float = 0.5):
+        if not 0 < low_water <= high_water <= 1:
+            raise ValueError("Need 0 < low_water <= high_water <= 1")
+        self.limit_bytes = limit_bytes
+        self.high_water = high_water
+        self.low_water = low_water
+        self.pressure_batch_scale = pressure_batch_scale
+        self.under_pressure = False
+        self.enforcements = 0
+        self.bytes_evicted = 0
+        self.last_rss: Optional[int] = None
+
+    def check(self) -> bool:
+        """Reads RSS and enforces the budget if needed; True while under pressure."""
+        rss = rss_bytes()
+        self.last_rss = rss
+        if rss is None:
+            return False
+        if rss > self.high_water * self.limit_bytes:
+            self.enforce(rss)
+        elif self.under_pressure and rss < self.low_water * self.limit_bytes:
+            self._set_pressure(False)
+        return self.under_pressure
+
+    def enforce(self, rss: int) -> int:
+        """Evicts cache entries, largest cache first, to get RSS back to the low-water mark."""
+        self.enforcements += 1
+        self._set_pressure(True)
+        excess = rss - int(self.low_water * self.limit_bytes)
+        freed = 0
+        for name, cache in sorted(_caches.items(), key=lambda item: -item[1].nbytes):
+            if freed >= excess:
+                break
+            freed += cache.shrink_bytes(excess - freed)
+        self.bytes_evicted += freed
+        return freed
+
+    def _set_pressure(self, on: bool) -> None:
+        global _batch_scale
+        if self.under_pressure and not on:
+            for cache in _caches.values():
+                cache.restore_caps()
+        self.under_pressure = on
+        _batch_scale = self.pressure_batch_scale if on else 1.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "limit_mb": to_mb(self.limit_bytes),
+            "under_pressure": self.under_pressure,
+            "enforcements": self.enforcements,
+            "evicted_mb": to_mb(self.bytes_evicted),
+            "last_rss_mb": to_mb(self.last_rss),
+        }
+
+_budget: Optional[MemoryBudget] = None
+_last_check = 0.0
+# Minimum seconds between RSS reads when checking before every batch
+CHECK_INTERVAL_S = 0.05
+
+def set_memory_budget(limit_mb: Optional[float], **kwargs) -> Optional[MemoryBudget]:
+    """Installs (or with None removes) the process-wide memory budget."""
+    global _budget, _batch_scale
+    _budget = MemoryBudget(int(limit_mb * MB), **kwargs) if limit_mb else None
+    _batch_scale = 1.0
+    return _budget
+
+def get_memory_budget() -> Optional[MemoryBudget]:
+    return _budget
+
+def check_memory_budget(force: bool = True) -> bool:
+    """
+    Enforces the budget if one is set. Without `force`, RSS is read at most
+    every CHECK_INTERVAL_S, so hot paths can call this cheaply.
+    """
+    global _last_check
+    if _budget is None:
+        return False
+    now = time.monotonic()
+    if not force and now - _last_check < CHECK_INTERVAL_S:
+        return _budget.under_pressure
+    _last_check = now
+    return _budget.check()
+
+def memory_report() -> Dict[str, Any]:
+    """Process memory, per-stage readings, cache sizes and budget state."""
+    return {
+        "rss_mb": to_mb(rss_bytes()),
+        "peak_rss_mb": to_mb(peak_rss_bytes()),
+        "stages": _tracker.to_dict(),
+        "cache_mb": {name: to_mb(n) for name, n in cache_bytes().items()},
+        "budget": _budget.to_dict() if _budget else None,
+    }
+
+if config.MEMORY_BUDGET_MB:
+    set_memory_budget(config.MEMORY_BUDGET_MB)
@@ -0,0 +1,137 @@
+"""
+Claim-level groundedness.
+
+Scoring the whole response as one NLI hypothesis lets a single hallucinated
+sentence hide among supported ones. Here the response is split into claims
+(sentences and list items) and each claim is checked on its own. Running NLI
+for every claim × chunk pair would multiply the cross-encoder cost, so claims
+and chunks are embedded together first, and each claim is only paired with
+its `top_k` most similar chunks. The surviving pairs go through one batched
+NLI pass, sharing the exact-pair cache with response-level groundedness.
+"""
+import re
+from typing import List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from .. import config
+from ..chunk_store import fast_hash, get_store
+from ..schemas import ContextChunk
+from . import relevance
+from .groundedness import GroundednessResult, _hash_text_pair, _nli_cache, _predict_entailment
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+# A trailing word that ends in a period without ending the sentence
+_ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "prof", "st", "vs", "etc", "e.g", "i.e", "no", "approx"}
+MIN_CLAIM_WORDS = 3
+
+class ClaimScore(BaseModel):
+    text: str
+    support: float  # Best entailment probability over the candidate chunks
+    chunk_index: Optional[int] = None  # Index of the supporting chunk in the context
+
+class ClaimGroundednessResult(GroundednessResult):
+    claims: List[ClaimScore] = []
+    unsupported: int = 0  # Claims below the support threshold (CLAIM_SUPPORT_THRESHOLD)
+    pairs_scored: int = 0  # Claim-chunk pairs sent to (or found in the cache of) the NLI model
+    pairs_pruned: int = 0  # Pairs skipped by the embedding top-k
+
+def split_claims(text: str) -> List[str]:
+    """
+    Splits a response into sentence- and list-item-level claims. Fragments
+    shorter than MIN_CLAIM_WORDS words ("Sure!", "Hope this helps.") carry no
+    checkable fact and are dropped. A response with no such claim is kept whole.
+    """
+    pieces = [_BULLET.sub("", p).strip() for p in _SENTENCE_END.split(text)]
+    claims: List[str] = []
+    for piece in pieces:
+        if not piece:
+            continue
+        last = claims[-1].rsplit(None, 1)[-1].rstrip(".").lower() if claims else ""
+        if last in _ABBREVIATIONS or (len(last) == 1 and last.isalpha()):
+            claims[-1] = f"{claims[-1]} {piece}"  # "Dr. Rao" or "J. Smith": not a sentence end
+        else:
+            claims.append(piece)
+    claims = [c for c in claims if len(c.split()) >= MIN_CLAIM_WORDS]
+    return claims or [text.strip()]
+
+def _aggregate(supports: List[float], method: str) -> float:
+    if method == "min":
+        return float(min(supports))
+    if method == "mean":
+        return float(np.mean(supports))
+    raise ValueError(f"Unknown claim aggregate: {method}")
+
+def evaluate_claims(ai_response: str, context_chunks: List[ContextChunk],
+                    top_k: Optional[int] = None, aggregate: Optional[str] = None,
+                    support_threshold: Optional[float] = None) -> ClaimGroundednessResult:
+    """
+    Scores each claim of the response against its top-k most similar chunks.
+    The overall score aggregates the claim supports: "min" (default) makes a
+    single unsupported claim visible, "mean" reports the average support.
+    """
+    top_k = top_k or config.CLAIM_TOP_K
+    aggregate = aggregate or config.CLAIM_AGGREGATE
+    if support_threshold is None:
+        support_threshold = config.CLAIM_SUPPORT_THRESHOLD
+    if not context_chunks or not ai_response or not ai_response.strip():
+        return ClaimGroundednessResult(score=0.0)
+
+    claims = split_claims(ai_response)
+    if get_store() is None:
+        # One encoder pass for claims and chunks together
+        embeddings = relevance.encode_batch(claims + [c.text for c in context_chunks])
+        claim_vecs, chunk_vecs = embeddings[:len(claims)], embeddings[len(claims):]
+    else:
+        # Stored chunk embeddings are read instead of re-encoded
+        claim_vecs, chunk_vecs = relevance.encode_batch(claims), relevance.encode_chunks(context_chunks)
+
+    k = min(top_k, len(context_chunks))
+    similarity = claim_vecs @ chunk_vecs.T
+    if k < len(context_chunks):
+        candidates = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(len(context_chunks)), (len(claims), k))
+
+    # Collect uncached pairs across all claims for a single batched NLI call
+    chunk_fingerprints = [fast_hash(c.text) for c in context_chunks]
+    pair_keys: List[List[str]] = []
+    entailment = {}
+    uncached_keys, uncached_pairs = [], []
+    for claim, row in zip(claims, candidates):
+        claim_fp = fast_hash(claim)
+        keys = []
+        for j in row:
+            key = _hash_text_pair(context_chunks[j].text, claim, chunk_fingerprints[j], claim_fp)
+            keys.append(key)
+            if key in entailment:
+                continue
+            cached = _nli_cache.get(key)
+            if cached is None:
+                entailment[key] = None
+                uncached_keys.append(key)
+                uncached_pairs.append((context_chunks[j].text, claim))
+            else:
+                entailment[key] = cached
+        pair_keys.append(keys)
+
+    if uncached_pairs:
+        for key, prob in zip(uncached_keys, _predict_entailment(uncached_pairs)):
+            _nli_cache[key] = prob
+            entailment[key] = prob
+
+    scores = []
+    for claim, row, keys in zip(claims, candidates, pair_keys):
+        probs = [entailment[key] for key in keys]
+        best = int(np.argmax(probs))
+        scores.append(ClaimScore(text=claim, support=float(probs[best]), chunk_index=int(row[best])))
+    supports = [c.support for c in scores]
+    return ClaimGroundednessResult(
+        score=_aggregate(supports, aggregate),
+        claims=scores,
+        unsupported=sum(s < support_threshold for s in supports),
+        pairs_scored=len(claims) * k,
+        pairs_pruned=len(claims) * (len(context_chunks) - k),
+    )
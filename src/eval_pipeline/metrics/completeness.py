@@ -1,15 +1,113 @@
-from .relevance import score_relevance
+"""
+Completeness: did the response address every part of the question?
+
+The query is split into aspects: its questions, or its sentences when it
+asks none, with lists split into their items. Only real lists are split:
+bulleted or numbered lines, and enumerations whose last item is joined with
+"and" ("travel, hotels and costs"); bare commas ("Hello, how are you?")
+separate clauses. The response is split into sentences as for claim-level
+groundedness. Both sides are embedded in one encode call, and an aspect
+counts as covered when some response sentence is similar enough to it
+(ASPECT_COVERAGE_THRESHOLD). The score is the fraction of aspects covered.
+"""
+import re
+from typing import List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from .. import config
+from .claims import split_claims
+from .relevance import encode_batch, score_relevance
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+# List separators: commas and "and" (not "or", which joins alternatives of one question)
+_ENUMERATION = re.compile(r"\s*,\s*(?:and\s+)?|\s+(?:and|&)\s+")
+_BULLET = re.compile(r"^\s*(?:[-*\u2022]|\d+[.)])\s+")
+MAX_ITEM_WORDS = 3  # Longer pieces after a separator are clauses, not list items
+
+class AspectScore(BaseModel):
+    text: str
+    coverage: float  # Best similarity to a response sentence
+    sentence_index: Optional[int] = None  # Index of that sentence in the split response
+
+class CompletenessResult(BaseModel):
+    score: float
+    aspects: List[AspectScore] = []
+    covered: int = 0
+
+def _split_enumeration(sentence: str) -> List[str]:
+    separators = _ENUMERATION.findall(sentence)
+    if not separators or separators[-1].strip(" ,") not in ("and", "&"):
+        return [sentence]
+    parts = [p.strip(" ?.!") for p in _ENUMERATION.split(sentence)]
+    parts = [p for p in parts if p]
+    # The first piece carries the question stem ("Tell me about travel"), the rest are items
+    if len(parts) > 1 and all(len(p.split()) <= MAX_ITEM_WORDS for p in parts[1:]):
+        return parts
+    return [sentence]
+
+def split_aspects(query: str, max_aspects: Optional[int] = None) -> List[str]:
+    """Splits a query into the aspects a complete answer has to address."""
+    max_aspects = max_aspects or config.MAX_ASPECTS
+    sentences: List[str] = []
+    items: List[str] = []
+    for line in query.splitlines():
+        bullet = _BULLET.match(line)
+        if bullet:
+            items.append(line[bullet.end():].strip())
+        else:
+            sentences.extend(s.strip() for s in _SENTENCE_END.split(line) if s.strip())
+    questions = [s for s in sentences if s.endswith("?")]
+    aspects: List[str] = []
+    # With a bulleted list, the items are the aspects and a lead-in statement is not
+    for sentence in questions or ([] if items else sentences):
+        aspects.extend(_split_enumeration(sentence))
+    aspects.extend(item for item in items if item)
+    aspects = list(dict.fromkeys(aspects))[:max_aspects]
+    return aspects or [query.strip()]
+
+def _length_penalty(user_query: str, ai_response: str) -> float:
+    # A very short answer (< 20 chars) to a long query is penalized
+    return 0.5 if len(ai_response) < 20 and len(user_query) > 20 else 1.0
+
+def evaluate_completeness(user_query: str, ai_response: str,
+                          threshold: Optional[float] = None) -> CompletenessResult:
+    """
+    Aspect coverage of the response, with the per-aspect best matches.
+    Adds one encode call (aspects and sentences together) per evaluation;
+    single-sentence queries and responses are already in the embedding cache
+    from relevance.
+    """
+    if threshold is None:
+        threshold = config.ASPECT_COVERAGE_THRESHOLD
+    if not ai_response or not ai_response.strip():
+        return CompletenessResult(score=0.0)
+    aspects = split_aspects(user_query)
+    sentences = split_claims(ai_response)
+    embeddings = encode_batch(aspects + sentences)
+    similarity = embeddings[:len(aspects)] @ embeddings[len(aspects):].T
+    best = np.argmax(similarity, axis=1)
+    coverage = similarity[np.arange(len(aspects)), best]
+    covered = int(np.sum(coverage >= threshold))
+    return CompletenessResult(
+        score=covered / len(aspects) * _length_penalty(user_query, ai_response),
+        aspects=[AspectScore(text=a, coverage=float(c), sentence_index=int(i))
+                 for a, c, i in zip(aspects, coverage, best)],
+        covered=covered,
+    )
 
 def score_completeness(user_query: str, ai_response: str) -> float:
     """
-    Estimates completeness.
-    Ideally requires NLI or intent breakdown.
-    For this assignment, we use a length/keyword heuristic combined with relevance.
-    If relevance is high, we assume reasonable completeness for chat.
+    Estimates completeness, between 0.0 and 1.0.
+    With COMPLETENESS_MODE = "relevance" (default), query-response relevance
+    is the baseline, which does not tell whether a multi-part question was
+    fully answered. With "aspects" this is the fraction of query aspects
+    covered by the response (see evaluate_completeness).
     """
+    if config.COMPLETENESS_MODE == "aspects":
+        return evaluate_completeness(user_query, ai_response).score
     # Simple proxy: Relevance score is the baseline. 
     # If response is too short (< 20 chars) but query is long, penalize.
     rel = score_relevance(user_query, ai_response)
-    if len(ai_response) < 20 and len(user_query) > 20:
-        return rel * 0.5
-    return rel
+    return rel * _length_penalty(user_query, ai_response)
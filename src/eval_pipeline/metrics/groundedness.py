@@ -1,27 +1,115 @@
-from sentence_transformers import CrossEncoder
-from typing import List
-from functools import lru_cache
-import hashlib
+from typing import List, Optional
+import time
+from pydantic import BaseModel
+from .. import config
+from ..batching import tokenizer_length_fn
+from ..cache import LRUCache
+from ..chunk_store import fast_hash, get_store
+from ..dedup import facts
+from ..engine import get_engine_config, model_scheduler
+from ..memory import register_cache, unregister_cache
+from ..models import ModelKey, active_key, get_registry, scoped_model
 from ..schemas import ContextChunk
+from ..semantic_cache import SemanticCache, context_fingerprint
+from . import relevance
 
 # Load model once
-MODEL_NAME = 'cross-encoder/nli-deberta-v3-small'
+MODEL_NAME = config.GROUNDEDNESS_MODEL
+DEFAULT_KEY = ModelKey(MODEL_NAME, "cross-encoder")
 _model = None
 
 def get_model():
-    """Lazy-load the NLI model to save memory when not needed."""
+    """
+    Lazy-load the NLI model to save memory when not needed.
+    The CrossEncoder import is deferred too, since it pulls in torch.
+    A tenant's own NLI model comes from the model registry instead.
+    """
     global _model
+    model = scoped_model("groundedness")
+    if model is not None:
+        return model
     if _model is None:
-        _model = CrossEncoder(MODEL_NAME)
+        _model = get_registry().acquire(DEFAULT_KEY)
     return _model
 
-def _hash_text_pair(text1: str, text2: str) -> str:
-    """Create a hash key for caching NLI predictions."""
-    combined = f"{text1}||{text2}"
-    return hashlib.md5(combined.encode()).hexdigest()
+def _hash_text_pair(text1: str, text2: str, text1_fingerprint: Optional[int] = None,
+                    text2_fingerprint: Optional[int] = None) -> str:
+    """
+    Create a hash key for caching NLI predictions.
+    Precomputed fingerprints (e.g. a chunk's from the chunk store) skip
+    rehashing the full text. Predictions of a tenant's own NLI model get
+    keys of their own.
+    """
+    fp1 = fast_hash(text1) if text1_fingerprint is None else text1_fingerprint
+    fp2 = fast_hash(text2) if text2_fingerprint is None else text2_fingerprint
+    key = active_key("groundedness")
+    prefix = "" if key is None else f"{key.name}|{key.precision}|"
+    return f"{prefix}{fp1:016x}{fp2:016x}"
 
 # Cache for NLI predictions to avoid recomputing for same context-response pairs
-_nli_cache = {}
+_nli_cache = LRUCache(maxsize=get_engine_config().cache_size("nli"))
+register_cache("nli", _nli_cache)
+
+def _predict_entailment(pairs: List[tuple], lengths: Optional[List[int]] = None) -> List[float]:
+    """
+    Runs the cross-encoder over (premise, hypothesis) pairs in length-bucketed
+    batches and returns the entailment probability for each pair, in order.
+    Pair token lengths are computed with the tokenizer unless given.
+    """
+    model = get_model()
+
+    def _predict(batch):
+        # CrossEncoder output for nli-deberta-v3-small:
+        # [contradiction_score, entailment_score, neutral_score]
+        scores = model.predict(batch, batch_size=len(batch), apply_softmax=True)
+        return [float(row[1]) for row in scores]  # Index 1 is Entailment
+
+    return model_scheduler("groundedness").run(pairs, _predict, tokenizer_length_fn(model), lengths=lengths)
+
+def _pair_length_fn(ai_response: str):
+    """
+    Token length of (chunk, response) pairs using stored chunk token counts,
+    falling back to the tokenizer for chunks missing from the store.
+    """
+    model = get_model()
+    length = tokenizer_length_fn(model)
+    max_length = getattr(model, "max_length", None) or 512
+    response_length = length(ai_response)
+
+    def pair_length(chunk: ContextChunk, artifact) -> int:
+        if artifact is None:
+            return length((chunk.text, ai_response))
+        return min(len(artifact.token_ids) + response_length, max_length)
+
+    return pair_length
+
+class GroundednessResult(BaseModel):
+    score: float
+    approximate: bool = False  # Score reused from a near-duplicate response (semantic cache)
+    approx_distance: Optional[float] = None  # Cosine distance to that response
+
+# Approximate cache keyed by response embedding; None when disabled
+_semantic_cache: Optional[SemanticCache] = None
+
+def configure_semantic_cache(enabled: bool = True,
+                             max_distance: float = config.SEMANTIC_CACHE_MAX_DISTANCE,
+                             max_entries: int = config.SEMANTIC_CACHE_SIZE,
+                             audit_rate: float = config.SEMANTIC_CACHE_AUDIT_RATE) -> Optional[SemanticCache]:
+    """Enables (or disables) reuse of groundedness scores for near-duplicate responses."""
+    global _semantic_cache
+    _semantic_cache = SemanticCache(max_entries=max_entries, max_distance=max_distance,
+                                    audit_rate=audit_rate) if enabled else None
+    if _semantic_cache is None:
+        unregister_cache("semantic")
+    else:
+        register_cache("semantic", _semantic_cache)
+    return _semantic_cache
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    return _semantic_cache
+
+if config.ENABLE_SEMANTIC_CACHE:
+    configure_semantic_cache()
 
 def score_groundedness(ai_response: str, context_chunks: List[ContextChunk]) -> float:
     """
@@ -31,39 +119,89 @@ def score_groundedness(ai_response: str, context_chunks: List[ContextChunk]) ->
     Implements caching to avoid recomputing NLI for same context-response pairs,
     which significantly improves performance at scale.
     """
+    return evaluate_groundedness(ai_response, context_chunks).score
+
+def evaluate_groundedness(ai_response: str, context_chunks: List[ContextChunk]) -> GroundednessResult:
+    """
+    Same as score_groundedness, but reports how the score was obtained.
+    When the semantic cache is enabled and some chunk pairs are not in the
+    exact cache, a near-duplicate response for the same context set is looked
+    up before running the cross-encoder.
+    """
     if not context_chunks:
-        return 0.0 # No context implies potential hallucination
+        return GroundednessResult(score=0.0) # No context implies potential hallucination
     
     if not ai_response or not ai_response.strip():
-        return 0.0 # Empty response
+        return GroundednessResult(score=0.0) # Empty response
 
-    model = get_model()
-    
     # We want to check if ANY chunk supports the response.
     # Approach: Pair the response with each chunk as (Context, Response).
     # Predict: Entailment, Neutral, Contradiction.
     # If Entailment score is high for at least one chunk, we consider it grounded.
     
-    max_entailment = 0.0
+    entailments = []
+    uncached_keys = []
+    uncached_pairs = []
+    uncached_lengths = []
+    
+    # Chunk fingerprints and token counts come from the chunk store when the
+    # chunk is known there; the response is hashed and tokenized once.
+    store = get_store()
+    response_fingerprint = fast_hash(ai_response)
+    pair_length = None
+    chunk_fingerprints = []
     
     for chunk in context_chunks:
+        artifact = store.get(chunk) if store is not None else None
+        chunk_fp = artifact.fingerprint if artifact is not None else fast_hash(chunk.text)
+        chunk_fingerprints.append(chunk_fp)
         # Check cache first
-        cache_key = _hash_text_pair(chunk.text, ai_response)
-        
-        if cache_key in _nli_cache:
-            entailment_prob = _nli_cache[cache_key]
+        cache_key = _hash_text_pair(chunk.text, ai_response, chunk_fp, response_fingerprint)
+        entailment_prob = _nli_cache.get(cache_key)
+        if entailment_prob is None:
+            uncached_keys.append(cache_key)
+            uncached_pairs.append((chunk.text, ai_response))
+            if store is not None:
+                if pair_length is None:
+                    pair_length = _pair_length_fn(ai_response)
+                uncached_lengths.append(pair_length(chunk, artifact))
         else:
-            # Compute NLI score
-            # CrossEncoder output for nli-deberta-v3-small:
-            # [contradiction_score, entailment_score, neutral_score]
-            pair = [(chunk.text, ai_response)]
-            scores = model.predict(pair, apply_softmax=True)
-            entailment_prob = float(scores[0][1])  # Index 1 is Entailment
-            
-            # Cache the result
-            _nli_cache[cache_key] = entailment_prob
-        
-        if entailment_prob > max_entailment:
-            max_entailment = entailment_prob
+            entailments.append(entailment_prob)
+    
+    if not uncached_pairs:
+        return GroundednessResult(score=float(max(entailments)))
+    
+    # The semantic cache is indexed by default-encoder embeddings of default-model scores
+    cache = _semantic_cache if active_key("relevance") is None and active_key("groundedness") is None else None
+    approx = None
+    if cache is not None:
+        # A near-duplicate that states other figures ("refund in 5 days" vs "50 days")
+        # is a different claim, so only responses with the same facts share a partition
+        context_key = (context_fingerprint(chunk_fingerprints), facts(ai_response))
+        response_embedding = relevance._cached_encode(ai_response)
+        approx = cache.lookup(context_key, response_embedding)
+        if approx is not None and not cache.should_audit():
+            return GroundednessResult(score=approx[0], approximate=True, approx_distance=approx[1])
+    
+    # Compute all missing NLI scores in as few forward passes as possible
+    start = time.perf_counter()
+    predictions = _predict_entailment(uncached_pairs, uncached_lengths or None)
+    for cache_key, entailment_prob in zip(uncached_keys, predictions):
+        _nli_cache[cache_key] = entailment_prob
+        entailments.append(entailment_prob)
+    score = float(max(entailments))
+    
+    if cache is not None:
+        cache.record_exact_time((time.perf_counter() - start) * 1000)
+        if approx is not None:
+            cache.record_audit(approx[0], score)
+        cache.insert(context_key, response_embedding, score)
             
-    return float(max_entailment)
+    return GroundednessResult(score=score)
+
+
+def warmup() -> None:
+    """Load the NLI model and run a dummy batch so the first request is not cold."""
+    model = get_model()
+    model.predict([("The clinic is in Mumbai.", "The clinic is located in Mumbai.")],
+                  apply_softmax=True)
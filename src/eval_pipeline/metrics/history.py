@@ -0,0 +1,100 @@
+"""
+History-aware relevance.
+
+A follow-up such as "what about the cost?" only makes sense with the
+earlier turns, so comparing it alone with the reply under-rates a good
+answer. Here the turns before the target user message are summarized by a
+decay-weighted sum of their embeddings,
+
+    h_n = decay * h_(n-1) + e_n
+
+so recent turns weigh most, and the reply is scored against both the turn
+and the history: (1 - weight) * cos(query, reply) + weight * cos(h, reply).
+
+The per-conversation state (h, turns folded in, fingerprint of those turns)
+is kept in an LRU cache. When a conversation comes back with turns appended,
+as it does when each new exchange is evaluated, only the new turns are
+encoded and folded in, in the same encode_batch call as the query and reply.
+If the stored turns no longer match (edited history, id reuse), the state
+is rebuilt from the last HISTORY_MAX_TURNS turns.
+"""
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel
+
+from .. import config
+from ..cache import LRUCache
+from ..chunk_store import fast_hash
+from ..memory import register_cache
+from ..models import active_key
+from ..schemas import Conversation, Message
+from .relevance import encode_batch
+
+class HistoryState(NamedTuple):
+    vector: np.ndarray  # Decayed sum of turn embeddings (not normalized)
+    turns: int  # History turns folded in
+    fingerprint: int  # Chained hash of those turns
+
+class HistoryRelevance(BaseModel):
+    score: float
+    turn: float  # Query-reply similarity alone (the "turn" mode score)
+    history: Optional[float] = None  # History-reply similarity; None without earlier turns
+    history_turns: int = 0
+
+_history_cache = LRUCache(maxsize=config.HISTORY_CACHE_SIZE)
+register_cache("history", _history_cache)
+
+def prior_turns(conversation: Conversation, user_msg: Message) -> List[str]:
+    """Texts of the non-empty messages before `user_msg`, oldest first."""
+    turns = []
+    for msg in conversation.messages:
+        if msg is user_msg:
+            break
+        if msg.content and msg.content.strip():
+            turns.append(msg.content)
+    return turns
+
+def _fingerprints(turns: Sequence[str]) -> List[int]:
+    chain, fp = [], 0
+    for text in turns:
+        fp = fast_hash(f"{fp}|{text}")
+        chain.append(fp)
+    return chain
+
+def clear_cache() -> None:
+    _history_cache.clear()
+
+def evaluate_history_relevance(user_query: str, ai_response: str, history: Sequence[str],
+                               conversation_id: Optional[str] = None) -> HistoryRelevance:
+    """
+    Relevance of the reply to the query in the context of `history` (the
+    earlier turns' texts). With a `conversation_id`, the history embedding
+    is kept and extended incrementally across calls.
+    """
+    key = (active_key("relevance"), conversation_id)
+    chain = _fingerprints(history)
+    state = _history_cache.get(key) if conversation_id is not None else None
+    resumed = (state is not None and 0 < state.turns <= len(history)
+               and chain[state.turns - 1] == state.fingerprint)
+    # Only turns not yet in the state are encoded; a rebuild starts from the window
+    start = state.turns if resumed else max(len(history) - config.HISTORY_MAX_TURNS, 0)
+    new_turns = list(history[start:])
+
+    embeddings = encode_batch([user_query, ai_response] + new_turns)
+    query_embedding, response_embedding = embeddings[0], embeddings[1]
+    turn_score = float(np.dot(query_embedding, response_embedding))
+    if not history:
+        return HistoryRelevance(score=turn_score, turn=turn_score)
+
+    vector = state.vector if resumed else np.zeros_like(response_embedding)
+    for emb in embeddings[2:]:
+        vector = config.HISTORY_DECAY * vector + emb
+    if conversation_id is not None:
+        _history_cache.put(key, HistoryState(vector, len(history), chain[-1]))
+
+    norm = np.linalg.norm(vector)
+    history_score = float(np.dot(vector / norm, response_embedding)) if norm > 0 else turn_score
+    weight = config.HISTORY_RELEVANCE_WEIGHT
+    return HistoryRelevance(score=(1 - weight) * turn_score + weight * history_score,
+                            turn=turn_score, history=history_score, history_turns=len(history))
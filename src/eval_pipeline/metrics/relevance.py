@@ -1,42 +1,122 @@
-from sentence_transformers import SentenceTransformer, util
 import numpy as np
-from functools import lru_cache
-import hashlib
+from typing import List
+from ..batching import tokenizer_length_fn
+from ..cache import LRUCache
+from ..chunk_store import get_store
+from .. import config
+from ..engine import get_engine_config, model_scheduler
+from ..memory import register_cache
+from ..models import ModelKey, active_key, get_registry, scoped_model
+from ..schemas import ContextChunk
 
 # Load model once (global or singleton pattern preferable in prod)
 # using a lightweight model for speed/cpu-friendliness
-MODEL_NAME = 'all-MiniLM-L6-v2'
+MODEL_NAME = config.RELEVANCE_MODEL
+DEFAULT_KEY = ModelKey(MODEL_NAME, "sentence-transformers")
 _model = None
 
 def get_model():
-    """Lazy-load the model to save memory when not needed."""
+    """
+    Lazy-load the model to save memory when not needed.
+    sentence_transformers (and with it torch) is imported on first load rather
+    than at module level, so importing the pipeline stays cheap for
+    toxicity-only use. A tenant with its own encoder gets it from the model
+    registry; the default one stays pinned there once loaded.
+    """
     global _model
+    model = scoped_model("relevance")
+    if model is not None:
+        return model
     if _model is None:
-        _model = SentenceTransformer(MODEL_NAME)
+        _model = get_registry().acquire(DEFAULT_KEY)
     return _model
 
-@lru_cache(maxsize=1000)
-def _cached_encode(text: str):
+def _cache_key(text: str):
+    # Embeddings from a tenant's own encoder are cached apart from the default ones
+    key = active_key("relevance")
+    return text if key is None else (key, text)
+
+# LRU cache of normalized embeddings keyed by text, to limit memory usage
+_embedding_cache = LRUCache(maxsize=get_engine_config().cache_size("embeddings"))
+register_cache("embeddings", _embedding_cache)
+
+def encode_batch(texts: List[str]) -> np.ndarray:
+    """
+    Embeds texts, returning an (n, dim) array of L2-normalized embeddings.
+    Cached texts are looked up; the misses are encoded together in
+    length-bucketed batches so short and long texts are not padded together.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    found = {}
+    missing = []
+    for text in texts:
+        if text in found:
+            continue
+        emb = _embedding_cache.get(_cache_key(text))
+        if emb is None:
+            missing.append(text)
+        found[text] = emb
+
+    if missing:
+        model = get_model()
+        scheduler = model_scheduler("relevance")
+
+        def _encode(batch):
+            return model.encode(batch, batch_size=len(batch),
+                                convert_to_numpy=True, normalize_embeddings=True)
+
+        embeddings = scheduler.run(missing, _encode, tokenizer_length_fn(model))
+        for text, emb in zip(missing, embeddings):
+            _embedding_cache[_cache_key(text)] = emb
+            found[text] = emb
+    return np.stack([found[t] for t in texts])
+
+def encode_chunks(chunks: List[ContextChunk]) -> np.ndarray:
+    """
+    Embeds context chunks. Chunks found in the chunk store (built with this
+    encoder) are read from its memory-mapped embeddings; the rest go through
+    encode_batch.
+    """
+    if not chunks:
+        return np.zeros((0, 0), dtype=np.float32)
+    store = get_store()
+    if (store is None or store.meta.get("encoder") not in (MODEL_NAME, "")
+            or active_key("relevance") is not None):
+        return encode_batch([c.text for c in chunks])
+    stored = [store.embedding(c) for c in chunks]
+    missing = [c.text for c, emb in zip(chunks, stored) if emb is None]
+    computed = iter(encode_batch(missing)) if missing else iter(())
+    return np.stack([emb if emb is not None else next(computed) for emb in stored])
+
+def _cached_encode(text: str) -> np.ndarray:
     """
     Cache embeddings for repeated texts to improve performance at scale.
-    Uses LRU cache to limit memory usage.
+    Embeddings are L2-normalized so cosine similarity is a dot product.
     """
-    model = get_model()
-    return model.encode(text, convert_to_tensor=True)
+    return encode_batch([text])[0]
+
+def clear_cache() -> None:
+    """Drops all cached embeddings."""
+    _embedding_cache.clear()
 
 def score_relevance(user_query: str, ai_response: str) -> float:
     """
     Computes semantic similarity between query and response.
     Returns a score between 0.0 and 1.0.
-    
+
     Uses caching to avoid re-computing embeddings for repeated queries/responses,
     which is critical for handling millions of daily conversations efficiently.
     """
-    # Use cached encoding for better performance
-    query_embedding = _cached_encode(user_query)
-    response_embedding = _cached_encode(ai_response)
-    
-    cosine_score = util.cos_sim(query_embedding, response_embedding)
-    return float(cosine_score[0][0])
+    # Query and response are encoded in one call when neither is cached
+    query_embedding, response_embedding = encode_batch([user_query, ai_response])
 
+    cosine_score = np.dot(query_embedding, response_embedding)
+    return float(cosine_score)
 
+
+def warmup() -> None:
+    """Load the encoder and run a dummy batch so the first request is not cold."""
+    model = get_model()
+    model.encode(["warmup", "A slightly longer warm-up sentence for the encoder."],
+                 convert_to_numpy=True, normalize_embeddings=True)
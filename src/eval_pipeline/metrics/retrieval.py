@@ -0,0 +1,102 @@
+"""
+Retrieval-quality metrics: how good was the context the bot was given?
+
+All metrics are computed from one (n, dim) chunk matrix with NumPy matrix
+operations. Chunk embeddings come from the chunk store or the embedding
+cache where possible; chunks found in neither are encoded, so without a
+chunk store the stage costs one encoder pass per new chunk. It is off in
+the pipeline unless config.RETRIEVAL_METRICS is set.
+"""
+import numpy as np
+from pydantic import BaseModel
+from typing import List, Optional
+from .. import config
+from ..schemas import ContextChunk
+from .relevance import encode_batch, encode_chunks
+
+class RetrievalScores(BaseModel):
+    context_precision: Optional[float] = None  # Fraction of chunks relevant to the query
+    redundancy: Optional[float] = None  # Mean similarity of each chunk to its nearest other chunk
+    score_calibration: Optional[float] = None  # Rank correlation: retriever score vs query similarity
+    chunks: int = 0  # Chunks with text that were evaluated
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+def _stored_vectors(chunks: List[ContextChunk]) -> Optional[np.ndarray]:
+    """The retriever's own vectors, when every chunk carries one of the same size."""
+    dims = {len(c.vector) for c in chunks}
+    if len(dims) != 1 or 0 in dims:
+        return None
+    return _normalize_rows(np.asarray([c.vector for c in chunks], dtype=np.float32))
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    # Average ranks for ties, so constant runs do not fake a correlation
+    order = np.argsort(values, kind="mergesort")
+    sorted_values = values[order]
+    _, first, counts = np.unique(sorted_values, return_index=True, return_counts=True)
+    mean_ranks = first + (counts - 1) / 2.0
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[order] = np.repeat(mean_ranks, counts)
+    return ranks
+
+def _spearman(x: np.ndarray, y: np.ndarray) -> Optional[float]:
+    if len(x) < 2:
+        return None
+    rx, ry = _ranks(x), _ranks(y)
+    rx -= rx.mean()
+    ry -= ry.mean()
+    denom = np.sqrt((rx @ rx) * (ry @ ry))
+    if denom == 0:
+        return None  # One side is constant: calibration is undefined
+    return float((rx @ ry) / denom)
+
+def evaluate_retrieval(user_query: str, context_chunks: List[ContextChunk],
+                       relevance_threshold: Optional[float] = None) -> RetrievalScores:
+    """
+    Scores the retrieved context against the query.
+
+    - context_precision: share of chunks whose embedding similarity to the
+      query reaches `relevance_threshold`.
+    - redundancy: for each chunk, its highest similarity to another chunk,
+      averaged. Uses the retriever's stored vectors when every chunk has one,
+      since chunk-to-chunk similarity needs no query embedding.
+    - score_calibration: Spearman correlation between the retriever `score`
+      and query similarity, over chunks that have a score. Rank-based, so
+      distances and similarities of any scale compare fairly (a negative
+      value means a distance-like score that agrees with the encoder).
+    """
+    if relevance_threshold is None:
+        relevance_threshold = config.CONTEXT_RELEVANCE_THRESHOLD
+    chunks = [c for c in context_chunks if c.text.strip()]
+    if not chunks or not user_query.strip():
+        return RetrievalScores(chunks=len(chunks))
+
+    query = encode_batch([user_query])[0]
+    embeddings = encode_chunks(chunks)
+    query_sim = embeddings @ query  # (n,)
+
+    precision = float(np.mean(query_sim >= relevance_threshold))
+
+    redundancy = None
+    if len(chunks) > 1:
+        vectors = _stored_vectors(chunks)
+        if vectors is None:
+            vectors = embeddings
+        pairwise = vectors @ vectors.T
+        np.fill_diagonal(pairwise, -np.inf)
+        redundancy = float(pairwise.max(axis=1).mean())
+
+    scored = np.array([c.score is not None for c in chunks])
+    calibration = None
+    if scored.sum() >= 2:
+        retriever = np.array([c.score for c in chunks if c.score is not None], dtype=np.float64)
+        calibration = _spearman(retriever, query_sim[scored].astype(np.float64))
+
+    return RetrievalScores(
+        context_precision=precision,
+        redundancy=redundancy,
+        score_calibration=calibration,
+        chunks=len(chunks)
+    )
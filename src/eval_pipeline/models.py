@@ -0,0 +1,224 @@
+"""
+Shared model registry.
+
+Models are keyed by (name, backend, precision). Every tenant resolving to
+the same key shares one loaded instance. Evaluations hold a reference to the
+models they use while they run, and models nobody references stay loaded
+but can be unloaded, least recently used first. Unloading happens when the
+registry's byte limit is exceeded or when the process memory budget asks
+(the registry is registered with memory.py like the caches).
+
+The default relevance and groundedness models keep their module-level
+globals in the metrics and are pinned for the life of the process. Other
+models are reached through a `use_models` scope, which the evaluation of a
+tenant opens for the models where that tenant differs from the default.
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from . import config
+from .memory import MB, register_cache, to_mb
+from .profiling import track_model_load
+
+class ModelKey(NamedTuple):
+    name: str
+    backend: str  # How to load it: "sentence-transformers" (bi-encoder) or "cross-encoder"
+    precision: str = "fp32"  # "fp32", "fp16" or "int8" (dynamic quantization)
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.backend}, {self.precision})"
+
+# backend name -> loader(model name) returning the loaded model
+_backends: Dict[str, Callable[[str], Any]] = {}
+
+def register_backend(name: str, loader: Callable[[str], Any]) -> None:
+    """Makes `loader` responsible for loading models of backend `name`."""
+    _backends[name] = loader
+
+def _load_sentence_transformer(name: str) -> Any:
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+def _load_cross_encoder(name: str) -> Any:
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(name)
+
+register_backend("sentence-transformers", _load_sentence_transformer)
+register_backend("cross-encoder", _load_cross_encoder)
+
+def _torch_module(model: Any) -> Any:
+    # CrossEncoder wraps the transformer in `.model`; SentenceTransformer is the module itself
+    return getattr(model, "model", None) if hasattr(model, "predict") else model
+
+def apply_precision(model: Any, precision: str) -> Any:
+    """Converts a freshly loaded model to `precision`."""
+    if precision == "fp32":
+        return model
+    module = _torch_module(model)
+    if precision == "fp16":
+        module.half()
+        return model
+    if precision == "int8":
+        import torch
+        quantized = torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+        if module is model:
+            return quantized
+        model.model = quantized
+        return model
+    raise ValueError(f"Unknown precision: {precision}")
+
+def model_nbytes(model: Any) -> int:
+    """Bytes held by a model's parameters and buffers (0 if it exposes none)."""
+    module = _torch_module(model)
+    total = 0
+    for attr in ("parameters", "buffers"):
+        tensors = getattr(module, attr, None)
+        if callable(tensors):
+            total += sum(t.numel() * t.element_size() for t in tensors())
+    return total
+
+class _Entry:
+    __slots__ = ("model", "refs", "nbytes")
+
+    def __init__(self, model: Any, nbytes: int):
+        self.model = model
+        self.refs = 0
+        self.nbytes = nbytes
+
+class ModelRegistry:
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[ModelKey, _Entry]" = OrderedDict()  # Least recently used first
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.unloads = 0
+        self.hits = 0
+
+    def _entry(self, key: ModelKey) -> _Entry:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+        if key.backend not in _backends:
+            raise ValueError(f"Unknown model backend: {key.backend}")
+        with track_model_load(key.name):
+            model = apply_precision(_backends[key.backend](key.name), key.precision)
+        entry = self._entries[key] = _Entry(model, model_nbytes(model))
+        self.loads += 1
+        if self.max_bytes is not None and self.nbytes > self.max_bytes:
+            self.shrink_bytes(self.nbytes - self.max_bytes, keep=key)
+        return entry
+
+    def get(self, key: ModelKey) -> Any:
+        """The model for `key`, loading it if needed, without taking a reference."""
+        with self._lock:
+            return self._entry(key).model
+
+    def acquire(self, key: ModelKey) -> Any:
+        """Like get, but the model cannot be unloaded until released."""
+        with self._lock:
+            entry = self._entry(key)
+            entry.refs += 1
+            return entry.model
+
+    def release(self, key: ModelKey) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+
+    def put(self, key: ModelKey, model: Any) -> None:
+        """Installs an already loaded model under `key`."""
+        with self._lock:
+            self._entries[key] = _Entry(model, model_nbytes(model))
+
+    def refs(self, key: ModelKey) -> int:
+        entry = self._entries.get(key)
+        return entry.refs if entry is not None else 0
+
+    def loaded(self) -> List[ModelKey]:
+        return list(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def shrink_bytes(self, nbytes: int, keep: Optional[ModelKey] = None) -> int:
+        """Unloads idle models, least recently used first, until `nbytes` are freed."""
+        freed = 0
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e.refs == 0 and k != keep]:
+                if freed >= nbytes:
+                    break
+                freed += self._entries.pop(key).nbytes
+                self.unloads += 1
+        return freed
+
+    def restore_caps(self) -> None:
+        """Nothing to restore: unloading never lowers `max_bytes`."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": [str(key) for key in self._entries],
+            "in_use": sum(1 for e in self._entries.values() if e.refs),
+            "mb": to_mb(self.nbytes),
+            "loads": self.loads,
+            "unloads": self.unloads,
+            "hits": self.hits,
+        }
+
+_registry = ModelRegistry(max_bytes=int(config.MODEL_MEMORY_BUDGET_MB * MB)
+                          if config.MODEL_MEMORY_BUDGET_MB else None)
+register_cache("models", _registry)
+
+def get_registry() -> ModelRegistry:
+    return _registry
+
+class ModelScope:
+    """Models selected for one evaluation, acquired on first use and released on close."""
+
+    def __init__(self, keys: Dict[str, ModelKey], registry: ModelRegistry):
+        self.keys = keys
+        self.registry = registry
+        self._acquired: Dict[str, Any] = {}
+
+    def model(self, role: str) -> Any:
+        if role not in self._acquired:
+            self._acquired[role] = self.registry.acquire(self.keys[role])
+        return self._acquired[role]
+
+    def close(self) -> None:
+        for role in self._acquired:
+            self.registry.release(self.keys[role])
+        self._acquired.clear()
+
+_scope: ContextVar[Optional[ModelScope]] = ContextVar("model_scope", default=None)
+
+@contextmanager
+def use_models(keys: Dict[str, ModelKey], registry: Optional[ModelRegistry] = None):
+    """
+    Within the block, the metric `role`s in `keys` ("relevance",
+    "groundedness") use those models instead of the defaults.
+    """
+    scope = ModelScope(keys, registry or _registry)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+        scope.close()
+
+def active_key(role: str) -> Optional[ModelKey]:
+    """The non-default model selected for `role` in the current scope, if any."""
+    scope = _scope.get()
+    return scope.keys.get(role) if scope is not None else None
+
+def scoped_model(role: str) -> Optional[Any]:
+    scope = _scope.get()
+    if scope is None or role not in scope.keys:
+        return None
+    return scope.model(role)
@@ -0,0 +1,94 @@
+"""
+Read-ahead loading that overlaps disk I/O and JSON parsing with inference.
+
+`PrefetchLoader` keeps up to `depth` items loading on a thread pool ahead of
+the consumer. While the main thread evaluates item i, items i+1 .. i+depth
+are being read and parsed, so the models only wait on disk when loading is
+slower than inference overall. Items are yielded in input order. File reads
+and torch inference release the GIL, so the threads overlap with the models
+even though JSON parsing itself does not run in parallel with Python code.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Optional, Tuple
+
+class PrefetchStats:
+    def __init__(self):
+        self.loaded = 0
+        self.failed = 0
+        self.waits = 0  # Times the consumer found its next item still loading
+        self.wait_ms = 0.0  # Total time the consumer spent waiting on loads
+        self.load_ms = 0.0  # Total loading time across threads
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "loaded": self.loaded,
+            "failed": self.failed,
+            "waits": self.waits,
+            "wait_ms": round(self.wait_ms, 2),
+            "load_ms": round(self.load_ms, 2),
+        }
+
+class PrefetchLoader:
+    """
+    Iterates (item, result, error) for `items`, with `load(item)` running up
+    to `depth` items ahead on `workers` threads. A load that raises yields
+    its exception as `error` instead of stopping the iteration.
+    """
+
+    def __init__(self, items: Iterable[Any], load: Callable[[Any], Any],
+                 workers: int = 4, depth: int = 64):
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.items = items
+        self.load = load
+        self.workers = workers
+        self.depth = depth
+        self.stats = PrefetchStats()
+        self._lock = threading.Lock()
+
+    def _timed_load(self, item: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return self.load(item)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.stats.load_ms += elapsed
+
+    def __iter__(self) -> Iterator[Tuple[Any, Optional[Any], Optional[Exception]]]:
+        source = iter(self.items)
+        window: Deque[Tuple[Any, Future]] = deque()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch") as pool:
+            try:
+                while True:
+                    # Top up the window so loading stays `depth` items ahead
+                    while len(window) < self.depth:
+                        item = next(source, _DONE)
+                        if item is _DONE:
+                            break
+                        window.append((item, pool.submit(self._timed_load, item)))
+                    if not window:
+                        return
+                    item, future = window.popleft()
+                    if not future.done():
+                        self.stats.waits += 1
+                        start = time.perf_counter()
+                        error = future.exception()
+                        self.stats.wait_ms += (time.perf_counter() - start) * 1000
+                    else:
+                        error = future.exception()
+                    if error is not None:
+                        self.stats.failed += 1
+                        yield item, None, error
+                    else:
+                        self.stats.loaded += 1
+                        yield item, future.result(), None
+            finally:
+                # Stopped early: drop loads that have not started
+                for _, future in window:
+                    future.cancel()
+
+_DONE = object()
@@ -1,4 +1,8 @@
 import time
+from contextlib import contextmanager
+from typing import Dict
+
+from .memory import rss_bytes
 
 def estimate_cost(text: str, model_rate_per_1k_char: float = 0.0001) -> float:
     """
@@ -19,3 +23,37 @@ class LatencyProfiler:
 
     def get_latency_ms(self) -> float:
         return (self.end_time - self.start_time) * 1000
+
+    def elapsed_ms(self) -> float:
+        """Time since start() for a profiler that is still running."""
+        return (time.perf_counter() - self.start_time) * 1000
+
+# Cold-start accounting: time spent importing and loading models, per model name.
+# Kept separate from request latency so the first evaluation in a process
+# does not report model loading as inference time.
+_model_load_ms: Dict[str, float] = {}
+_model_load_bytes: Dict[str, int] = {}
+
+@contextmanager
+def track_model_load(name: str):
+    """Record the wall time and RSS growth of a model import/load under `name`."""
+    start = time.perf_counter()
+    rss_before = rss_bytes() or 0
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        _model_load_ms[name] = _model_load_ms.get(name, 0.0) + elapsed
+        _model_load_bytes[name] = _model_load_bytes.get(name, 0) + max((rss_bytes() or 0) - rss_before, 0)
+
+def get_model_load_times() -> Dict[str, float]:
+    """Returns model load times (ms) recorded so far in this process."""
+    return dict(_model_load_ms)
+
+def get_model_memory() -> Dict[str, int]:
+    """Returns the RSS growth (bytes) while loading each model."""
+    return dict(_model_load_bytes)
+
+def total_model_load_ms() -> float:
+    """Total cold-start time (ms) spent loading models in this process."""
+    return sum(_model_load_ms.values())
@@ -0,0 +1,205 @@
+"""
+Indexed local result store.
+
+Reports go into one SQLite file with a row per report: the report fields,
+one typed column per scalar score (derived from MetricScores, like the
+columnar sinks), and optionally the full report JSON. chat_id,
+evaluated_at, status and the main score columns are indexed, so queries
+such as "groundedness < 0.5 in the last week" read only matching rows.
+
+Ingest is batched: rows are buffered and written with one executemany per
+transaction, in WAL mode so readers can query while a run writes.
+
+By default the store runs with synchronous=NORMAL: commits do not wait for
+an fsync, which keeps a batch run from paying one per transaction. The file
+cannot be corrupted this way, and committed rows survive a crash of the
+process, but a power loss or OS crash can roll back the transactions
+committed since the write-ahead log was last synced. SqliteReportSink's
+checkpoint() syncs it, so checkpointed rows are always durable, and a
+resumed run rewrites anything after the checkpoint. synchronous="FULL"
+makes every commit durable, at one fsync per transaction.
+"""
+import os
+import re
+import sqlite3
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .aggregate import EvalReport
+from .sinks import REPORT_COLUMNS, ReportSink, score_columns
+
+INDEXED_COLUMNS = ("chat_id", "evaluated_at", "status", "tenant",
+                   "relevance", "completeness", "groundedness", "toxicity", "latency_ms")
+_SQL_TYPES = {"str": "TEXT", "float": "REAL", "int": "INTEGER", "bool": "INTEGER"}
+_OPERATORS = {"lt": "<", "le": "<=", "gt": ">", "ge": ">=", "eq": "="}
+_FILTER = re.compile(r"^\s*(\w+)\s*(<=|>=|<|>|==?)\s*(\S+)\s*$")
+_SYMBOLS = {"<": "lt", "<=": "le", ">": "gt", ">=": "ge", "=": "eq", "==": "eq"}
+
+def parse_filter(text: str) -> Tuple[str, str, float]:
+    """Parses "groundedness<0.5" into ("groundedness", "lt", 0.5)."""
+    match = _FILTER.match(text)
+    if not match:
+        raise ValueError(f"Bad filter {text!r}; expected <column><op><number>, e.g. groundedness<0.5")
+    name, symbol, value = match.groups()
+    return name, _SYMBOLS[symbol], float(value)
+
+def store_columns() -> Dict[str, str]:
+    """Column name -> kind of the reports table (beyond id and report)."""
+    columns = dict(REPORT_COLUMNS)
+    columns.update(score_columns())
+    return columns
+
+class ResultStore:
+    """A reports table in a SQLite file, with range and threshold queries."""
+
+    def __init__(self, path: str, store_reports: bool = True, synchronous: str = "NORMAL"):
+        if synchronous not in ("NORMAL", "FULL"):
+            raise ValueError(f"synchronous must be NORMAL or FULL, not {synchronous!r}")
+        self.path = path
+        self.store_reports = store_reports
+        self.columns = store_columns()
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._create()
+
+    def _create(self) -> None:
+        defs = ", ".join(f"{name} {_SQL_TYPES[kind]}" for name, kind in self.columns.items())
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS reports (id INTEGER PRIMARY KEY, {defs}, report TEXT)")
+        # Stores written before a metric existed get its column (NULL for old rows)
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(reports)")}
+        for name, kind in self.columns.items():
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE reports ADD COLUMN {name} {_SQL_TYPES[kind]}")
+        for name in INDEXED_COLUMNS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_reports_{name} ON reports ({name})")
+
+    def row(self, report: EvalReport) -> Tuple:
+        scores = report.scores.model_dump() if report.scores else {}
+        values = [getattr(report, name) if name in REPORT_COLUMNS else scores.get(name)
+                  for name in self.columns]
+        values.append(report.model_dump_json() if self.store_reports else None)
+        return tuple(values)
+
+    def insert(self, rows: List[Tuple]) -> None:
+        """Inserts rows from row() in one transaction."""
+        if not rows:
+            return
+        names = list(self.columns) + ["report"]
+        sql = f"INSERT INTO reports ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(sql, rows)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def sync(self) -> None:
+        """Fsyncs the write-ahead log, making every committed transaction durable."""
+        wal = self.path + "-wal"
+        if os.path.exists(wal):
+            with open(wal, 'rb') as f:
+                os.fsync(f.fileno())
+
+    def last_id(self) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM reports").fetchone()[0]
+
+    def truncate(self, last_id: int) -> int:
+        """Deletes rows inserted after `last_id`; returns how many."""
+        return self._conn.execute("DELETE FROM reports WHERE id > ?", (last_id,)).rowcount
+
+    def _where(self, chat_id: Optional[str] = None, status: Optional[str] = None,
+               tenant: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+               filters: Optional[List[Tuple[str, str, float]]] = None) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        for name, value in (("chat_id", chat_id), ("status", status), ("tenant", tenant)):
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("evaluated_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("evaluated_at < ?")
+            params.append(until)
+        for name, op, value in filters or ():
+            if name not in self.columns or op not in _OPERATORS:
+                raise ValueError(f"Cannot filter on {name} {op}")
+            clauses.append(f"{name} {_OPERATORS[op]} ?")
+            params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, columns: Optional[List[str]] = None, order_by: str = "evaluated_at",
+              descending: bool = False, limit: Optional[int] = None, **filters) -> Iterator[Dict[str, Any]]:
+        """
+        Rows matching all filters, as dicts of `columns` (default: all but the
+        report JSON). Filters: chat_id, status, tenant, since / until (unix
+        time, evaluated_at in [since, until)), and filters=[(column, op,
+        value)] with op one of lt, le, gt, ge, eq.
+        """
+        columns = columns or list(self.columns)
+        for name in columns + [order_by]:
+            if name not in self.columns and name not in ("id", "report"):
+                raise ValueError(f"Unknown column: {name}")
+        where, params = self._where(**filters)
+        sql = (f"SELECT {', '.join(columns)} FROM reports{where} "
+               f"ORDER BY {order_by}{' DESC' if descending else ''}, id")
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        for values in self._conn.execute(sql, params):
+            yield dict(zip(columns, values))
+
+    def reports(self, **kwargs) -> Iterator[EvalReport]:
+        """Full reports matching the query filters (stores written with store_reports only)."""
+        for row in self.query(columns=["report"], **kwargs):
+            if row["report"] is not None:
+                yield EvalReport.model_validate_json(row["report"])
+
+    def count(self, **filters) -> int:
+        where, params = self._where(**filters)
+        return self._conn.execute(f"SELECT COUNT(*) FROM reports{where}", params).fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class SqliteReportSink(ReportSink):
+    """
+    Writes reports to a ResultStore in batches of `batch_size` rows per
+    transaction. Appends to an existing store. checkpoint() commits the
+    buffered rows and returns the last row id; resuming from it deletes the
+    rows written after the checkpoint. Checkpointed rows survive a power
+    loss; with synchronous="FULL" so does every flushed batch.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000, store_reports: bool = True,
+                 resume: Optional[Dict[str, Any]] = None, synchronous: str = "NORMAL"):
+        self.store = ResultStore(path, store_reports=store_reports, synchronous=synchronous)
+        self.batch_size = batch_size
+        self._rows: List[Tuple] = []
+        if resume is not None:
+            self.store.truncate(resume["last_id"])
+
+    def write(self, report: EvalReport) -> None:
+        self._rows.append(self.store.row(report))
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.store.insert(self._rows)
+        self._rows = []
+
+    def checkpoint(self) -> Dict[str, Any]:
+        self.flush()
+        self.store.sync()
+        return {"last_id": self.store.last_id()}
+
+    def close(self) -> None:
+        self.flush()
+        self.store.close()
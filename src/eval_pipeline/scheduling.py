@@ -0,0 +1,168 @@
+"""
+Priority classes and per-tenant fair sharing for queued evaluations.
+
+Requests are served by priority class first: "urgent" (conversations
+flagged by user feedback or safety signals), then "normal", then "bulk"
+(routine samples, backfills). A request that has waited `aging_s` seconds
+is treated as one class higher, and one more per further `aging_s` (ties
+go to the higher class), so bulk work is delayed under load but never
+starved.
+
+Within a class, tenants share the worker by weighted fair queuing: each
+request gets a virtual finish time of start + cost / weight, where start is
+the later of the class's virtual time and the tenant's previous finish, and
+the smallest finish time is served next. A tenant flooding the queue only
+lengthens its own backlog, and a tenant with weight 2 gets twice the share
+of one with weight 1 while both have work queued.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from . import config
+from .summary import MetricSummary
+from .tenants import get_tenant
+
+PRIORITY_CLASSES = ("urgent", "normal", "bulk")  # Highest first
+URGENT_FLAGS = ("user_feedback", "safety")
+
+def priority_class(record: Any) -> str:
+    """
+    The class of a corpus record: its "priority" field if valid, "urgent" if
+    its "flags" include a user-feedback or safety signal, else DEFAULT_PRIORITY.
+    """
+    if isinstance(record, dict):
+        explicit = record.get("priority")
+        if explicit in PRIORITY_CLASSES:
+            return explicit
+        flags = record.get("flags") or ()
+        if any(flag in URGENT_FLAGS for flag in flags):
+            return "urgent"
+    return config.DEFAULT_PRIORITY
+
+class ClassStats:
+    """Queue-wait distribution of one priority class."""
+
+    def __init__(self):
+        self.wait_ms = MetricSummary()
+        self.aged = 0  # Served ahead of a higher class because of aging
+
+    def to_dict(self) -> Dict[str, Any]:
+        stats = self.wait_ms.describe()
+        return {"served": stats["count"], "aged": self.aged,
+                **{f"wait_{k}_ms": v for k, v in stats.items() if k != "count"}}
+
+class _Request:
+    __slots__ = ("item", "tenant", "enqueued_at", "start", "finish")
+
+    def __init__(self, item: Any, tenant: str, enqueued_at: float, start: float, finish: float):
+        self.item = item
+        self.tenant = tenant
+        self.enqueued_at = enqueued_at
+        self.start = start
+        self.finish = finish
+
+class _ClassQueue:
+    """Pending requests of one class, per tenant in arrival order."""
+
+    def __init__(self):
+        self.tenants: Dict[str, Deque[_Request]] = {}
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+        self.size = 0
+
+    def push(self, request: _Request) -> None:
+        self.tenants.setdefault(request.tenant, deque()).append(request)
+        self.size += 1
+
+    def oldest(self) -> float:
+        return min(q[0].enqueued_at for q in self.tenants.values() if q)
+
+    def pop(self) -> _Request:
+        tenant = min((t for t, q in self.tenants.items() if q), key=lambda t: self.tenants[t][0].finish)
+        request = self.tenants[tenant].popleft()
+        if not self.tenants[tenant]:
+            del self.tenants[tenant]
+        self.virtual_time = max(self.virtual_time, request.start)
+        self.size -= 1
+        if not self.size:
+            # Idle class: finish times restart so past usage is not held against anyone
+            self.last_finish.clear()
+        return request
+
+class RequestScheduler:
+    """
+    Thread-safe buffer of pending evaluations with queue.Queue-style
+    put/get, ordered by priority class (with aging) and weighted fair
+    queuing across tenants. Tenant weights come from the tenants file.
+    """
+
+    def __init__(self, aging_s: Optional[float] = None,
+                 weight: Optional[Callable[[Optional[str]], float]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.aging_s = config.PRIORITY_AGING_S if aging_s is None else aging_s
+        self.weight = weight or (lambda tenant: get_tenant(tenant).weight)
+        self.clock = clock
+        self._classes = {name: _ClassQueue() for name in PRIORITY_CLASSES}
+        self._cond = threading.Condition()
+        self.stats = {name: ClassStats() for name in PRIORITY_CLASSES}
+
+    def put(self, item: Any, priority: str = "normal", tenant: Optional[str] = None,
+            cost: float = 1.0) -> None:
+        if priority not in self._classes:
+            raise ValueError(f"Unknown priority class: {priority}")
+        weight = max(self.weight(tenant), 1e-6)
+        with self._cond:
+            pending = self._classes[priority]
+            key = tenant or ""
+            start = max(pending.virtual_time, pending.last_finish.get(key, 0.0))
+            finish = pending.last_finish[key] = start + cost / weight
+            pending.push(_Request(item, key, self.clock(), start, finish))
+            self._cond.notify()
+
+    def _next_class(self, now: float) -> Tuple[str, int]:
+        # Effective rank: class index minus one per aging_s waited by its oldest request
+        best = None
+        for rank, name in enumerate(PRIORITY_CLASSES):
+            pending = self._classes[name]
+            if not pending.size:
+                continue
+            effective = rank
+            if self.aging_s:
+                effective = rank - int((now - pending.oldest()) / self.aging_s)
+            if best is None or effective < best[1]:
+                best = (name, effective)
+        return best
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """The next request's item; raises queue.Empty after `timeout` seconds without one."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.qsize() > 0, timeout=timeout):
+                raise queue.Empty
+            now = self.clock()
+            name, effective = self._next_class(now)
+            request = self._classes[name].pop()
+            stats = self.stats[name]
+            stats.wait_ms.update((now - request.enqueued_at) * 1000)
+            rank = PRIORITY_CLASSES.index(name)
+            if effective < rank and any(self._classes[c].size for c in PRIORITY_CLASSES[:rank]):
+                stats.aged += 1
+            return request.item
+
+    def get_nowait(self) -> Any:
+        return self.get(timeout=0)
+
+    def qsize(self) -> int:
+        return sum(pending.size for pending in self._classes.values())
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def depths(self) -> Dict[str, int]:
+        with self._cond:
+            return {name: pending.size for name, pending in self._classes.items()}
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stats.to_dict() for name, stats in self.stats.items()}
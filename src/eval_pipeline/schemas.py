@@ -15,6 +15,8 @@ class ContextChunk(BaseModel):
     text: str
     vector: List[float] = Field(default_factory=list)
     score: Optional[float] = None
+    id: Optional[str] = None  # Stable knowledge-base chunk id, when the source provides one
+    source_url: Optional[str] = None
 
 # Context is keyed by the ID of the USER message it retrieves for.
 class ContextData(BaseModel):
@@ -23,3 +25,52 @@ class ContextData(BaseModel):
 class EvalInput(BaseModel):
     conversation: Conversation
     context: ContextData
+    tenant: Optional[str] = None  # Selects models and thresholds (tenants.py); None: defaults
+
+# Trusted-input fast path.
+# Lightweight __slots__ objects exposing the same attributes that targeting and
+# the metrics read, built without validation. Only for already-validated
+# internal traffic; untrusted input must go through the Pydantic models above.
+
+class TrustedMessage:
+    __slots__ = ("role", "content", "id", "timestamp")
+
+    def __init__(self, role: str, content: str, id: Optional[str] = None,
+                 timestamp: Optional[float] = None):
+        self.role = role
+        self.content = content
+        self.id = id
+        self.timestamp = timestamp
+
+class TrustedConversation:
+    __slots__ = ("id", "messages")
+
+    def __init__(self, id: str, messages: List[TrustedMessage]):
+        self.id = id
+        self.messages = messages
+
+class TrustedContextChunk:
+    __slots__ = ("text", "vector", "score", "id", "source_url")
+
+    def __init__(self, text: str, vector: Optional[List[float]] = None, score: Optional[float] = None,
+                 id: Optional[str] = None, source_url: Optional[str] = None):
+        self.text = text
+        self.vector = vector if vector is not None else []
+        self.score = score
+        self.id = id
+        self.source_url = source_url
+
+class TrustedContextData:
+    __slots__ = ("entries",)
+
+    def __init__(self, entries: Dict[str, List[TrustedContextChunk]]):
+        self.entries = entries
+
+class TrustedEvalInput:
+    __slots__ = ("conversation", "context", "tenant")
+
+    def __init__(self, conversation: TrustedConversation, context: TrustedContextData,
+                 tenant: Optional[str] = None):
+        self.conversation = conversation
+        self.context = context
+        self.tenant = tenant
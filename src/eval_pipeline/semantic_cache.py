@@ -0,0 +1,182 @@
+"""
+Approximate (semantic) cache for groundedness scores.
+
+Bot responses are often the same template with different names or numbers,
+so exact-hash caches miss them. This cache indexes response embeddings with
+multi-table random-hyperplane LSH (NumPy only) and, for a response within a configurable
+cosine distance of a cached response *for the same context set*, reuses the
+cached score instead of running the cross-encoder. Embeddings of responses
+that differ in one number are close, so groundedness also puts the
+response's facts (dedup.facts(): numbers, dates) into the partition key.
+
+Memory is bounded by `max_entries` (one float32 embedding per entry), with LRU
+eviction. A fraction of approximate hits can be audited against the exact
+score to measure the accuracy cost of the speed-up.
+"""
+import hashlib
+import random
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .chunk_store import fast_hash
+
+class SemanticCache:
+    def __init__(self, max_entries: int = 10000, max_distance: float = 0.03,
+                 num_tables: int = 4, num_planes: int = 8, audit_rate: float = 0.0, seed: int = 0):
+        if not 0 < num_planes <= 62:
+            raise ValueError("num_planes must be between 1 and 62")
+        self.max_entries = max_entries
+        self._configured_max_entries: Optional[int] = None  # Before shrink_bytes(), until restore_caps()
+        self.max_distance = max_distance
+        self.num_tables = num_tables
+        self.num_planes = num_planes
+        self.audit_rate = audit_rate
+        self._seed = seed
+        self._rng = random.Random(seed)
+        self._planes: Optional[np.ndarray] = None
+        # entry id -> (bucket keys, embedding, score)
+        self._entries: "OrderedDict[int, Tuple[List[Hashable], np.ndarray, float]]" = OrderedDict()
+        self._buckets: Dict[Hashable, List[int]] = {}
+        self._next_id = 0
+
+        self.lookups = 0
+        self.hits = 0
+        self.audits = 0
+        self._abs_error_sum = 0.0
+        self.max_abs_error = 0.0
+        self._exact_ms_sum = 0.0
+        self._exact_count = 0
+
+    def _signatures(self, embedding: np.ndarray) -> List[int]:
+        """One `num_planes`-bit hyperplane signature per hash table."""
+        if self._planes is None:
+            rng = np.random.default_rng(self._seed)
+            self._planes = rng.standard_normal(
+                (self.num_tables, self.num_planes, embedding.shape[-1])).astype(np.float32)
+        bits = ((self._planes @ embedding) > 0).astype(np.int64)
+        return [int(s) for s in bits @ (1 << np.arange(self.num_planes, dtype=np.int64))]
+
+    def _bucket_keys(self, context_key: Hashable, embedding: np.ndarray) -> List[Hashable]:
+        return [(context_key, t, sig) for t, sig in enumerate(self._signatures(embedding))]
+
+    def _probe_keys(self, context_key: Hashable, embedding: np.ndarray) -> List[Hashable]:
+        # Multi-probe: in every table, the exact bucket plus each bucket one
+        # hyperplane flip away, so near neighbours straddling a plane are found.
+        keys = []
+        for t, sig in enumerate(self._signatures(embedding)):
+            keys.append((context_key, t, sig))
+            keys.extend((context_key, t, sig ^ (1 << b)) for b in range(self.num_planes))
+        return keys
+
+    def lookup(self, context_key: Hashable, embedding: np.ndarray) -> Optional[Tuple[float, float]]:
+        """
+        Returns (cached_score, cosine_distance) for the nearest cached response
+        within `max_distance` under the same context key, or None.
+        `embedding` must be L2-normalized.
+        """
+        self.lookups += 1
+        embedding = np.asarray(embedding, dtype=np.float32)
+        candidates = set()
+        for key in self._probe_keys(context_key, embedding):
+            candidates.update(self._buckets.get(key, ()))
+        best_id, best_distance = None, self.max_distance
+        for entry_id in candidates:
+            distance = 1.0 - float(np.dot(self._entries[entry_id][1], embedding))
+            if distance <= best_distance:
+                best_id, best_distance = entry_id, distance
+        if best_id is None:
+            return None
+        self._entries.move_to_end(best_id)
+        self.hits += 1
+        return self._entries[best_id][2], max(best_distance, 0.0)
+
+    def insert(self, context_key: Hashable, embedding: np.ndarray, score: float) -> None:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        keys = self._bucket_keys(context_key, embedding)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (keys, embedding, float(score))
+        for key in keys:
+            self._buckets.setdefault(key, []).append(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self) -> int:
+        old_id, (old_keys, old_embedding, _) = self._entries.popitem(last=False)
+        for key in old_keys:
+            members = self._buckets[key]
+            members.remove(old_id)
+            if not members:
+                del self._buckets[key]
+        return old_embedding.nbytes
+
+    def shrink_bytes(self, nbytes: int) -> int:
+        """
+        Evicts least-recently-used entries holding at least `nbytes` and
+        lowers `max_entries` to match until restore_caps(). Returns bytes freed.
+        """
+        if self._configured_max_entries is None:
+            self._configured_max_entries = self.max_entries
+        freed = 0
+        while self._entries and freed < nbytes:
+            freed += self._evict_oldest()
+        self.max_entries = min(self.max_entries, max(len(self._entries), 1))
+        return freed
+
+    def restore_caps(self) -> None:
+        """Puts back the entry limit shrink_bytes() lowered."""
+        if self._configured_max_entries is not None:
+            self.max_entries = self._configured_max_entries
+            self._configured_max_entries = None
+
+    def should_audit(self) -> bool:
+        """True for the sampled fraction of hits that should also be scored exactly."""
+        return self.audit_rate > 0 and self._rng.random() < self.audit_rate
+
+    def record_audit(self, approx_score: float, exact_score: float) -> None:
+        error = abs(approx_score - exact_score)
+        self.audits += 1
+        self._abs_error_sum += error
+        self.max_abs_error = max(self.max_abs_error, error)
+
+    def record_exact_time(self, elapsed_ms: float) -> None:
+        """Records the cost of an exact score, used to estimate time saved by hits."""
+        self._exact_ms_sum += elapsed_ms
+        self._exact_count += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by cached embeddings."""
+        return sum(e[1].nbytes for e in self._entries.values())
+
+    def stats(self) -> Dict[str, float]:
+        avg_exact_ms = self._exact_ms_sum / self._exact_count if self._exact_count else 0.0
+        return {
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "audits": self.audits,
+            "mean_abs_error": round(self._abs_error_sum / self.audits, 4) if self.audits else 0.0,
+            "max_abs_error": round(self.max_abs_error, 4),
+            # Audited hits were scored exactly as well, so they saved nothing
+            "est_saved_ms": round((self.hits - self.audits) * avg_exact_ms, 2),
+            "nbytes": self.nbytes,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._buckets.clear()
+
+def context_fingerprint(items: Sequence[Union[str, int]]) -> str:
+    """
+    Order-independent fingerprint of a context set, used as the cache partition key.
+    Items are chunk texts or precomputed 64-bit chunk fingerprints.
+    """
+    hashes = sorted(fast_hash(i) if isinstance(i, str) else int(i) for i in items)
+    return hashlib.blake2b(b"".join(h.to_bytes(8, "little") for h in hashes), digest_size=16).hexdigest()
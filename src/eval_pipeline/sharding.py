@@ -0,0 +1,209 @@
+"""
+Deterministic sharding of a corpus across machines.
+
+Every record is assigned to one of `num_buckets` buckets by a stable hash of
+its chat_id, so all records of a chat land on the same shard. The planner
+scans the corpus once and estimates each record's cost as turns × context
+chunks. It then assigns buckets to shards largest-first, each to the
+currently cheapest shard, so shards are balanced by work rather than by
+record count. Any node holding the plan can run shard i of N.
+
+The plan also stores each shard's record count and an order-independent
+checksum of its record keys. Merging shard outputs can then prove that no
+record is missing or duplicated without keeping the corpus around.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .aggregate import EvalReport
+from .chunk_store import fast_hash
+from .loader import iter_corpus, normalize_context, normalize_conversation
+
+_MASK64 = (1 << 64) - 1
+
+def record_key(record: Any, line_no: int) -> str:
+    """Stable identity of a corpus record: its "id", else its line number."""
+    if isinstance(record, dict) and record.get("id") is not None:
+        return str(record["id"])
+    return f"line:{line_no}"
+
+def record_chat_id(record: Any, line_no: int) -> str:
+    """The chat a record belongs to; unparseable records shard by line."""
+    try:
+        return str(normalize_conversation(record["conversation"])["id"])
+    except Exception:
+        return record_key(record, line_no)
+
+def record_cost(record: Any) -> int:
+    """Estimated evaluation cost: conversation turns × retrieved chunks."""
+    try:
+        turns = len(normalize_conversation(record["conversation"]).get("messages", []))
+        chunks = sum(len(c) for c in normalize_context(record["context"]).values())
+    except Exception:
+        return 1
+    return max(turns, 1) * max(chunks, 1)
+
+def parse_record(line: str) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+class ShardPlan:
+    def __init__(self, num_shards: int, num_buckets: int, bucket_shards: List[int],
+                 shard_records: Optional[List[int]] = None, shard_costs: Optional[List[int]] = None,
+                 shard_checksums: Optional[List[int]] = None, corpus: Optional[str] = None):
+        self.num_shards = num_shards
+        self.num_buckets = num_buckets
+        self.bucket_shards = bucket_shards
+        self.shard_records = shard_records or [0] * num_shards
+        self.shard_costs = shard_costs or [0] * num_shards
+        self.shard_checksums = shard_checksums or [0] * num_shards
+        self.corpus = corpus
+
+    def bucket_of(self, chat_id: str) -> int:
+        return fast_hash(chat_id) % self.num_buckets
+
+    def shard_of(self, chat_id: str) -> int:
+        return self.bucket_shards[self.bucket_of(chat_id)]
+
+    def total_checksum(self) -> int:
+        total = 0
+        for checksum in self.shard_checksums:
+            total = (total + checksum) & _MASK64
+        return total
+
+    def imbalance(self) -> float:
+        """Most expensive shard's cost over the mean (1.0 is perfect balance)."""
+        total = sum(self.shard_costs)
+        if not total:
+            return 1.0
+        return max(self.shard_costs) / (total / self.num_shards)
+
+    def to_dict(self) -> Dict:
+        return {
+            "num_shards": self.num_shards,
+            "num_buckets": self.num_buckets,
+            "bucket_shards": self.bucket_shards,
+            "shard_records": self.shard_records,
+            "shard_costs": self.shard_costs,
+            # JSON numbers are not safe beyond 2**53
+            "shard_checksums": [f"{c:016x}" for c in self.shard_checksums],
+            "corpus": self.corpus,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ShardPlan":
+        return cls(data["num_shards"], data["num_buckets"], data["bucket_shards"],
+                   shard_records=data["shard_records"], shard_costs=data["shard_costs"],
+                   shard_checksums=[int(c, 16) for c in data["shard_checksums"]],
+                   corpus=data.get("corpus"))
+
+    def save(self, path: str) -> None:
+        Path(path).write_text(json.dumps(self.to_dict()), encoding='utf-8')
+
+    @classmethod
+    def load(cls, path: str) -> "ShardPlan":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding='utf-8')))
+
+def iter_keyed_records(path: str) -> Iterable[Tuple[int, str, Any, str, str]]:
+    """Yields (line_no, line, parsed record or None, record key, chat_id) for a corpus."""
+    for line_no, line in iter_corpus(path):
+        record = parse_record(line)
+        yield line_no, line, record, record_key(record, line_no), record_chat_id(record, line_no)
+
+def plan_shards(corpus: str, num_shards: int, buckets_per_shard: int = 64) -> ShardPlan:
+    """
+    Scans the corpus and builds a cost-balanced plan. More buckets per shard
+    give finer balancing; one very large chat can still not be split.
+    """
+    if num_shards < 1:
+        raise ValueError("num_shards must be at least 1")
+    num_buckets = num_shards * buckets_per_shard
+    plan = ShardPlan(num_shards, num_buckets, [0] * num_buckets, corpus=corpus)
+    bucket_costs = [0] * num_buckets
+    bucket_records = [0] * num_buckets
+    bucket_checksums = [0] * num_buckets
+    for _, _, record, key, chat_id in iter_keyed_records(corpus):
+        bucket = plan.bucket_of(chat_id)
+        bucket_costs[bucket] += record_cost(record)
+        bucket_records[bucket] += 1
+        bucket_checksums[bucket] = (bucket_checksums[bucket] + fast_hash(key)) & _MASK64
+
+    # Longest-processing-time-first: biggest bucket to the cheapest shard
+    order = sorted(range(num_buckets), key=lambda b: (-bucket_costs[b], b))
+    for bucket in order:
+        shard = min(range(num_shards), key=lambda s: (plan.shard_costs[s], s))
+        plan.bucket_shards[bucket] = shard
+        plan.shard_costs[shard] += bucket_costs[bucket]
+        plan.shard_records[shard] += bucket_records[bucket]
+        plan.shard_checksums[shard] = (plan.shard_checksums[shard] + bucket_checksums[bucket]) & _MASK64
+    return plan
+
+class MergeResult:
+    def __init__(self, plan: ShardPlan):
+        self.plan = plan
+        self.reports = 0
+        self.duplicates: List[str] = []
+        self.missing: Optional[List[str]] = None  # Only known when the corpus is rescanned
+        self.keys_checksum = 0
+        # Per-shard counts, attributing each report by its chat_id (or record key)
+        self.shard_reports = [0] * plan.num_shards
+
+    @property
+    def expected(self) -> int:
+        return sum(self.plan.shard_records)
+
+    @property
+    def ok(self) -> bool:
+        """Exactly the planned records were reported, each once."""
+        return (not self.duplicates and not self.missing and self.reports == self.expected
+                and self.keys_checksum == self.plan.total_checksum())
+
+    def to_dict(self) -> Dict:
+        return {
+            "ok": self.ok,
+            "reports": self.reports,
+            "expected": self.expected,
+            "duplicates": self.duplicates,
+            "missing": self.missing,
+            "shard_reports": self.shard_reports,
+            "shard_expected": self.plan.shard_records,
+        }
+
+def iter_report_files(paths: Iterable[str]) -> Iterable[EvalReport]:
+    """Reads EvalReports back from JSONL shard outputs."""
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield EvalReport.model_validate_json(line)
+
+def merge_shards(plan: ShardPlan, inputs: Iterable[str], sink=None, summary=None,
+                 corpus: Optional[str] = None) -> MergeResult:
+    """
+    Streams shard reports into `sink` (and `summary`), keeping the first
+    report per record key, and checks the result against the plan. With
+    `corpus`, the exact missing record keys are listed too.
+    """
+    result = MergeResult(plan)
+    seen = set()
+    for report in iter_report_files(inputs):
+        key = report.record_id
+        if key is None:
+            raise ValueError("Shard reports need record_id; run shards with --shard-plan")
+        if key in seen:
+            result.duplicates.append(key)
+            continue
+        seen.add(key)
+        result.reports += 1
+        result.keys_checksum = (result.keys_checksum + fast_hash(key)) & _MASK64
+        result.shard_reports[plan.shard_of(report.chat_id or key)] += 1
+        if sink is not None:
+            sink.write(report)
+        if summary is not None:
+            summary.update(report)
+    if corpus is not None:
+        result.missing = [key for _, _, _, key, _ in iter_keyed_records(corpus) if key not in seen]
+    return result
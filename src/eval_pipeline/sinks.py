@@ -0,0 +1,316 @@
+"""
+Report sinks: where EvalReports go once produced.
+
+- JsonReportSink: the original indented JSON file (one report, or an array).
+- JsonlReportSink: one compact JSON object per line, streamed to disk.
+- ColumnarReportSink: reports buffered in typed columns and flushed as row
+  groups to Parquet or Arrow IPC (pyarrow), or to numbered .npz parts when
+  pyarrow is not installed. Scores can then be scanned without parsing the
+  text fields.
+- SqliteReportSink (result_store.py): an indexed SQLite store that can be
+  queried by chat, time range, status and score thresholds.
+
+JSONL, .npz and SQLite sinks support checkpoint(): everything written so far is
+made durable and a small state dict is returned. Passing that state back as
+`resume=` rolls the output back to exactly that point (see checkpoint.py).
+"""
+import json
+import os
+import typing
+import warnings
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .aggregate import EvalReport, MetricScores
+
+# pyarrow is optional: without it the columnar sink falls back to NumPy .npz
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+RESUMABLE_FORMATS = ("jsonl", "npz", "sqlite")
+
+class ReportSink:
+    """Base class for report sinks. Usable as a context manager."""
+
+    def write(self, report: EvalReport) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """Makes all written reports durable and returns the state to resume from."""
+        raise NotImplementedError(f"{type(self).__name__} does not support checkpointing")
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class JsonReportSink(ReportSink):
+    """
+    Indented JSON, as run_eval.py has always written. A single report is
+    written as an object; several are written as an array on close.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._reports: List[EvalReport] = []
+
+    def write(self, report: EvalReport) -> None:
+        self._reports.append(report)
+
+    def close(self) -> None:
+        with open(self.path, 'w', encoding='utf-8') as f:
+            if len(self._reports) == 1:
+                f.write(self._reports[0].model_dump_json(indent=2))
+            else:
+                json.dump([r.model_dump(mode="json") for r in self._reports], f, indent=2)
+
+class JsonlReportSink(ReportSink):
+    """One compact JSON report per line, flushed to disk every `flush_every` reports."""
+
+    def __init__(self, path: str, flush_every: int = 1000, append: bool = False,
+                 resume: Optional[Dict[str, Any]] = None):
+        self.path = Path(path)
+        self.flush_every = flush_every
+        if resume is not None:
+            # Drop reports written after the checkpoint, then keep appending
+            with open(self.path, 'r+b') as f:
+                f.truncate(resume["bytes"])
+            append = True
+        self._file = open(self.path, 'a' if append else 'w', encoding='utf-8')
+        self._pending = 0
+
+    def write(self, report: EvalReport) -> None:
+        self._file.write(report.model_dump_json())
+        self._file.write("\n")
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        self._file.flush()
+        self._pending = 0
+
+    def checkpoint(self) -> Dict[str, Any]:
+        self.flush()
+        os.fsync(self._file.fileno())
+        return {"bytes": self._file.tell()}
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+def _column_kind(annotation: Any) -> str:
+    """Maps a MetricScores field annotation to a column kind."""
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    base = args[0] if args else annotation
+    if base is bool:
+        return "bool"
+    if base is int:
+        return "int"
+    if base is float:
+        return "float"
+    return "skip"  # Nested/list-valued fields are not columnar
+
+# Columns taken from the report itself; score columns are derived from
+# MetricScores so new scalar metrics show up without touching the sink.
+REPORT_COLUMNS = {
+    "chat_id": "str",
+    "record_id": "str",
+    "status": "str",
+    "evaluated_at": "float",
+    "error": "str",
+    "tenant": "str",
+}
+TEXT_COLUMNS = {
+    "target_user_message": "str",
+    "target_ai_response": "str",
+}
+
+def score_columns() -> Dict[str, str]:
+    columns = {}
+    for name, field in MetricScores.model_fields.items():
+        kind = _column_kind(field.annotation)
+        if kind != "skip":
+            columns[name] = kind
+    return columns
+
+class ColumnarReportSink(ReportSink):
+    """
+    Buffers reports in typed columns and writes a row group every
+    `row_group_size` reports.
+
+    Missing scores (skipped/failed reports) are NaN in float columns, and
+    null in Parquet/Arrow. In the .npz fallback, bool and int columns use -1
+    for missing. Each .npz row group is its own file (`<stem>.00000.npz`, ...),
+    since .npz archives cannot be appended to. Text columns are stored as
+    `<name>.offsets` and `<name>.data` (UTF-8 bytes, missing as empty), since
+    a fixed-width string array would be as wide as its longest response in
+    every row; read parts back with load_npz_part().
+    """
+
+    FORMATS = ("parquet", "arrow", "npz")
+
+    def __init__(self, path: str, format: str = "parquet", row_group_size: int = 10000,
+                 include_text: bool = True, resume: Optional[Dict[str, Any]] = None):
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown columnar format: {format}")
+        if format != "npz" and not HAS_PYARROW:
+            warnings.warn(f"pyarrow is not installed; writing .npz row groups instead of {format}")
+            format = "npz"
+        self.path = Path(path)
+        self.format = format
+        self.row_group_size = row_group_size
+        self.columns = dict(REPORT_COLUMNS)
+        if include_text:
+            self.columns.update(TEXT_COLUMNS)
+        self.columns.update(score_columns())
+        self._buffer: Dict[str, List[Any]] = {name: [] for name in self.columns}
+        self._rows = 0
+        self._writer = None
+        self.row_groups_written = 0
+        self.rows_written = 0
+        self._synced_row_groups = 0
+        if resume is not None:
+            if self.format != "npz":
+                raise ValueError(f"Resuming is not supported for {self.format} output; use jsonl or npz")
+            self.row_groups_written = resume["row_groups_written"]
+            self.rows_written = resume["rows_written"]
+            self._synced_row_groups = self.row_groups_written
+            # Parts written after the checkpoint are discarded
+            for part in self.path.parent.glob(f"{self.path.stem}.*.npz"):
+                index = part.name[len(self.path.stem) + 1:-len(".npz")]
+                if index.isdigit() and int(index) >= self.row_groups_written:
+                    part.unlink()
+
+    def write(self, report: EvalReport) -> None:
+        scores = report.scores.model_dump() if report.scores else {}
+        for name in self.columns:
+            if name in REPORT_COLUMNS or name in TEXT_COLUMNS:
+                self._buffer[name].append(getattr(report, name))
+            else:
+                self._buffer[name].append(scores.get(name))
+        self._rows += 1
+        if self._rows >= self.row_group_size:
+            self.flush()
+
+    def _numpy_columns(self) -> Dict[str, np.ndarray]:
+        arrays = {}
+        for name, kind in self.columns.items():
+            values = self._buffer[name]
+            if kind == "str":
+                encoded = [b"" if v is None else v.encode("utf-8") for v in values]
+                offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                offsets[1:] = np.cumsum([len(b) for b in encoded], dtype=np.int64)
+                arrays[f"{name}.offsets"] = offsets
+                arrays[f"{name}.data"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+            elif kind == "float":
+                arrays[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            elif kind == "bool":
+                arrays[name] = np.array([-1 if v is None else int(v) for v in values], dtype=np.int8)
+            else:
+                arrays[name] = np.array([-1 if v is None else v for v in values], dtype=np.int64)
+        return arrays
+
+    def _arrow_table(self):
+        types = {"str": pa.string(), "float": pa.float64(), "bool": pa.bool_(), "int": pa.int64()}
+        schema = pa.schema([(name, types[kind]) for name, kind in self.columns.items()])
+        return pa.Table.from_pydict(self._buffer, schema=schema)
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        if self.format == "npz":
+            np.savez(self._part_path(self.row_groups_written), **self._numpy_columns())
+        else:
+            table = self._arrow_table()
+            if self._writer is None:
+                if self.format == "parquet":
+                    self._writer = pq.ParquetWriter(str(self.path), table.schema)
+                else:
+                    self._writer = pa.ipc.new_file(str(self.path), table.schema)
+            self._writer.write_table(table)
+        self.row_groups_written += 1
+        self.rows_written += self._rows
+        self._buffer = {name: [] for name in self.columns}
+        self._rows = 0
+
+    def _part_path(self, index: int) -> Path:
+        return self.path.with_name(f"{self.path.stem}.{index:05d}.npz")
+
+    def checkpoint(self) -> Dict[str, Any]:
+        """
+        Flushes the buffered rows as a (possibly short) row group. Only .npz
+        output can be resumed: Parquet and Arrow files are unreadable until
+        their footer is written on close.
+        """
+        if self.format != "npz":
+            return super().checkpoint()
+        self.flush()
+        # Parts written by flush() since the last checkpoint are not synced yet
+        for index in range(self._synced_row_groups, self.row_groups_written):
+            with open(self._part_path(index), 'rb') as f:
+                os.fsync(f.fileno())
+        self._synced_row_groups = self.row_groups_written
+        return {"row_groups_written": self.row_groups_written, "rows_written": self.rows_written}
+
+    def close(self) -> None:
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+def load_npz_part(path: str) -> Dict[str, np.ndarray]:
+    """Columns of one .npz row group, with text columns decoded to object arrays of str."""
+    with np.load(path) as part:
+        arrays = {name: part[name] for name in part.files}
+    for key in [k for k in arrays if k.endswith(".offsets")]:
+        name = key[:-len(".offsets")]
+        offsets, data = arrays.pop(key), arrays.pop(f"{name}.data").tobytes()
+        text = np.empty(len(offsets) - 1, dtype=object)
+        text[:] = [data[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+        arrays[name] = text
+    return arrays
+
+def infer_format(path: str) -> str:
+    """Picks a sink format from the output file extension."""
+    suffix = Path(path).suffix.lower()
+    return {
+        ".jsonl": "jsonl",
+        ".ndjson": "jsonl",
+        ".parquet": "parquet",
+        ".arrow": "arrow",
+        ".feather": "arrow",
+        ".npz": "npz",
+        ".db": "sqlite",
+        ".sqlite": "sqlite",
+        ".sqlite3": "sqlite",
+    }.get(suffix, "json")
+
+def open_sink(path: str, format: Optional[str] = None, **kwargs) -> ReportSink:
+    """Creates the sink for `format` (inferred from the extension when omitted)."""
+    format = format or infer_format(path)
+    if format == "json":
+        return JsonReportSink(path)
+    if format == "jsonl":
+        return JsonlReportSink(path, **kwargs)
+    if format == "sqlite":
+        # Imported here: result_store builds on this module
+        from .result_store import SqliteReportSink
+        kwargs.pop("append", None)  # A store always appends
+        return SqliteReportSink(path, **kwargs)
+    return ColumnarReportSink(path, format=format, **kwargs)
@@ -0,0 +1,260 @@
+"""
+Low-overhead profiling of evaluations, tagged by pipeline stage.
+
+A StackProfiler samples the Python stacks of threads that are inside a
+profiled request every `interval_ms` from a background thread
+(sys._current_frames), so the evaluating threads run uninstrumented. Each
+sample is attributed to the stage the thread is in ("loading",
+"targeting", one per metric in aggregate.STAGES, or "other"), which
+becomes the root frame of its stack.
+
+Where stacks cannot be sampled, or with mode="cprofile", cProfile runs in
+the profiled threads instead, one profile per stage; it is exact but slows
+evaluation down, and only gives caller -> callee pairs, not full stacks.
+On Python 3.12+ cProfile profiles the whole interpreter, so mode="cprofile"
+falls back to sampling there.
+
+Output is collapsed stacks ("stage:groundedness;run_evaluation (...);... 42"),
+the input format of flamegraph.pl, speedscope and inferno. Sample counts
+are samples; cProfile weights are microseconds of own time.
+
+With `fraction` < 1, only that share of requests is profiled (decided at
+random per request), so a long-running worker can stay profiled in
+production. Code marks requests and stages with profile_request() and
+profile_stage(); both do nothing unless a profiler has been started.
+"""
+import cProfile
+import os
+import pstats
+import random
+import sys
+import threading
+import warnings
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Tuple
+
+from . import config
+
+MODES = ("sample", "cprofile")
+OTHER_STAGE = "other"  # Profiled time outside any tagged stage
+MAX_DEPTH = 128  # Frames kept per sample (innermost)
+# From 3.12 cProfile is built on sys.monitoring: one active profiler per
+# interpreter, covering every thread, so per-thread stage profiles would clash
+CPROFILE_PER_THREAD = sys.version_info < (3, 12)
+
+_labels: Dict[object, str] = {}
+
+def _location(filename: str, lineno: int) -> str:
+    return f"{'/'.join(filename.replace(os.sep, '/').rsplit('/', 2)[-2:])}:{lineno}"
+
+def _code_label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{code.co_name} ({_location(code.co_filename, code.co_firstlineno)})"
+    return label
+
+def _func_label(func: Tuple[str, int, str]) -> str:
+    # pstats function key: (filename, line, name); builtins have filename "~"
+    filename, lineno, name = func
+    return name if filename == "~" else f"{name} ({_location(filename, lineno)})"
+
+class StackProfiler:
+    """Samples (or cProfiles) the threads of profiled requests; see the module docstring."""
+
+    def __init__(self, mode: str = "sample", interval_ms: Optional[float] = None,
+                 fraction: Optional[float] = None, seed: Optional[int] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        if mode == "sample" and not hasattr(sys, "_current_frames"):
+            warnings.warn("Stack sampling is not available on this interpreter; using cProfile")
+            mode = "cprofile"
+        elif mode == "cprofile" and not CPROFILE_PER_THREAD:
+            warnings.warn("cProfile cannot profile threads separately on Python 3.12+; using sampling")
+            mode = "sample"
+        self.mode = mode
+        self.interval_s = (config.PROFILE_INTERVAL_MS if interval_ms is None else interval_ms) / 1000
+        self.fraction = config.PROFILE_FRACTION if fraction is None else fraction
+        self.requests_seen = 0
+        self.requests_profiled = 0
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._threads: Dict[int, List[str]] = {}  # Thread id -> stage stack, while in a profiled request
+        self._profiles: List[Tuple[str, cProfile.Profile]] = []
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self) -> "StackProfiler":
+        if self.mode == "sample" and self._sampler is None:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, name="stack-sampler", daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops sampling. Call once profiled requests have finished."""
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frames = sys._current_frames()
+            for tid, stages in list(self._threads.items()):
+                frame = frames.get(tid)
+                try:
+                    # Read once, before walking: the thread keeps running and may leave its last stage
+                    stage = stages[-1]
+                except IndexError:
+                    continue
+                if frame is None:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < MAX_DEPTH:
+                    labels.append(_code_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(f"stage:{stage}")
+                self._stacks[";".join(reversed(labels))] += 1
+                self.samples += 1
+
+    def _enter(self, stage: str) -> None:
+        local = self._local
+        stages = self._threads.setdefault(threading.get_ident(), [])
+        if self.mode == "cprofile":
+            if stages:
+                local.profiles[stages[-1]].disable()
+            profile = local.profiles.get(stage)
+            if profile is None:
+                profile = local.profiles[stage] = cProfile.Profile()
+                with self._lock:
+                    self._profiles.append((stage, profile))
+            profile.enable()
+        stages.append(stage)
+
+    def _exit(self) -> None:
+        tid = threading.get_ident()
+        stages = self._threads[tid]
+        stage = stages.pop()
+        if self.mode == "cprofile":
+            self._local.profiles[stage].disable()
+            if stages:
+                self._local.profiles[stages[-1]].enable()
+        if not stages:
+            del self._threads[tid]
+
+    @contextmanager
+    def request(self):
+        """
+        Marks one request (loading and evaluating one input) on this thread;
+        yields whether it is profiled. Nested calls join the enclosing request.
+        """
+        local = self._local
+        if getattr(local, "depth", 0):
+            local.depth += 1
+            try:
+                yield local.sampled
+            finally:
+                local.depth -= 1
+            return
+        with self._lock:
+            self.requests_seen += 1
+            sampled = self._random.random() < self.fraction
+            self.requests_profiled += sampled
+        local.depth, local.sampled = 1, sampled
+        if sampled:
+            if not hasattr(local, "profiles"):
+                local.profiles = {}
+            self._enter(OTHER_STAGE)
+        try:
+            yield sampled
+        finally:
+            if sampled:
+                self._exit()
+            local.depth, local.sampled = 0, False
+
+    @contextmanager
+    def stage(self, name: str):
+        """Attributes this thread's samples to `name` while inside a profiled request."""
+        if not getattr(self._local, "sampled", False):
+            yield
+            return
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def collapsed(self) -> Dict[str, int]:
+        """Collapsed stacks -> weight (samples, or microseconds in cProfile mode)."""
+        if self.mode == "sample":
+            return dict(self._stacks)
+        stacks: Counter = Counter()
+        with self._lock:
+            profiles = list(self._profiles)
+        for stage, profile in profiles:
+            for func, (_, _, own, _, callers) in pstats.Stats(profile).stats.items():
+                label = _func_label(func)
+                if not callers:
+                    stacks[f"stage:{stage};{label}"] += round(own * 1e6)
+                for caller, timing in callers.items():
+                    stacks[f"stage:{stage};{_func_label(caller)};{label}"] += round(timing[2] * 1e6)
+        return {stack: weight for stack, weight in stacks.items() if weight > 0}
+
+    def stage_totals(self) -> Dict[str, int]:
+        """Total weight per stage, largest first."""
+        totals: Counter = Counter()
+        for stack, weight in self.collapsed().items():
+            totals[stack.split(";", 1)[0][len("stage:"):]] += weight
+        return dict(totals.most_common())
+
+    def write(self, path: str) -> int:
+        """
+        Writes collapsed stacks to `path`, heaviest first, and returns the
+        number of lines. In cProfile mode the merged pstats go to `path`.pstats.
+        """
+        stacks = sorted(self.collapsed().items(), key=lambda item: -item[1])
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, weight in stacks:
+                f.write(f"{stack} {weight}\n")
+        if self.mode == "cprofile" and self._profiles:
+            pstats.Stats(*(profile for _, profile in self._profiles)).dump_stats(f"{path}.pstats")
+        return len(stacks)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"mode": self.mode, "requests_seen": self.requests_seen,
+                "requests_profiled": self.requests_profiled, "samples": self.samples,
+                "stages": self.stage_totals()}
+
+# Process-wide profiler, off until start_profiling()
+_profiler: Optional[StackProfiler] = None
+_NULL = nullcontext()
+
+def start_profiling(mode: str = "sample", interval_ms: Optional[float] = None,
+                    fraction: Optional[float] = None) -> StackProfiler:
+    global _profiler
+    stop_profiling()
+    _profiler = StackProfiler(mode, interval_ms, fraction).start()
+    return _profiler
+
+def stop_profiling() -> Optional[StackProfiler]:
+    """Stops and detaches the process profiler; returns it for its results."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+def get_profiler() -> Optional[StackProfiler]:
+    return _profiler
+
+def profile_request():
+    """Context manager marking a request for the process profiler (no-op when off)."""
+    return _profiler.request() if _profiler is not None else _NULL
+
+def profile_stage(name: str):
+    """Context manager tagging a pipeline stage for the process profiler (no-op when off)."""
+    return _profiler.stage(name) if _profiler is not None else _NULL
@@ -0,0 +1,319 @@
+"""
+Streaming, mergeable score-distribution summaries.
+
+A RunSummary is updated as each EvalReport is produced and keeps counters plus
+KLL quantile sketches for relevance, groundedness, latency and cost, overall
+and optionally per cohort (see COHORT_KEYS). Summaries from different workers or
+shards merge into one, and serialize to plain JSON, so percentiles such as
+p99 latency never need a second pass over the reports.
+"""
+import json
+import math
+import random
+from typing import Callable, Dict, List, Optional, Union
+
+from . import config
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang & Liberty, 2016).
+
+    Items live in a stack of compactors; an item at level h stands for 2**h
+    original items. When the sketch is full, a level is sorted and every
+    other item (random offset) is promoted to the next level. Memory is
+    O(k log(n/k)) and rank error is roughly 1/k with high probability.
+    """
+
+    def __init__(self, k: int = 200, c: float = 2.0 / 3.0, seed: Optional[int] = None):
+        self.k = k
+        self.c = c
+        self.compactors: List[List[float]] = []
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._size = 0
+        self._max_size = 0
+        self._rng = random.Random(seed)
+        self._grow()
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * self.c ** depth)) + 1
+
+    def _grow(self) -> None:
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compact_level(self, level: int) -> None:
+        items = self.compactors[level]
+        items.sort()
+        # With an odd number of items, one stays behind at this level
+        leftover = [items.pop()] if len(items) % 2 else []
+        offset = 1 if self._rng.random() < 0.5 else 0
+        self.compactors[level + 1].extend(items[offset::2])
+        self.compactors[level] = leftover
+
+    def _compress(self) -> None:
+        for level in range(len(self.compactors)):
+            if len(self.compactors[level]) >= self._capacity(level):
+                if level + 1 >= len(self.compactors):
+                    self._grow()
+                self._compact_level(level)
+                self._size = sum(len(c) for c in self.compactors)
+                if self._size < self._max_size:
+                    break
+
+    def update(self, value: float) -> None:
+        self.compactors[0].append(value)
+        self._size += 1
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Folds `other` into this sketch (in place) and returns self."""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._size = sum(len(c) for c in self.compactors)
+        while self._size >= self._max_size:
+            self._compress()
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate q-quantile (0 <= q <= 1), or None for an empty sketch."""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        weighted = sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self.compactors)
+            for value in items
+        )
+        total = sum(w for _, w in weighted)
+        target = q * total
+        cumulative = 0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            "k": self.k,
+            "c": self.c,
+            "count": self.count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "compactors": self.compactors,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "KLLSketch":
+        sketch = cls(k=data["k"], c=data["c"])
+        for _ in range(len(data["compactors"]) - 1):
+            sketch._grow()
+        sketch.compactors = [list(items) for items in data["compactors"]]
+        sketch.count = data["count"]
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        sketch._size = sum(len(c) for c in sketch.compactors)
+        return sketch
+
+class MetricSummary:
+    """Count, sum and quantile sketch for one metric."""
+
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, k: int = 200):
+        self.sketch = KLLSketch(k=k)
+        self.total = 0.0
+
+    @property
+    def count(self) -> int:
+        return self.sketch.count
+
+    def update(self, value: float) -> None:
+        self.sketch.update(float(value))
+        self.total += value
+
+    def merge(self, other: "MetricSummary") -> "MetricSummary":
+        self.sketch.merge(other.sketch)
+        self.total += other.total
+        return self
+
+    def describe(self) -> Dict[str, Optional[float]]:
+        """Human-oriented view: count, mean, min/max and key percentiles."""
+        result = {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.sketch.min if self.count else None,
+            "max": self.sketch.max if self.count else None,
+        }
+        for q in self.QUANTILES:
+            result[f"p{int(q * 100)}"] = self.sketch.quantile(q)
+        return result
+
+    def to_dict(self) -> Dict:
+        return {"total": self.total, "sketch": self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MetricSummary":
+        summary = cls()
+        summary.sketch = KLLSketch.from_dict(data["sketch"])
+        summary.total = data["total"]
+        return summary
+
+class CohortSummary:
+    """Status counters, toxicity rate and metric distributions for a set of reports."""
+
+    METRICS = ("relevance", "groundedness", "latency_ms", "estimated_cost")
+
+    def __init__(self, k: int = 200):
+        self.k = k
+        self.status_counts: Dict[str, int] = {}
+        self.toxic = 0
+        self.toxicity_checked = 0
+        self.metrics = {name: MetricSummary(k=k) for name in self.METRICS}
+
+    @property
+    def reports(self) -> int:
+        return sum(self.status_counts.values())
+
+    def update(self, report) -> None:
+        self.status_counts[report.status] = self.status_counts.get(report.status, 0) + 1
+        scores = report.scores
+        if scores is None:
+            return
+        for name, summary in self.metrics.items():
+            value = getattr(scores, name, None)
+            if value is not None:
+                summary.update(value)
+        if scores.toxicity is not None:
+            self.toxicity_checked += 1
+            # The report's tenant may hold it to a threshold other than the default
+            passed = getattr(report, "verdicts", {}).get("toxicity")
+            if passed is False or (passed is None and scores.toxicity > config.TOXICITY_THRESHOLD):
+                self.toxic += 1
+
+    def merge(self, other: "CohortSummary") -> "CohortSummary":
+        for status, n in other.status_counts.items():
+            self.status_counts[status] = self.status_counts.get(status, 0) + n
+        self.toxic += other.toxic
+        self.toxicity_checked += other.toxicity_checked
+        for name, summary in other.metrics.items():
+            self.metrics.setdefault(name, MetricSummary(k=self.k)).merge(summary)
+        return self
+
+    def describe(self) -> Dict:
+        return {
+            "reports": self.reports,
+            "status_counts": dict(self.status_counts),
+            "toxicity_rate": self.toxic / self.toxicity_checked if self.toxicity_checked else None,
+            "metrics": {name: s.describe() for name, s in self.metrics.items()},
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "k": self.k,
+            "status_counts": self.status_counts,
+            "toxic": self.toxic,
+            "toxicity_checked": self.toxicity_checked,
+            "metrics": {name: s.to_dict() for name, s in self.metrics.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CohortSummary":
+        cohort = cls(k=data["k"])
+        cohort.status_counts = dict(data["status_counts"])
+        cohort.toxic = data["toxic"]
+        cohort.toxicity_checked = data["toxicity_checked"]
+        cohort.metrics = {name: MetricSummary.from_dict(m) for name, m in data["metrics"].items()}
+        return cohort
+
+def _chat_id_cohort(report) -> Optional[str]:
+    return report.chat_id
+
+def _tenant_cohort(report) -> Optional[str]:
+    return report.tenant
+
+# Named cohort keys. Memory and serialized size grow with the number of
+# cohorts, so chat_id (one cohort per conversation) is for small runs only.
+COHORT_KEYS: Dict[str, Callable] = {"chat_id": _chat_id_cohort, "tenant": _tenant_cohort}
+
+class RunSummary:
+    """
+    Overall and per-cohort summaries for a run.
+    Only the overall summary is kept unless `cohort_key` is given: a name
+    from COHORT_KEYS (kept across to_dict / from_dict) or a function of the
+    report. Cohort sketches use a smaller k than the overall one, since
+    there can be many cohorts.
+    """
+
+    def __init__(self, k: int = 200, cohort_k: int = 32,
+                 cohort_key: Optional[Union[str, Callable]] = None):
+        if isinstance(cohort_key, str) and cohort_key not in COHORT_KEYS:
+            raise ValueError(f"Unknown cohort key: {cohort_key}")
+        self.cohort_k = cohort_k
+        self.cohort_by = cohort_key if isinstance(cohort_key, str) else None
+        self.cohort_key = COHORT_KEYS[cohort_key] if isinstance(cohort_key, str) else cohort_key
+        self.overall = CohortSummary(k=k)
+        self.cohorts: Dict[str, CohortSummary] = {}
+
+    def update(self, report) -> None:
+        self.overall.update(report)
+        if self.cohort_key is not None:
+            key = self.cohort_key(report)
+            if key is not None:
+                if key not in self.cohorts:
+                    self.cohorts[key] = CohortSummary(k=self.cohort_k)
+                self.cohorts[key].update(report)
+
+    def merge(self, other: "RunSummary") -> "RunSummary":
+        """Combines summaries from another worker or shard into this one."""
+        self.overall.merge(other.overall)
+        for key, cohort in other.cohorts.items():
+            if key in self.cohorts:
+                self.cohorts[key].merge(cohort)
+            else:
+                self.cohorts[key] = CohortSummary.from_dict(cohort.to_dict())
+        return self
+
+    def describe(self, include_cohorts: bool = False) -> Dict:
+        result = {"overall": self.overall.describe()}
+        if include_cohorts:
+            result["cohorts"] = {key: c.describe() for key, c in self.cohorts.items()}
+        return result
+
+    def to_dict(self) -> Dict:
+        return {
+            "cohort_k": self.cohort_k,
+            "cohort_by": self.cohort_by,
+            "overall": self.overall.to_dict(),
+            "cohorts": {key: c.to_dict() for key, c in self.cohorts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RunSummary":
+        summary = cls(cohort_k=data["cohort_k"], cohort_key=data.get("cohort_by"))
+        summary.overall = CohortSummary.from_dict(data["overall"])
+        summary.cohorts = {key: CohortSummary.from_dict(c) for key, c in data["cohorts"].items()}
+        return summary
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, text: str) -> "RunSummary":
+        return cls.from_dict(json.loads(text))
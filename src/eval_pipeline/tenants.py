@@ -0,0 +1,139 @@
+"""
+Per-tenant models and thresholds.
+
+Different client bots are held to different standards and sometimes use
+different models. A tenants file maps tenant names to overrides of the
+config.py defaults:
+
+    {
+      "clinic-a": {"groundedness_threshold": 0.7},
+      "clinic-b": {"relevance_model": "all-mpnet-base-v2", "groundedness_precision": "int8"}
+    }
+
+The file is re-read whenever it changes, so tenants can be added or retuned
+without restarting workers. Unknown tenants get the defaults.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+from . import config
+from .models import ModelKey
+
+class TenantConfig(BaseModel):
+    name: str = "default"
+    relevance_model: str = 'all-MiniLM-L6-v2'
+    relevance_backend: str = "sentence-transformers"
+    relevance_precision: str = "fp32"
+    groundedness_model: str = 'cross-encoder/nli-deberta-v3-small'
+    groundedness_backend: str = "cross-encoder"
+    groundedness_precision: str = "fp32"
+    relevance_threshold: float = 0.7
+    completeness_threshold: float = 0.6
+    groundedness_threshold: float = 0.5
+    toxicity_threshold: float = 0.5
+    context_relevance_threshold: float = 0.35
+    claim_support_threshold: float = 0.5
+    weight: float = 1.0  # Share of a busy worker relative to other tenants (see scheduling.py)
+
+    @classmethod
+    def from_config(cls, name: str = "default", **overrides) -> "TenantConfig":
+        """The config.py defaults, with `overrides` applied."""
+        values = dict(
+            relevance_model=config.RELEVANCE_MODEL,
+            groundedness_model=config.GROUNDEDNESS_MODEL,
+            relevance_threshold=config.RELEVANCE_THRESHOLD,
+            completeness_threshold=config.COMPLETENESS_THRESHOLD,
+            groundedness_threshold=config.GROUNDEDNESS_THRESHOLD,
+            toxicity_threshold=config.TOXICITY_THRESHOLD,
+            context_relevance_threshold=config.CONTEXT_RELEVANCE_THRESHOLD,
+            claim_support_threshold=config.CLAIM_SUPPORT_THRESHOLD,
+        )
+        values.update(overrides)
+        return cls(name=name, **values)
+
+    def model_key(self, role: str) -> ModelKey:
+        """Registry key of the model this tenant uses for "relevance" or "groundedness"."""
+        return ModelKey(getattr(self, f"{role}_model"), getattr(self, f"{role}_backend"),
+                        getattr(self, f"{role}_precision"))
+
+    def verdicts(self, scores) -> Dict[str, bool]:
+        """Pass/fail per computed metric under this tenant's thresholds."""
+        checks = {
+            "relevance": (scores.relevance, lambda v: v >= self.relevance_threshold),
+            "completeness": (scores.completeness, lambda v: v >= self.completeness_threshold),
+            "groundedness": (scores.groundedness, lambda v: v >= self.groundedness_threshold),
+            "toxicity": (scores.toxicity, lambda v: v <= self.toxicity_threshold),
+        }
+        return {name: passed(value) for name, (value, passed) in checks.items() if value is not None}
+
+MODEL_ROLES = ("relevance", "groundedness")
+
+def model_overrides(tenant: TenantConfig) -> Dict[str, ModelKey]:
+    """The roles where `tenant` uses a model other than the default, with its key."""
+    default = TenantConfig.from_config()
+    keys = {role: tenant.model_key(role) for role in MODEL_ROLES}
+    return {role: key for role, key in keys.items() if key != default.model_key(role)}
+
+class TenantDirectory:
+    """Tenant configurations from a JSON file, reloaded when the file changes."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self._tenants: Dict[str, TenantConfig] = {}
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.error: Optional[str] = None  # Why the latest version of the file was rejected
+
+    def _maybe_reload(self) -> None:
+        if self.path is None:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return  # Keep the last good configuration
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
+            try:
+                raw = json.loads(self.path.read_text(encoding='utf-8'))
+                raw = raw.get("tenants", raw)
+                tenants = {name: TenantConfig.from_config(name, **overrides) for name, overrides in raw.items()}
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                # A bad edit must not take running workers down: keep the last good tenants
+                self.error = str(e)
+                return
+            self._tenants = tenants
+            self.error = None
+            self.reloads += 1
+
+    def set(self, tenant: TenantConfig) -> None:
+        """Adds or replaces a tenant programmatically."""
+        self._tenants[tenant.name] = tenant
+
+    def get(self, name: Optional[str]) -> TenantConfig:
+        self._maybe_reload()
+        tenant = self._tenants.get(name) if name else None
+        return tenant if tenant is not None else TenantConfig.from_config(name or "default")
+
+_directory = TenantDirectory(config.TENANTS_FILE)
+
+def configure_tenants(path: Optional[str]) -> TenantDirectory:
+    """Reads tenants from `path` (None: defaults only) from now on."""
+    global _directory
+    _directory = TenantDirectory(path)
+    return _directory
+
+def get_tenants() -> TenantDirectory:
+    return _directory
+
+def get_tenant(name: Optional[str]) -> TenantConfig:
+    return _directory.get(name)
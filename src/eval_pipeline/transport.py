@@ -0,0 +1,202 @@
+"""
+Message transports for the queue consumer (see consumer.py).
+
+A transport hands out batches of messages, takes acks for the ones that were
+processed, and takes nacks for the ones that failed. A nacked message is
+redelivered later until it has been attempted `max_attempts` times. After
+that it moves to the dead-letter queue.
+
+SqliteTransport is a durable local stand-in for Kafka / RabbitMQ. Messages
+live in one SQLite file (WAL mode, so producers and a consumer can share
+it), and nothing is held in memory beyond the batch handed out. A message
+that is received but never acked (for example, the worker crashed) becomes
+visible again after `visibility_timeout` seconds. Delivery is therefore
+at-least-once. A message whose lease expires on its last attempt is
+dead-lettered, so one that crashes every worker is not redelivered forever. Messages can carry a priority (lower is delivered first,
+by id within a priority), so urgent work is leased ahead of a backlog.
+"""
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, NamedTuple, Optional
+
+class QueueMessage(NamedTuple):
+    id: int
+    body: str
+    attempts: int  # Including this delivery
+
+class Transport:
+    """Base class for queue transports."""
+
+    def publish(self, bodies: Iterable[str], priorities: Optional[Iterable[int]] = None) -> int:
+        raise NotImplementedError
+
+    def receive(self, max_messages: int) -> List[QueueMessage]:
+        """Up to `max_messages` messages; an empty list when none are ready."""
+        raise NotImplementedError
+
+    def ack(self, message_ids: List[int]) -> None:
+        raise NotImplementedError
+
+    def nack(self, message_id: int, error: str, retry: bool = True) -> bool:
+        """
+        Reports a failed message. Returns True if it was dead-lettered
+        (retry=False, or out of attempts), False if it will be redelivered.
+        """
+        raise NotImplementedError
+
+    def release(self, message_ids: List[int]) -> None:
+        """Hands leased messages back unprocessed: visible at once, without using up an attempt."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    body TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'ready',
+    priority INTEGER NOT NULL DEFAULT 1,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    visible_at REAL NOT NULL,
+    enqueued_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_ready ON messages (queue, state, visible_at, id);
+"""
+
+class SqliteTransport(Transport):
+    """
+    SQLite-backed durable queue. Ready and in-flight messages share one
+    table; receive() leases messages by pushing their visible_at forward, and
+    dead-lettered messages stay in the table with state 'dead'.
+    """
+
+    def __init__(self, path: str, queue: str = "evals", max_attempts: int = 3,
+                 visibility_timeout: float = 300.0, retry_delay: float = 1.0):
+        self.path = path
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.visibility_timeout = visibility_timeout
+        self.retry_delay = retry_delay
+        # One connection shared by the consumer's fetch and ack paths
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: a power loss must not lose a published message or undo an ack
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(messages)")}
+        if "priority" not in columns:  # Queue file from before priorities
+            self._conn.execute("ALTER TABLE messages ADD COLUMN priority INTEGER NOT NULL DEFAULT 1")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_priority ON messages (queue, priority, id)")
+
+    def publish(self, bodies: Iterable[str], priorities: Optional[Iterable[int]] = None) -> int:
+        now = time.time()
+        bodies = list(bodies)
+        priorities = list(priorities) if priorities is not None else [1] * len(bodies)
+        rows = [(self.queue, body, priority, now, now) for body, priority in zip(bodies, priorities)]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO messages (queue, body, priority, visible_at, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+                rows)
+            self._conn.execute("COMMIT")
+        return len(rows)
+
+    def receive(self, max_messages: int) -> List[QueueMessage]:
+        now = time.time()
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so two consumers on the
+            # same file cannot lease the same rows
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A message whose last lease expired without an ack or nack
+                # (the worker crashed or was OOM-killed on it) is not retried forever
+                self._conn.execute(
+                    "UPDATE messages SET state = 'dead', last_error = 'exceeded max_attempts' "
+                    "WHERE queue = ? AND state IN ('ready', 'inflight') AND visible_at <= ? AND attempts >= ?",
+                    (self.queue, now, self.max_attempts))
+                rows = self._conn.execute(
+                    "SELECT id, body, attempts FROM messages "
+                    "WHERE queue = ? AND state IN ('ready', 'inflight') AND visible_at <= ? "
+                    "ORDER BY priority, id LIMIT ?", (self.queue, now, max_messages)).fetchall()
+                self._conn.executemany(
+                    "UPDATE messages SET state = 'inflight', attempts = attempts + 1, visible_at = ? "
+                    "WHERE id = ?", [(now + self.visibility_timeout, row[0]) for row in rows])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [QueueMessage(id=row[0], body=row[1], attempts=row[2] + 1) for row in rows]
+
+    def ack(self, message_ids: List[int]) -> None:
+        if not message_ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("DELETE FROM messages WHERE id = ?", [(i,) for i in message_ids])
+            self._conn.execute("COMMIT")
+
+    def nack(self, message_id: int, error: str, retry: bool = True) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT attempts FROM messages WHERE id = ?", (message_id,)).fetchone()
+            if row is None:
+                return False
+            dead = not retry or row[0] >= self.max_attempts
+            if dead:
+                self._conn.execute("UPDATE messages SET state = 'dead', last_error = ? WHERE id = ?",
+                                   (error, message_id))
+            else:
+                # Linear backoff so a transient failure is not retried in a hot loop
+                self._conn.execute(
+                    "UPDATE messages SET state = 'ready', last_error = ?, visible_at = ? WHERE id = ?",
+                    (error, time.time() + self.retry_delay * row[0], message_id))
+        return dead
+
+    def release(self, message_ids: List[int]) -> None:
+        if not message_ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE messages SET state = 'ready', attempts = attempts - 1, visible_at = ? "
+                "WHERE id = ? AND state = 'inflight'", [(time.time(), i) for i in message_ids])
+            self._conn.execute("COMMIT")
+
+    def depth(self, state: Optional[str] = None) -> int:
+        """Messages in the queue, optionally only those in `state` (ready/inflight/dead)."""
+        query = "SELECT COUNT(*) FROM messages WHERE queue = ?"
+        params = [self.queue]
+        if state is not None:
+            query += " AND state = ?"
+            params.append(state)
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def dead_letters(self, limit: int = 100) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, body, attempts, last_error FROM messages WHERE queue = ? AND state = 'dead' "
+                "ORDER BY id LIMIT ?", (self.queue, limit)).fetchall()
+        return [{"id": r[0], "body": r[1], "attempts": r[2], "error": r[3]} for r in rows]
+
+    def requeue_dead(self) -> int:
+        """Moves every dead letter back to ready with a fresh attempt count."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE messages SET state = 'ready', attempts = 0, visible_at = ? "
+                "WHERE queue = ? AND state = 'dead'", (time.time(), self.queue))
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,115 @@
+"""
+Shared fixtures.
+The fake models stand in for MiniLM / DeBERTa so pipeline plumbing can be
+tested without downloading weights; scoring quality is covered by test_metrics.
+"""
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.sinks import ReportSink
+
+
+class FakeEncoder:
+    """Bag-of-words hashing encoder with the SentenceTransformer.encode signature."""
+
+    dim = 64
+
+    def __init__(self):
+        self.calls = 0
+        self.texts_encoded = 0
+
+    def _embed(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            digest = hashlib.md5(word.strip(".,?!").encode()).digest()
+            vec[digest[0] % self.dim] += 1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        self.calls += 1
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        self.texts_encoded += len(batch)
+        out = np.stack([self._embed(t) for t in batch]) if batch else np.zeros((0, self.dim), dtype=np.float32)
+        return out[0] if single else out
+
+
+class FakeCrossEncoder:
+    """Word-overlap NLI stand-in returning [contradiction, entailment, neutral] rows."""
+
+    def __init__(self):
+        self.calls = 0
+        self.pairs_scored = 0
+
+    def predict(self, pairs, apply_softmax=True, **kwargs):
+        self.calls += 1
+        self.pairs_scored += len(pairs)
+        rows = []
+        for premise, hypothesis in pairs:
+            p = set(premise.lower().split())
+            h = set(hypothesis.lower().split())
+            overlap = len(p & h) / max(len(h), 1)
+            rows.append([(1 - overlap) / 2, overlap, (1 - overlap) / 2])
+        return np.array(rows, dtype=np.float32)
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Installs fake encoder / cross-encoder in place of the real models."""
+    from eval_pipeline.metrics import relevance, groundedness
+
+    encoder = FakeEncoder()
+    cross_encoder = FakeCrossEncoder()
+    monkeypatch.setattr(relevance, "_model", encoder)
+    monkeypatch.setattr(groundedness, "_model", cross_encoder)
+    relevance.clear_cache()
+    groundedness._nli_cache.clear()
+    yield encoder, cross_encoder
+    relevance.clear_cache()
+    groundedness._nli_cache.clear()
+
+
+class ListSink(ReportSink):
+    """Keeps reports in memory; checkpoint() records how many were made "durable"."""
+
+    def __init__(self):
+        self.reports = []
+        self.checkpointed = 0
+
+    def write(self, report):
+        self.reports.append(report)
+
+    def checkpoint(self):
+        self.checkpointed = len(self.reports)
+        return {"reports": self.checkpointed}
+
+
+def _queue_record(chat_id, query="Where is the clinic?"):
+    return json.dumps({
+        "conversation": {"id": chat_id, "messages": [
+            {"role": "user", "content": query, "id": "u1"},
+            {"role": "assistant", "content": "The clinic is in Mumbai.", "id": "a1"},
+        ]},
+        "context": {"u1": [{"text": "The clinic is in Mumbai."}]},
+    })
+
+
+@pytest.fixture
+def list_sink():
+    """An in-memory report sink for queue consumer tests."""
+    return ListSink()
+
+
+@pytest.fixture
+def queue_record():
+    """Builds a queue message body: a one-turn corpus record with one context chunk."""
+    return _queue_record
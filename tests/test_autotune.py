@@ -0,0 +1,98 @@
+"""
+Tests for the runtime engine configuration and the auto-tuner.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import autotune, config, engine
+from eval_pipeline.batching import get_scheduler
+from eval_pipeline.metrics import groundedness, relevance
+from eval_pipeline.metrics.relevance import encode_batch
+
+
+@pytest.fixture
+def default_engine():
+    """Restores the config.py engine after each test."""
+    yield
+    engine.apply_engine_config(engine.EngineConfig.from_config())
+
+
+def _m(model, threads, batch_size, length, latency_ms):
+    return autotune.Measurement(model=model, threads=threads, batch_size=batch_size, length=length,
+                                latency_ms=latency_ms, items_per_s=batch_size / latency_ms * 1000)
+
+
+def test_disabling_caching_reaches_the_metrics(fake_models, monkeypatch, default_engine):
+    """ENABLE_CACHING = False turns the embedding cache off at runtime."""
+    encoder, _ = fake_models
+    monkeypatch.setattr(config, "ENABLE_CACHING", False)
+    engine.apply_engine_config(engine.EngineConfig.from_config())
+    encode_batch(["same text"])
+    encode_batch(["same text"])
+    assert encoder.texts_encoded == 2
+    assert len(relevance._embedding_cache) == 0 and groundedness._nli_cache.maxsize == 0
+
+
+def test_engine_updates_schedulers(default_engine):
+    """Batch limits of an applied engine reach the shared schedulers."""
+    tuned = engine.EngineConfig.from_config()
+    tuned.batching["groundedness"] = engine.BatchSettings(token_budget=1024, max_batch_size=8)
+    engine.apply_engine_config(tuned)
+    scheduler = get_scheduler("groundedness")
+    assert (scheduler.token_budget, scheduler.max_batch_size) == (1024, 8)
+
+
+def test_choose_engine_respects_latency_target():
+    """The fastest batch size within the target wins, and so do the better threads."""
+    measurements = []
+    for threads, speed in ((1, 1.0), (4, 3.0)):
+        for length in (16, 128):
+            for batch_size in (1, 8, 32):
+                # Per-item cost falls with batch size; latency grows with length
+                latency = (2 + batch_size * length / 16 * (0.5 if batch_size > 1 else 1)) / speed
+                measurements.append(_m("relevance", threads, batch_size, length, latency))
+    chosen = autotune.choose_engine(measurements, latency_target_ms=50)
+
+    assert chosen.torch_threads == 4
+    # At 128 tokens with 4 threads: batch 8 takes 11.3 ms, batch 32 takes 43.3 ms; both fit
+    assert chosen.batching["relevance"].token_budget == 32 * 128
+    slow = autotune.choose_engine(measurements, latency_target_ms=20)
+    assert slow.batching["relevance"].token_budget == 8 * 128
+
+
+def test_calibrate_persists_profile_per_host(fake_models, tmp_path, monkeypatch, default_engine):
+    """A saved profile is reused on the same host and ignored after a hardware change."""
+    monkeypatch.setattr(config, "ENGINE_PROFILE_DIR", str(tmp_path))
+    profile = autotune.ensure_profile(batch_sizes=(1, 4), repeats=1)
+    assert autotune.profile_path().exists()
+    assert {m.model for m in profile.measurements} == {"relevance", "groundedness"}
+
+    calls = []
+    monkeypatch.setattr(autotune, "calibrate", lambda **kw: calls.append(kw) or profile)
+    autotune.ensure_profile()
+    assert calls == []
+
+    monkeypatch.setattr(autotune, "host_fingerprint", lambda: {"cpus": "other"})
+    assert autotune.load_profile() is None
+    autotune.ensure_profile()
+    assert len(calls) == 1
+
+
+def test_tuned_engine_keeps_current_cache_settings(monkeypatch):
+    """Only batch limits and threads come from the profile."""
+    profile = autotune.TuningProfile(
+        host="h", fingerprint={}, created_at=0.0, latency_target_ms=100,
+        engine=engine.EngineConfig(enable_caching=True, torch_threads=2,
+                                   batching={"relevance": engine.BatchSettings(token_budget=512)}))
+    monkeypatch.setattr(config, "ENABLE_CACHING", False)
+    tuned = autotune.tuned_engine(profile)
+    assert tuned.enable_caching is False
+    assert tuned.torch_threads == 2 and tuned.batching["relevance"].token_budget == 512
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
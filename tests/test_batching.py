@@ -0,0 +1,111 @@
+"""
+Tests for length-bucketed batch scheduling.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.batching import LengthBucketScheduler, tokenizer_length_fn
+from eval_pipeline.metrics.relevance import encode_batch, score_relevance
+from eval_pipeline.metrics.groundedness import score_groundedness
+from eval_pipeline.schemas import ContextChunk
+
+
+def test_plan_groups_similar_lengths():
+    """Short and long inputs should not share a batch."""
+    scheduler = LengthBucketScheduler("test", token_budget=1024, max_batch_size=8)
+    lengths = [10, 500, 12, 480, 8, 11]
+
+    batches = scheduler.plan(lengths)
+
+    for batch in batches:
+        batch_lengths = [lengths[i] for i in batch]
+        assert len(batch) * max(batch_lengths) <= 1024
+    short_batch = next(b for b in batches if 0 in b)
+    assert 1 not in short_batch and 3 not in short_batch
+    assert sorted(i for b in batches for i in b) == list(range(len(lengths)))
+
+
+def test_plan_respects_max_batch_size():
+    """No batch exceeds max_batch_size even when the token budget allows it."""
+    scheduler = LengthBucketScheduler("test", token_budget=100000, max_batch_size=3)
+    batches = scheduler.plan([5] * 10)
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+
+
+def test_plan_oversized_input_gets_own_batch():
+    """An input longer than the budget is still scheduled."""
+    scheduler = LengthBucketScheduler("test", token_budget=100, max_batch_size=8)
+    batches = scheduler.plan([10, 400])
+    assert [1] in batches
+
+
+def test_run_restores_original_order():
+    """Results come back in input order regardless of batching."""
+    scheduler = LengthBucketScheduler("test", token_budget=64, max_batch_size=4)
+    items = ["x" * n for n in [30, 2, 17, 5, 30, 1]]
+
+    results = scheduler.run(items, lambda batch: [len(s) for s in batch], length_fn=len)
+
+    assert results == [30, 2, 17, 5, 30, 1]
+
+
+def test_padding_stats_show_gain_over_arrival_order():
+    """Sorted batching pads less than fixed-size batches in arrival order."""
+    scheduler = LengthBucketScheduler("test", token_budget=10000, max_batch_size=2)
+    items = ["a" * n for n in [10, 500, 12, 480]]
+
+    scheduler.run(items, lambda batch: batch, length_fn=len)
+    stats = scheduler.stats.to_dict()
+
+    assert stats["sequences"] == 4
+    assert stats["padding_efficiency"] > stats["baseline_padding_efficiency"]
+    assert 0.0 < stats["padding_efficiency"] <= 1.0
+
+
+def test_tokenizer_length_fn_fallback():
+    """Without a tokenizer, lengths are estimated from characters."""
+    length = tokenizer_length_fn(object(), max_length=16)
+    assert length("a" * 8) < length("a" * 40)
+    assert length("a" * 1000) == 16
+    assert length(("premise text", "hypothesis")) > length("premise text")
+
+
+def test_encode_batch_encodes_misses_once(fake_models):
+    """Repeated texts are encoded once and served from cache afterwards."""
+    encoder, _ = fake_models
+
+    first = encode_batch(["hello there", "a much longer sentence about hotels", "hello there"])
+    texts_after_first = encoder.texts_encoded
+    second = encode_batch(["hello there"])
+
+    assert first.shape[0] == 3
+    assert texts_after_first == 2
+    assert encoder.texts_encoded == texts_after_first
+    assert (second[0] == first[0]).all()
+
+
+def test_groundedness_batches_uncached_pairs(fake_models):
+    """All uncached chunk pairs go through the cross-encoder in batched calls."""
+    _, cross_encoder = fake_models
+    chunks = [ContextChunk(text=f"Chunk number {i} about the clinic in Mumbai.") for i in range(5)]
+
+    score = score_groundedness("The clinic is in Mumbai.", chunks)
+
+    assert 0.0 <= score <= 1.0
+    assert cross_encoder.pairs_scored == 5
+    assert cross_encoder.calls == 1
+
+
+def test_relevance_single_encode_call(fake_models):
+    """Query and response are encoded together."""
+    encoder, _ = fake_models
+    score_relevance("What does IVF cost?", "IVF costs vary by clinic.")
+    assert encoder.calls == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,102 @@
+"""
+Tests for deadline-aware evaluation.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import budget, config
+from eval_pipeline.aggregate import run_evaluation
+from eval_pipeline.budget import StageCostEstimator, select_top_chunks
+from eval_pipeline.schemas import Message, Conversation, ContextChunk, ContextData, EvalInput
+
+
+def _make_input(n_chunks=4):
+    conv = Conversation(id="conv_1", messages=[
+        Message(role="user", content="Where is the clinic located?", id="msg_u1"),
+        Message(role="assistant", content="The clinic is located in Mumbai.", id="msg_a1"),
+    ])
+    chunks = [ContextChunk(text=f"The clinic {i} is in Mumbai.", score=i / 10) for i in range(n_chunks)]
+    context = ContextData(entries={"msg_u1": chunks})
+    return EvalInput(conversation=conv, context=context)
+
+
+@pytest.fixture
+def estimator(monkeypatch):
+    """A fresh estimator with fixed stage costs, installed process-wide."""
+    est = StageCostEstimator(defaults={"toxicity": 0.0, "cost": 0.0, "relevance": 10.0,
+                                       "completeness": 10.0, "retrieval": 10.0, "groundedness": 10.0})
+    # Keep estimates fixed: the fake models are far faster than the defaults
+    monkeypatch.setattr(est, "record", lambda *args, **kwargs: None)
+    monkeypatch.setattr(budget, "_estimator", est)
+    return est
+
+
+def test_estimator_tracks_recent_timings():
+    """The first sample replaces the default, later ones are averaged in."""
+    est = StageCostEstimator(alpha=0.5, defaults={"relevance": 100.0})
+    est.record("relevance", 10.0)
+    assert est.estimate("relevance") == pytest.approx(10.0)
+    est.record("relevance", 20.0)
+    assert est.estimate("relevance") == pytest.approx(15.0)
+
+    est.record("groundedness", 60.0, units=3)
+    assert est.estimate("groundedness", chunks=4) == pytest.approx(80.0)
+    assert est.affordable_units("groundedness", 45.0) == 2
+    assert est.affordable_units("groundedness", -1.0) == 0
+
+
+def test_select_top_chunks_prefers_retriever_score():
+    """Highest-scored chunks come first; unscored chunks keep retrieval order."""
+    chunks = [ContextChunk(text="a"), ContextChunk(text="b", score=0.2),
+              ContextChunk(text="c", score=0.9), ContextChunk(text="d")]
+    assert [c.text for c in select_top_chunks(chunks, 3)] == ["c", "b", "a"]
+
+
+def test_no_deadline_runs_everything(fake_models, estimator):
+    """Without a deadline every stage runs and the report is a success."""
+    report = run_evaluation(_make_input())
+    assert report.status == "success"
+    assert report.skipped_metrics == [] and report.truncated_metrics == []
+    assert report.scores.groundedness is not None
+    assert report.scores.groundedness_chunks == 4
+
+
+def test_tight_deadline_truncates_groundedness(fake_models, estimator, monkeypatch):
+    """NLI runs on only the top-scoring chunks that fit in the budget."""
+    _, cross_encoder = fake_models
+    premises = []
+    predict = cross_encoder.predict
+
+    def recording_predict(pairs, **kwargs):
+        premises.extend(p for p, _ in pairs)
+        return predict(pairs, **kwargs)
+
+    monkeypatch.setattr(cross_encoder, "predict", recording_predict)
+    report = run_evaluation(_make_input(), deadline_ms=25.0)
+
+    assert report.status == "partial"
+    assert report.skipped_metrics == []
+    assert report.truncated_metrics == ["groundedness"]
+    assert report.scores.groundedness_chunks == 2
+    assert set(premises) == {"The clinic 3 is in Mumbai.", "The clinic 2 is in Mumbai."}
+
+
+def test_exhausted_deadline_skips_expensive_stages(fake_models, estimator, monkeypatch):
+    """Stages that cannot fit are skipped and reported, cheap ones still run."""
+    monkeypatch.setattr(config, "RETRIEVAL_METRICS", True)
+    report = run_evaluation(_make_input(), deadline_ms=5.0)
+
+    assert report.status == "partial"
+    assert set(report.skipped_metrics) == {"relevance", "completeness", "retrieval", "groundedness"}
+    assert report.scores.relevance is None
+    assert report.scores.groundedness is None
+    assert report.scores.toxicity is not None
+    assert report.scores.estimated_cost is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,72 @@
+"""
+Tests for the offline cache-sizing simulator.
+"""
+import random
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.aggregate import run_evaluation
+from eval_pipeline.cache_sim import KeyTrace, POLICIES, default_sizes, simulate, simulate_cache
+from eval_pipeline.metrics import groundedness, relevance
+from eval_pipeline.schemas import Message, Conversation, ContextChunk, ContextData, EvalInput
+
+
+def _make_input(question, chunk_texts):
+    conv = Conversation(id="conv_1", messages=[
+        Message(role="user", content=question, id="msg_u1"),
+        Message(role="assistant", content="The clinic is located in Mumbai.", id="msg_a1"),
+    ])
+    chunks = [ContextChunk(text=t) for t in chunk_texts]
+    return EvalInput(conversation=conv, context=ContextData(entries={"msg_u1": chunks}))
+
+
+def test_policies_on_a_known_sequence():
+    """LRU keeps a re-used key that FIFO evicts; OPT is never beaten."""
+    keys = ["a", "b", "a", "c", "a", "b"]
+    assert simulate(keys, "lru", 2) == 2  # a, a
+    assert simulate(keys, "fifo", 2) == 1  # c pushes a out
+    assert simulate(keys, "opt", 2) == 2
+
+    rng = random.Random(0)
+    keys = [int(rng.paretovariate(1.2)) for _ in range(2000)]  # Skewed reuse
+    for size in (2, 8, 32):
+        best = simulate(keys, "opt", size)
+        assert all(simulate(keys, policy, size) <= best for policy in POLICIES)
+    assert simulate(keys, "lru", len(set(keys))) == len(keys) - len(set(keys))
+    with pytest.raises(ValueError):
+        simulate(keys, "random", 2)
+
+
+def test_trace_matches_real_caches(fake_models):
+    """Replayed keys give the hits the metric caches actually see."""
+    inputs = [
+        _make_input("Where is the clinic?", ["The clinic is in Mumbai.", "Parking is free."]),
+        _make_input("Is parking free?", ["Parking is free.", "Open on Sundays."]),
+        _make_input("Where is the clinic?", ["The clinic is in Mumbai.", "Parking is free."]),
+    ]
+    trace = KeyTrace()
+    for data in inputs:
+        trace.add(data)
+        run_evaluation(data)
+
+    embeddings = simulate_cache("embeddings", trace.keys["embeddings"], sizes=[1000], cost_ms=1.0)
+    nli = simulate_cache("nli", trace.keys["nli"], sizes=[1000], cost_ms=1.0)
+    assert embeddings.hit_rate("lru", 1000) == relevance._embedding_cache.hits / embeddings.lookups
+    assert embeddings.lookups == relevance._embedding_cache.hits + relevance._embedding_cache.misses
+    assert nli.hit_rate("lru", 1000) == groundedness._nli_cache.hits / nli.lookups
+    assert nli.points[0].saved_ms == groundedness._nli_cache.hits * 1.0
+
+
+def test_default_sizes_reach_all_keys():
+    """The size ladder steps 1-3-10 and ends where every key fits."""
+    assert default_sizes(5000) == [100, 300, 1000, 3000, 5000]
+    sim = simulate_cache("nli", list("abcabc"), cost_ms=2.0)
+    assert sim.max_hit_rate == 0.5 and sim.smallest_size("lru") == 3  # Below 100 keys: one size, all keys
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
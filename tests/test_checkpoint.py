@@ -0,0 +1,125 @@
+"""
+Tests for checkpointed, resumable corpus runs.
+"""
+import json
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import sinks
+from eval_pipeline.aggregate import EvalReport
+from eval_pipeline.checkpoint import RunCheckpoint, CompletedIds, CheckpointPolicy
+from eval_pipeline.loader import iter_corpus_offsets
+from eval_pipeline.sinks import JsonlReportSink, ColumnarReportSink, JsonReportSink, load_npz_part
+
+
+def _report(chat_id):
+    return EvalReport(status="skipped", chat_id=chat_id, target_user_message="", target_ai_response="")
+
+
+def test_jsonl_sink_resume_drops_reports_after_checkpoint(tmp_path):
+    """Reports written after the checkpoint are rolled back on resume."""
+    path = tmp_path / "reports.jsonl"
+    sink = JsonlReportSink(str(path))
+    sink.write(_report("a"))
+    sink.write(_report("b"))
+    state = sink.checkpoint()
+    sink.write(_report("lost"))
+    sink.close()
+
+    with JsonlReportSink(str(path), resume=state) as resumed:
+        resumed.write(_report("c"))
+    chat_ids = [json.loads(line)["chat_id"] for line in path.read_text().splitlines()]
+    assert chat_ids == ["a", "b", "c"]
+
+
+def test_npz_sink_resume_discards_later_parts(tmp_path, monkeypatch):
+    """Row-group parts written after the checkpoint are deleted and renumbered."""
+    synced = []
+    monkeypatch.setattr(sinks.os, "fsync", synced.append)
+    path = tmp_path / "reports.npz"
+    sink = ColumnarReportSink(str(path), format="npz", row_group_size=2)
+    for chat_id in "abc":
+        sink.write(_report(chat_id))
+    state = sink.checkpoint()  # Flushes the short third row as its own part
+    assert state == {"row_groups_written": 2, "rows_written": 3}
+    assert len(synced) == 2  # The full part flushed by write() is synced too
+    sink.write(_report("x"))
+    sink.write(_report("y"))
+    sink.close()
+    assert len(list(tmp_path.glob("reports.*.npz"))) == 3
+
+    with ColumnarReportSink(str(path), format="npz", resume=state) as resumed:
+        resumed.write(_report("d"))
+    parts = sorted(tmp_path.glob("reports.*.npz"))
+    chat_ids = [c for part in parts for c in load_npz_part(str(part))["chat_id"]]
+    assert chat_ids == ["a", "b", "c", "d"]
+
+
+def test_unsupported_sinks_refuse_to_checkpoint(tmp_path):
+    """Sinks that cannot be rolled back say so instead of checkpointing silently."""
+    with pytest.raises(NotImplementedError):
+        JsonReportSink(str(tmp_path / "r.json")).checkpoint()
+
+
+def test_checkpoint_round_trip_and_matching(tmp_path):
+    """Checkpoints are saved atomically and only match their own run."""
+    path = tmp_path / "run.ckpt.json"
+    RunCheckpoint("corpus.jsonl", "out.jsonl", "jsonl", offset=120, line_no=3,
+                  sink_state={"bytes": 42}, counts={"success": 3}).save(str(path))
+    assert not (tmp_path / "run.ckpt.json.tmp").exists()
+
+    loaded = RunCheckpoint.load(str(path))
+    assert loaded.offset == 120 and loaded.sink_state == {"bytes": 42}
+    assert loaded.saved_at is not None
+    assert loaded.matches("corpus.jsonl", "out.jsonl", "jsonl")
+    assert not loaded.matches("other.jsonl", "out.jsonl", "jsonl")
+
+
+def test_completed_ids_resume_at_synced_length(tmp_path):
+    """Only ids synced before the checkpoint count as completed."""
+    path = tmp_path / "ids"
+    ids = CompletedIds(str(path))
+    ids.add("r1")
+    ids.add("r2")
+    synced = ids.sync()
+    ids.add("r3")
+    ids.close()
+
+    resumed = CompletedIds(str(path), resume_bytes=synced)
+    assert "r1" in resumed and "r2" in resumed
+    assert "r3" not in resumed
+    resumed.close()
+
+    fresh = CompletedIds(str(path))
+    assert "r1" not in fresh
+    fresh.close()
+
+
+def test_iter_corpus_offsets_resumes_mid_file(tmp_path):
+    """Reading from a yielded offset continues with the next record."""
+    corpus = tmp_path / "corpus.jsonl"
+    corpus.write_text('{"id": 1}\n\n{"id": "é"}\n{"id": 3}\n', encoding="utf-8")
+
+    records = list(iter_corpus_offsets(str(corpus)))
+    assert [line_no for line_no, _, _ in records] == [0, 2, 3]
+
+    line_no, _, offset = records[1]
+    rest = list(iter_corpus_offsets(str(corpus), offset, line_no + 1))
+    assert [(n, json.loads(line)["id"]) for n, line, _ in rest] == [(3, 3)]
+
+
+def test_checkpoint_policy_counts_records():
+    """A checkpoint is due after every_records reports."""
+    policy = CheckpointPolicy(every_records=2, every_seconds=0)
+    assert policy.record_done() is False
+    assert policy.record_done() is True
+    policy.reset()
+    assert policy.record_done() is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
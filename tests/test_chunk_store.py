@@ -0,0 +1,102 @@
+"""
+Tests for the knowledge-base chunk artifact store.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import chunk_store
+from eval_pipeline.chunk_store import ChunkArtifactStore, chunk_fingerprint, fast_hash
+from eval_pipeline.metrics import groundedness, relevance
+from eval_pipeline.schemas import ContextChunk
+
+from tests.conftest import FakeEncoder
+
+CHUNKS = [
+    ContextChunk(id="28960", text="Happy Home Hotel is a 5 min walk away from the clinic."),
+    ContextChunk(id="27025", text="Subsidized air-conditioned rooms at the clinic cost Rs 2000 per night."),
+    ContextChunk(id="28960", text="Duplicate id, ignored."),
+]
+
+
+def _build(tmp_path):
+    encoder = FakeEncoder()
+    return ChunkArtifactStore.build(
+        str(tmp_path / "store"), CHUNKS,
+        encode_fn=lambda texts: encoder.encode(texts, normalize_embeddings=True),
+        tokenize_fn=lambda text: list(range(len(text.split()))),
+        encoder_name=relevance.MODEL_NAME,
+    )
+
+
+def test_build_and_lookup(tmp_path):
+    """Artifacts are stored once per id and found by id + content."""
+    store = _build(tmp_path)
+    assert len(store) == 2
+
+    artifact = store.get(CHUNKS[0])
+    assert artifact.fingerprint == fast_hash(CHUNKS[0].text)
+    assert len(artifact.token_ids) == len(CHUNKS[0].text.split())
+    assert artifact.embedding.shape == (FakeEncoder.dim,)
+
+
+def test_open_is_memory_mapped(tmp_path):
+    """Reopened stores memory-map their arrays."""
+    _build(tmp_path)
+    store = ChunkArtifactStore.open(str(tmp_path / "store"))
+    assert isinstance(store._embeddings, np.memmap)
+    assert store.token_length(CHUNKS[1]) == len(CHUNKS[1].text.split())
+
+
+def test_changed_content_is_a_miss(tmp_path):
+    """A chunk whose text changed under the same id is not served stale artifacts."""
+    store = _build(tmp_path)
+    edited = ContextChunk(id="28960", text="Happy Home Hotel closed down last year.")
+    assert store.get(edited) is None
+    assert store.get(ContextChunk(text=CHUNKS[0].text)) is None
+
+
+def test_edit_in_the_middle_is_a_miss(tmp_path):
+    """A same-length edit far from both ends (a price) still invalidates the stored row."""
+    page = ContextChunk(id="1", text="Rooms near the clinic. " * 5 + "A night costs Rs 2000. " + "Book early. " * 10)
+    store = ChunkArtifactStore.build(str(tmp_path / "store"), [page], encode_fn=FakeEncoder().encode,
+                                     tokenize_fn=lambda text: [0])
+    repriced = ContextChunk(id="1", text=page.text.replace("2000", "3000"))
+    assert store.get(page) is not None
+    assert store.get(repriced) is None
+
+
+def test_chunk_fingerprint_uses_store(tmp_path):
+    """chunk_fingerprint matches whether or not a store is active."""
+    store = _build(tmp_path)
+    chunk_store.set_store(store)
+    try:
+        assert chunk_fingerprint(CHUNKS[0]) == fast_hash(CHUNKS[0].text)
+        assert store.hits == 1
+    finally:
+        chunk_store.set_store(None)
+
+
+def test_metrics_read_from_store(tmp_path, fake_models):
+    """Chunk embeddings come from the store and NLI lengths from stored tokens."""
+    encoder, cross_encoder = fake_models
+    chunk_store.set_store(_build(tmp_path))
+    try:
+        embeddings = relevance.encode_chunks(CHUNKS[:2])
+        assert embeddings.shape == (2, FakeEncoder.dim)
+        assert encoder.texts_encoded == 0
+
+        score = groundedness.score_groundedness("The hotel is near the clinic.", CHUNKS[:2])
+        assert 0.0 <= score <= 1.0
+        assert cross_encoder.pairs_scored == 2
+    finally:
+        chunk_store.set_store(None)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
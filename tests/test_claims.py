@@ -0,0 +1,76 @@
+"""
+Tests for claim-level groundedness.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import config
+from eval_pipeline.aggregate import run_evaluation
+from eval_pipeline.metrics.claims import evaluate_claims, split_claims
+from eval_pipeline.schemas import ContextChunk, ContextData, Conversation, EvalInput, Message
+
+
+def test_split_claims_handles_lists_and_abbreviations():
+    """Sentences and list items become claims; fillers and abbreviations do not split."""
+    text = "Sure! Dr. Rao sees patients on Monday. Our clinic offers:\n- free parking on site\n- IVF packages from Rs 1 lakh"
+    assert split_claims(text) == [
+        "Dr. Rao sees patients on Monday.",
+        "Our clinic offers:",
+        "free parking on site",
+        "IVF packages from Rs 1 lakh",
+    ]
+    assert split_claims("Hi!") == ["Hi!"]
+
+
+def test_claims_expose_a_single_hallucination(fake_models):
+    """One unsupported sentence lowers the claim-level score and is reported."""
+    chunks = [ContextChunk(text="the clinic is open monday to saturday"),
+              ContextChunk(text="parking is free for all patients"),
+              ContextChunk(text="ivf consultation costs rs 5000")]
+    response = ("The clinic is open monday to saturday. Parking is free for all patients. "
+                "Robots perform every surgery remotely.")
+    result = evaluate_claims(response, chunks, top_k=2)
+
+    assert [c.chunk_index for c in result.claims[:2]] == [0, 1]
+    assert result.claims[0].support > 0.8 and result.claims[2].support < 0.5
+    assert result.unsupported == 1
+    assert result.score == min(c.support for c in result.claims)
+    assert evaluate_claims(response, chunks, top_k=2, aggregate="mean").score > result.score
+
+
+def test_claims_prune_pairs_and_batch_nli(fake_models):
+    """Only top-k chunks per claim reach NLI, in a single model call."""
+    _, cross_encoder = fake_models
+    chunks = [ContextChunk(text=f"fact number {i} about topic {i}") for i in range(10)]
+    response = "Fact number 1 about topic 1. Fact number 7 about topic 7."
+    result = evaluate_claims(response, chunks, top_k=2)
+
+    assert result.pairs_scored == 4 and result.pairs_pruned == 16
+    assert cross_encoder.calls == 1 and cross_encoder.pairs_scored == 4
+    evaluate_claims(response, chunks, top_k=2)
+    assert cross_encoder.calls == 1  # Served from the NLI cache
+
+
+def test_run_evaluation_claim_mode(fake_models, monkeypatch):
+    """The claim-level mode fills per-claim support into the report."""
+    monkeypatch.setattr(config, "GROUNDEDNESS_MODE", "claims")
+    data = EvalInput(
+        conversation=Conversation(id="c1", messages=[
+            Message(role="user", content="When is the clinic open?", id="u1"),
+            Message(role="assistant", content="The clinic is open monday to saturday.", id="a1"),
+        ]),
+        context=ContextData(entries={"u1": [ContextChunk(text="the clinic is open monday to saturday")]}),
+    )
+    report = run_evaluation(data)
+    assert report.status == "success"
+    assert report.scores.groundedness_claims == 1
+    assert report.scores.unsupported_claims == 0
+    assert report.claims[0].support == report.scores.groundedness
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,65 @@
+"""
+Tests for aspect-level completeness.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import config
+from eval_pipeline.aggregate import run_evaluation
+from eval_pipeline.metrics.completeness import evaluate_completeness, split_aspects
+from eval_pipeline.schemas import Message, Conversation, ContextChunk, ContextData, EvalInput
+
+
+def test_split_aspects():
+    """Questions are aspects; lists split into items; statements only count without questions."""
+    query = "We land on Friday. Can you help with travel, hotels and costs? Is parking free?"
+    assert split_aspects(query) == ["Can you help with travel", "hotels", "costs", "Is parking free?"]
+    # Clauses joined by "and", and alternatives joined by "or", stay whole
+    assert split_aspects("I tried 5 cycles and this is my first ivf cycle") == \
+        ["I tried 5 cycles and this is my first ivf cycle"]
+    assert split_aspects("Should I go with donor egg or self egg?") == ["Should I go with donor egg or self egg?"]
+    assert len(split_aspects(", ".join(f"item{i}" for i in range(19)) + " and item19?")) == config.MAX_ASPECTS
+
+
+def test_only_real_lists_are_split():
+    """Commas without a closing "and" are clauses; bulleted and numbered lines are items."""
+    assert split_aspects("Hello, how are you?") == ["Hello, how are you?"]
+    assert split_aspects("Is it open on Sunday, or Monday?") == ["Is it open on Sunday, or Monday?"]
+    assert split_aspects("I need help with:\n- travel\n- hotels\n1. costs") == ["travel", "hotels", "costs"]
+
+
+def test_partial_answer_covers_some_aspects(fake_models):
+    """Each aspect is matched to its best sentence; unaddressed parts lower the score."""
+    encoder, _ = fake_models
+    query = "What about hotels, costs and parking?"
+    response = "Our partner hotels are near the clinic. Parking is free for patients."
+    result = evaluate_completeness(query, response, threshold=0.2)
+
+    assert [a.text for a in result.aspects] == ["What about hotels", "costs", "parking"]
+    assert [a.sentence_index for a in result.aspects if a.coverage >= 0.2] == [0, 1]
+    assert result.covered == 2 and result.score == pytest.approx(2 / 3)
+    assert encoder.calls == 1  # Aspects and sentences in one batched encode
+
+
+def test_report_lists_aspects(fake_models, monkeypatch):
+    """In aspect mode the pipeline reports aspect counts next to the completeness score."""
+    monkeypatch.setattr(config, "COMPLETENESS_MODE", "aspects")
+    conv = Conversation(id="conv_1", messages=[
+        Message(role="user", content="Where is the clinic and what are the timings?", id="msg_u1"),
+        Message(role="assistant", content="The clinic is in Mumbai.", id="msg_a1"),
+    ])
+    data = EvalInput(conversation=conv, context=ContextData(entries={"msg_u1": [
+        ContextChunk(text="The clinic is in Mumbai.")]}))
+    report = run_evaluation(data)
+
+    assert report.scores.completeness_aspects == len(report.aspects) == 1
+    assert report.scores.completeness == (1.0 if report.aspects[0].coverage >= config.ASPECT_COVERAGE_THRESHOLD
+                                          else 0.0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
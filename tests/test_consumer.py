@@ -0,0 +1,169 @@
+"""
+Tests for the durable queue transport and the queue consumer.
+"""
+import json
+import pytest
+import sys
+import time
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.aggregate import EvalReport
+from eval_pipeline.consumer import QueueConsumer
+from eval_pipeline.sinks import JsonlReportSink
+from eval_pipeline.transport import SqliteTransport
+
+
+def _ok(data):
+    return EvalReport(status="success", chat_id=data.conversation.id,
+                      target_user_message="q", target_ai_response="r")
+
+
+def test_transport_leases_acks_and_redelivers(tmp_path):
+    """Received messages are hidden until acked, and come back after the lease expires."""
+    with SqliteTransport(str(tmp_path / "q.db"), visibility_timeout=0.05) as transport:
+        transport.publish(["a", "b", "c"])
+        first = transport.receive(2)
+        assert [m.body for m in first] == ["a", "b"]
+        assert [m.body for m in transport.receive(10)] == ["c"]
+        assert transport.receive(10) == []
+
+        transport.ack([first[0].id])
+        time.sleep(0.06)
+        redelivered = transport.receive(10)
+        assert sorted(m.body for m in redelivered) == ["b", "c"]
+        assert all(m.attempts == 2 for m in redelivered)
+
+
+def test_transport_dead_letters_after_max_attempts(tmp_path):
+    """nack() retries until max_attempts, then moves the message to the DLQ."""
+    with SqliteTransport(str(tmp_path / "q.db"), max_attempts=2, retry_delay=0.0) as transport:
+        transport.publish(["poison"])
+        message = transport.receive(1)[0]
+        assert transport.nack(message.id, "boom") is False
+        message = transport.receive(1)[0]
+        assert transport.nack(message.id, "boom again") is True
+
+        assert transport.receive(1) == []
+        assert transport.depth("dead") == 1
+        assert transport.dead_letters()[0]["error"] == "boom again"
+        assert transport.requeue_dead() == 1
+        assert transport.receive(1)[0].attempts == 1
+
+
+def test_transport_release_returns_leases_without_an_attempt(tmp_path):
+    """Released messages are visible again at once, with the lease not counted as an attempt."""
+    with SqliteTransport(str(tmp_path / "q.db")) as transport:
+        transport.publish(["a", "b"])
+        leased = transport.receive(2)
+        transport.release([leased[1].id])
+        assert [(m.body, m.attempts) for m in transport.receive(10)] == [("b", 1)]
+
+
+def test_transport_dead_letters_messages_that_crash_the_worker(tmp_path):
+    """A message leased max_attempts times without an ack or nack goes to the DLQ."""
+    with SqliteTransport(str(tmp_path / "q.db"), max_attempts=2, visibility_timeout=0.02) as transport:
+        transport.publish(["kills the worker", "fine"])
+        for attempt in (1, 2):
+            leased = transport.receive(1)
+            assert [(m.body, m.attempts) for m in leased] == [("kills the worker", attempt)]
+            time.sleep(0.03)  # The worker dies: no ack, no nack
+
+        assert [m.body for m in transport.receive(10)] == ["fine"]
+        assert transport.depth("dead") == 1
+        assert transport.dead_letters()[0]["error"] == "exceeded max_attempts"
+
+
+def test_consumer_processes_and_batches_acks(tmp_path, monkeypatch, list_sink, queue_record):
+    """Every message is evaluated once, written, and acked in batches after a checkpoint."""
+    sink = list_sink
+    with SqliteTransport(str(tmp_path / "q.db")) as transport:
+        transport.publish([queue_record(f"chat_{i}") for i in range(25)])
+        acked = []
+
+        def ack(ids):
+            acked.extend(ids)
+            assert sink.checkpointed >= len(acked)  # Never ack a report that is not durable
+            return type(transport).ack(transport, ids)
+
+        monkeypatch.setattr(transport, "ack", ack)
+        consumer = QueueConsumer(transport, sink, prefetch=8, fetch_batch=4, ack_batch=10,
+                                 poll_interval=0.01, evaluate=_ok)
+        stats = consumer.run(idle_timeout=0.05)
+
+        assert stats.processed == 25
+        assert stats.acked == 25
+        assert stats.ack_batches < 25
+        assert sorted(r.chat_id for r in sink.reports) == sorted(f"chat_{i}" for i in range(25))
+        assert stats.max_buffered <= 8
+        assert transport.depth() == 0
+
+
+def test_jsonl_output_resumes_at_last_acked_checkpoint(tmp_path, queue_record):
+    """Saved checkpoint state lets a restarted worker drop a torn tail of unacked reports."""
+    path = tmp_path / "reports.jsonl"
+    states = []
+    with SqliteTransport(str(tmp_path / "q.db")) as transport, JsonlReportSink(str(path)) as sink:
+        transport.publish([queue_record(f"chat_{i}") for i in range(5)])
+        consumer = QueueConsumer(transport, sink, poll_interval=0.01, evaluate=_ok, on_checkpoint=states.append)
+        consumer.run(idle_timeout=0.05)
+        assert states and transport.depth() == 0
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"status": "success", "chat_id": "unacked"')  # Crash mid-write
+
+    with JsonlReportSink(str(path), resume=states[-1]) as sink:
+        sink.write(EvalReport(status="success", chat_id="after_restart",
+                              target_user_message="q", target_ai_response="r"))
+    chat_ids = [json.loads(line)["chat_id"] for line in path.read_text().splitlines()]
+    assert sorted(chat_ids[:5]) == [f"chat_{i}" for i in range(5)] and chat_ids[5:] == ["after_restart"]
+
+
+def test_consumer_dead_letters_bad_and_failing_messages(tmp_path, list_sink, queue_record):
+    """Malformed records go straight to the DLQ; failing ones after their retries."""
+    attempts = []
+
+    def flaky(data):
+        attempts.append(data.conversation.id)
+        if data.conversation.id == "bad":
+            raise RuntimeError("model exploded")
+        return _ok(data)
+
+    sink = list_sink
+    with SqliteTransport(str(tmp_path / "q.db"), max_attempts=3, retry_delay=0.0) as transport:
+        transport.publish([queue_record("good"), "not json", queue_record("bad")])
+        consumer = QueueConsumer(transport, sink, poll_interval=0.01, evaluate=flaky)
+        stats = consumer.run(idle_timeout=0.1)
+
+        assert stats.dead_lettered == 2
+        assert stats.retried == 2
+        assert attempts.count("bad") == 3
+        assert transport.depth("dead") == 2
+        assert [r.status for r in sink.reports].count("failed") == 2
+        assert [r.chat_id for r in sink.reports if r.status == "success"] == ["good"]
+
+
+def test_consumer_applies_backpressure(tmp_path, list_sink, queue_record):
+    """A slow worker stops the fetcher at the prefetch bound instead of buffering everything."""
+    def slow(data):
+        time.sleep(0.01)
+        return _ok(data)
+
+    sink = list_sink
+    with SqliteTransport(str(tmp_path / "q.db")) as transport:
+        transport.publish([queue_record(f"chat_{i}") for i in range(30)])
+        consumer = QueueConsumer(transport, sink, prefetch=4, fetch_batch=4,
+                                 poll_interval=0.02, evaluate=slow)
+        stats = consumer.run(max_messages=10)
+
+        assert stats.processed == 10
+        assert stats.max_buffered <= 4
+        assert stats.backpressure_waits > 0
+        # Nothing past max_messages is leased: the rest stays ready in the durable queue
+        assert stats.received == 10
+        assert transport.depth("ready") == 20 and transport.depth("inflight") == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
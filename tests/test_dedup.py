@@ -0,0 +1,87 @@
+"""
+Tests for near-duplicate chunk collapsing before NLI.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import config
+from eval_pipeline.aggregate import run_evaluation
+from eval_pipeline.dedup import collapse_chunks, minhash
+from eval_pipeline.schemas import Message, Conversation, ContextChunk, ContextData, EvalInput
+
+PAGE = ("Our Mumbai clinic is open from nine to six on weekdays and offers knee replacement "
+        "surgery, physiotherapy and free parking for patients and visitors.")
+
+
+def test_near_duplicates_share_a_representative():
+    """Copies (up to case and spacing) collapse into the best-ranked one; distinct chunks stay."""
+    chunks = [
+        ContextChunk(text=PAGE, score=0.7),
+        ContextChunk(text="Parking is free for visitors.", score=0.6),
+        ContextChunk(text=PAGE.replace("patients", "Patients") + " ", score=0.9),
+        ContextChunk(text=PAGE, score=0.5),
+    ]
+    result = collapse_chunks(chunks, threshold=0.8)
+    assert result.collapsed == 2 and result.method == "minhash"
+    assert [c.score for c in result.chunks] == [0.6, 0.9]  # Retrieval order, top-scored copy kept
+    assert (minhash(PAGE) == minhash(PAGE)).all()
+
+    assert collapse_chunks([ContextChunk(text=PAGE)]).collapsed == 0
+
+
+def test_chunks_stating_different_figures_are_kept(fake_models):
+    """A long copy that differs only in its price keeps its own NLI pass, since the reply cites it."""
+    _, cross_encoder = fake_models
+    filler = " ".join(f"Section {w} covers admission, billing and discharge for all patients." for w in "abcdefghijklmnopqrst")
+    expensive = ContextChunk(text=f"{filler} Knee replacement costs Rs 150000 per knee.", score=0.9)
+    cheap = ContextChunk(text=f"{filler} Knee replacement costs Rs 95000 per knee.", score=0.4)
+    assert collapse_chunks([expensive, cheap]).collapsed == 0
+
+    conv = Conversation(id="conv_1", messages=[
+        Message(role="user", content="How much is knee replacement?", id="msg_u1"),
+        Message(role="assistant", content="Knee replacement costs Rs 95000 per knee.", id="msg_a1"),
+    ])
+    data = EvalInput(conversation=conv, context=ContextData(entries={"msg_u1": [expensive, cheap]}))
+    report = run_evaluation(data)
+    assert report.scores.collapsed_chunks == 0 and cross_encoder.pairs_scored == 2
+    # The supporting premise is the lower-ranked chunk; dropping it would lower the score
+    ground_cheap = run_evaluation(EvalInput(conversation=conv, context=ContextData(entries={"msg_u1": [cheap]})))
+    assert report.scores.groundedness == pytest.approx(ground_cheap.scores.groundedness)
+
+
+def test_vector_method_uses_stored_vectors():
+    """Cosine over stored vectors; chunks without vectors are left alone."""
+    chunks = [ContextChunk(text="a", vector=[1.0, 0.0]), ContextChunk(text="b", vector=[0.99, 0.01]),
+              ContextChunk(text="c", vector=[0.0, 1.0])]
+    assert collapse_chunks(chunks, method="vectors").collapsed == 1
+    assert collapse_chunks([ContextChunk(text="a"), ContextChunk(text="a")], method="vectors").collapsed == 0
+    with pytest.raises(ValueError):
+        collapse_chunks(chunks, method="simhash")
+
+
+def test_nli_skips_collapsed_chunks(fake_models, monkeypatch):
+    """Groundedness scores one pair per cluster and the report counts the rest."""
+    _, cross_encoder = fake_models
+    conv = Conversation(id="conv_1", messages=[
+        Message(role="user", content="When is the clinic open?", id="msg_u1"),
+        Message(role="assistant", content="The Mumbai clinic is open from nine to six on weekdays.", id="msg_a1"),
+    ])
+    chunks = [ContextChunk(text=PAGE, id=f"url_{i}") for i in range(3)] + [ContextChunk(text="Parking is free.")]
+    data = EvalInput(conversation=conv, context=ContextData(entries={"msg_u1": chunks}))
+
+    report = run_evaluation(data)
+    assert report.scores.collapsed_chunks == 2 and report.scores.groundedness_chunks == 2
+    assert cross_encoder.pairs_scored == 2
+
+    monkeypatch.setattr(config, "DEDUP_CHUNKS", False)
+    baseline = run_evaluation(data)
+    assert baseline.scores.groundedness == report.scores.groundedness
+    assert baseline.scores.collapsed_chunks is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,81 @@
+"""
+Tests for history-aware relevance.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import config
+from eval_pipeline.aggregate import run_evaluation
+from eval_pipeline.metrics import history, relevance
+from eval_pipeline.metrics.history import evaluate_history_relevance
+from eval_pipeline.schemas import Message, Conversation, ContextChunk, ContextData, EvalInput
+
+TURNS = [
+    "Do you offer knee replacement surgery?",
+    "Yes, our orthopaedic team performs knee replacement surgery.",
+    "How long is the recovery after knee surgery?",
+    "Most patients walk within days and recover in six weeks.",
+]
+
+
+@pytest.fixture
+def fresh_history():
+    """An empty history cache for the test."""
+    history.clear_cache()
+    yield
+    history.clear_cache()
+
+
+def test_appended_turns_are_encoded_once(fake_models, fresh_history):
+    """A conversation evaluated again after new turns only encodes the new ones."""
+    encoder, _ = fake_models
+    evaluate_history_relevance(TURNS[2], TURNS[3], TURNS[:2], "conv_1")
+
+    relevance.clear_cache()  # Count encoder work, not embedding-cache hits
+    encoder.texts_encoded = 0
+    result = evaluate_history_relevance("What about the cost?", "Knee surgery costs 3 lakh.", TURNS, "conv_1")
+    assert encoder.texts_encoded == 4  # Query, reply and the two turns since the last call
+    assert result.history_turns == 4
+
+    history.clear_cache()
+    rebuilt = evaluate_history_relevance("What about the cost?", "Knee surgery costs 3 lakh.", TURNS, "conv_1")
+    assert rebuilt.score == pytest.approx(result.score)
+
+
+def test_history_lifts_follow_up_relevance(fake_models, fresh_history):
+    """An on-topic answer to an elliptical follow-up scores higher with history."""
+    result = evaluate_history_relevance("What about the cost?", "Knee replacement surgery costs 3 lakh.",
+                                        TURNS, "conv_1")
+    assert result.history > result.turn
+    assert result.score > result.turn
+    assert result.score == pytest.approx((1 - config.HISTORY_RELEVANCE_WEIGHT) * result.turn
+                                         + config.HISTORY_RELEVANCE_WEIGHT * result.history)
+
+    # Edited history does not reuse the stored embedding
+    edited = ["Do you offer dental implants?"] + TURNS[1:]
+    assert evaluate_history_relevance("What about the cost?", "Knee replacement surgery costs 3 lakh.",
+                                      edited, "conv_1").history != pytest.approx(result.history)
+
+
+def test_pipeline_reports_turn_and_history(fake_models, fresh_history, monkeypatch):
+    """In history mode the report keeps the turn-only score next to the blended one."""
+    monkeypatch.setattr(config, "RELEVANCE_MODE", "history")
+    messages = [Message(role="user" if i % 2 == 0 else "assistant", content=t, id=f"m{i}")
+                for i, t in enumerate(TURNS)]
+    messages += [Message(role="user", content="What about the cost?", id="m4"),
+                 Message(role="assistant", content="Knee replacement surgery costs 3 lakh.", id="m5")]
+    data = EvalInput(conversation=Conversation(id="conv_1", messages=messages),
+                     context=ContextData(entries={"m4": [ContextChunk(text="Knee surgery costs 3 lakh.")]}))
+
+    report = run_evaluation(data)
+    assert report.status == "success"
+    assert report.scores.history_turns == 4
+    assert report.scores.relevance > report.scores.relevance_turn
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -10,7 +10,9 @@ from pathlib import Path
 # Add src to path
 sys.path.append(str(Path(__file__).parent.parent / "src"))
 
-from eval_pipeline.loader import load_data, normalize_conversation, normalize_context
+from eval_pipeline.loader import load_data, normalize_conversation, normalize_context, iter_corpus, load_record, build_eval_input
+from eval_pipeline.schemas import TrustedEvalInput
+from eval_pipeline.targeting import select_target_pair
 
 
 def test_normalize_conversation_mock_format():
@@ -98,6 +100,27 @@ def test_normalize_context_assignment_format():
     assert "context" in result
     assert len(result["context"]) == 1
     assert result["context"][0]["text"] == "IVF is a fertility treatment."
+    assert result["context"][0]["id"] == "123"
+    assert result["context"][0]["source_url"] == "https://example.com"
+
+
+def test_normalize_context_joins_retriever_scores():
+    """Retriever scores from sources.vectors_info are attached by chunk id."""
+    assignment_context = {
+        "data": {
+            "vector_data": [
+                {"id": 1, "text": "First chunk."},
+                {"id": 2, "text": "Second chunk."},
+            ],
+            "sources": {
+                "vectors_info": "[{'score': 0.52, 'vector_id': 1, 'tokens_count': 3}]"
+            }
+        }
+    }
+
+    chunks = normalize_context(assignment_context)["context"]
+    assert chunks[0]["score"] == pytest.approx(0.52)
+    assert chunks[1]["score"] is None
 
 
 def test_load_data_with_mock_files():
@@ -156,5 +179,48 @@ def test_load_data_invalid_json():
         Path(valid_path).unlink()
 
 
+def test_iter_corpus_and_load_record(tmp_path):
+    """Test reading a JSONL corpus record by record."""
+    record = {
+        "conversation": {"id": "c1", "messages": [
+            {"role": "user", "content": "Test", "id": "msg_1"},
+            {"role": "assistant", "content": "Response", "id": "msg_2"}
+        ]},
+        "context": {"msg_1": [{"text": "Test context"}]}
+    }
+    path = tmp_path / "corpus.jsonl"
+    path.write_text(json.dumps(record) + "\n\n{ not json }\n")
+
+    lines = list(iter_corpus(str(path)))
+    assert [line_no for line_no, _ in lines] == [0, 2]
+
+    eval_input = load_record(lines[0][1])
+    assert eval_input.conversation.id == "c1"
+
+    with pytest.raises(ValueError):
+        load_record(lines[1][1])
+
+
+def test_trusted_input_matches_validated():
+    """Test that the trusted fast path exposes the same data as the validated path."""
+    conv = {"chat_id": 7, "conversation_turns": [
+        {"turn": 1, "role": "User", "message": "Where is the clinic?"},
+        {"turn": 2, "role": "AI/Chatbot", "message": "In Mumbai."}
+    ]}
+    context = {"data": {"vector_data": [{"id": 1, "text": "The clinic is in Mumbai.", "source_url": "u"}]}}
+
+    validated = build_eval_input(conv, context)
+    trusted = build_eval_input(conv, context, trusted=True)
+
+    assert isinstance(trusted, TrustedEvalInput)
+    assert trusted.conversation.id == validated.conversation.id
+    assert [m.content for m in trusted.conversation.messages] == [m.content for m in validated.conversation.messages]
+    chunk = trusted.context.entries["context"][0]
+    assert (chunk.text, chunk.id) == ("The clinic is in Mumbai.", "1")
+
+    user_msg, ai_msg, key = select_target_pair(trusted.conversation, trusted.context)
+    assert (user_msg.content, ai_msg.content, key) == ("Where is the clinic?", "In Mumbai.", "context")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,164 @@
+"""
+Tests for memory instrumentation and the memory budget.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import memory
+from eval_pipeline.batching import LengthBucketScheduler
+from eval_pipeline.cache import LRUCache
+from eval_pipeline.semantic_cache import SemanticCache
+
+
+@pytest.fixture
+def isolated_caches(monkeypatch):
+    """Runs with an empty cache registry and no budget, restored afterwards."""
+    monkeypatch.setattr(memory, "_caches", {})
+    yield
+    memory.set_memory_budget(None)
+
+
+def test_lru_cache_accounts_bytes():
+    """Byte accounting follows puts, overwrites and evictions."""
+    cache = LRUCache(maxsize=2)
+    cache["a"] = np.zeros(1000, dtype=np.float32)
+    first = cache.nbytes
+    assert first > 4000
+    cache["a"] = np.zeros(10, dtype=np.float32)
+    assert cache.nbytes < first
+    cache["b"] = np.zeros(10, dtype=np.float32)
+    cache["c"] = np.zeros(10, dtype=np.float32)
+    assert len(cache) == 2 and cache.evictions == 1
+    cache.clear()
+    assert cache.nbytes == 0
+
+
+def test_shrink_bytes_evicts_lru_and_caps_growth():
+    """Shrinking drops the oldest entries and keeps the cache at its new size."""
+    cache = LRUCache(maxsize=100)
+    for i in range(10):
+        cache[i] = np.zeros(256, dtype=np.float32)
+    cache.get(0)  # Most recently used now
+    freed = cache.shrink_bytes(cache.nbytes // 2)
+    assert freed > 0 and 0 in cache and 1 not in cache
+    size = cache.nbytes
+    for i in range(10, 20):
+        cache[i] = np.zeros(256, dtype=np.float32)
+    assert cache.nbytes <= size
+
+
+def test_semantic_cache_shrink_bytes():
+    """The semantic cache shrinks by embedding bytes and stays consistent."""
+    cache = SemanticCache(max_entries=100)
+    rng = np.random.default_rng(0)
+    for i in range(8):
+        v = rng.standard_normal(16).astype(np.float32)
+        cache.insert("ctx", v / np.linalg.norm(v), float(i))
+    freed = cache.shrink_bytes(4 * 16 * 3)
+    assert freed == 4 * 16 * 3
+    assert len(cache) == 5 and cache.max_entries == 5
+    assert all(ids for ids in cache._buckets.values())
+
+
+def test_tracker_records_stages():
+    """Stages record RSS after they return, and the tracemalloc peak when tracing."""
+    tracker = memory.MemoryTracker()
+    with tracker.track("load"):
+        pass
+    assert tracker.stages["load"].calls == 1
+    assert tracker.stages["load"].max_traced_peak is None
+
+    tracker.enable_tracemalloc()
+    try:
+        with tracker.track("metrics"):
+            buffer = bytearray(2 * memory.MB)
+        del buffer
+        assert tracker.stages["metrics"].max_traced_peak >= 2 * memory.MB
+        assert tracker.snapshot("test")
+    finally:
+        tracker.disable_tracemalloc()
+
+
+def test_tracker_reads_rss_after_the_stage(monkeypatch):
+    """A spike that is freed before the stage returns is not reported as the stage's RSS."""
+    readings = iter([100 * memory.MB, 120 * memory.MB])  # Before, after; the 500 MB spike in between is unseen
+    monkeypatch.setattr(memory, "rss_bytes", lambda: next(readings))
+    tracker = memory.MemoryTracker()
+    with tracker.track("nli"):
+        pass
+    stats = tracker.to_dict()["nli"]
+    assert stats["max_rss_after_mb"] == 120.0 and stats["max_rss_delta_mb"] == 20.0
+
+
+def test_budget_shrinks_largest_cache_first(isolated_caches, monkeypatch):
+    """Over the high-water mark, the largest cache is shrunk and batches get smaller."""
+    small, large = LRUCache(maxsize=100), LRUCache(maxsize=100)
+    for i in range(4):
+        small[i] = np.zeros(256, dtype=np.float32)
+        large[i] = np.zeros(4096, dtype=np.float32)
+    memory.register_cache("small", small)
+    memory.register_cache("large", large)
+    small_bytes = small.nbytes
+
+    budget = memory.set_memory_budget(1, high_water=0.76)  # 1 MB
+    monkeypatch.setattr(memory, "rss_bytes", lambda: int(0.75 * memory.MB) + 20000)
+    assert memory.check_memory_budget() is True
+    assert small.nbytes == small_bytes
+    assert len(large) < 4
+    assert budget.bytes_evicted >= 20000
+
+    scheduler = LengthBucketScheduler("test", token_budget=100, max_batch_size=16)
+    assert max(len(b) for b in scheduler.plan([10] * 16)) == 5
+
+    monkeypatch.setattr(memory, "rss_bytes", lambda: int(0.5 * memory.MB))
+    assert memory.check_memory_budget() is False
+    assert max(len(b) for b in scheduler.plan([10] * 16)) == 10
+
+
+def test_caps_come_back_when_pressure_clears(isolated_caches, monkeypatch):
+    """Shrunken caches regain their configured limits below the low-water mark."""
+    lru, semantic = LRUCache(maxsize=100), SemanticCache(max_entries=100)
+    rng = np.random.default_rng(0)
+    for i in range(8):
+        lru[i] = np.zeros(4096, dtype=np.float32)
+        v = rng.standard_normal(16).astype(np.float32)
+        semantic.insert("ctx", v / np.linalg.norm(v), float(i))
+    memory.register_cache("lru", lru)
+    memory.register_cache("semantic", semantic)
+
+    memory.set_memory_budget(1, high_water=0.76)  # 1 MB
+    monkeypatch.setattr(memory, "rss_bytes", lambda: int(0.75 * memory.MB) + 200000)
+    assert memory.check_memory_budget() is True  # Empties the LRU cache, then shrinks the semantic one
+    assert lru.max_bytes == 0 and semantic.max_entries == 1
+
+    monkeypatch.setattr(memory, "rss_bytes", lambda: int(0.755 * memory.MB))
+    assert memory.check_memory_budget() is True  # Between the marks: still capped
+    assert lru.max_bytes == 0
+
+    monkeypatch.setattr(memory, "rss_bytes", lambda: int(0.5 * memory.MB))
+    assert memory.check_memory_budget() is False
+    assert lru.max_bytes is None and semantic.max_entries == 100
+    for i in range(8):
+        lru[i] = np.zeros(4096, dtype=np.float32)
+    assert len(lru) == 8
+
+
+def test_budget_within_limit_is_a_no_op(isolated_caches, monkeypatch):
+    """Below the high-water mark nothing is evicted."""
+    cache = LRUCache()
+    cache["a"] = "x" * 100
+    memory.register_cache("c", cache)
+    budget = memory.set_memory_budget(1)
+    monkeypatch.setattr(memory, "rss_bytes", lambda: int(0.8 * memory.MB))
+    assert memory.check_memory_budget() is False
+    assert budget.enforcements == 0 and "a" in cache
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
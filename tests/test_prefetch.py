@@ -0,0 +1,86 @@
+"""
+Tests for directory-mode input discovery and prefetched loading.
+"""
+import threading
+import time
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.loader import iter_input_pairs, load_pair
+from eval_pipeline.prefetch import PrefetchLoader
+
+SAMPLES = Path(__file__).parent.parent / "Sample Inputs"
+
+
+def test_pairs_sample_inputs():
+    """The archive naming scheme pairs conversations with their context files."""
+    unmatched = []
+    pairs = sorted(iter_input_pairs(str(SAMPLES), unmatched))
+    assert [(Path(p.conversation).name, Path(p.context).name) for p in pairs] == [
+        ("sample-chat-conversation-01.json", "sample_context_vectors-01.json"),
+        ("sample-chat-conversation-02.json", "sample_context_vectors-02.json"),
+    ]
+    assert unmatched == []
+    data = load_pair(pairs[1])  # 01 has comments, which need json5
+    assert data.conversation.messages
+
+
+def test_pairs_within_directories_and_reports_unmatched(tmp_path):
+    """Same keys in different directories do not pair; lone files are reported."""
+    for sub in ("a", "b"):
+        (tmp_path / sub).mkdir()
+        (tmp_path / sub / "x-conversation-1.json").write_text("{}")
+    (tmp_path / "a" / "x_context_vectors-1.json").write_text("{}")
+    (tmp_path / "a" / "notes.txt").write_text("")
+
+    unmatched = []
+    pairs = list(iter_input_pairs(str(tmp_path), unmatched))
+    assert len(pairs) == 1 and Path(pairs[0].conversation).parent.name == "a"
+    assert [Path(p).parent.name for p in unmatched] == ["b"]
+
+    globbed = list(iter_input_pairs(str(tmp_path / "a" / "*.json")))
+    assert [p.key for p in globbed] == ["x-conversation-1"]
+
+
+def test_prefetch_preserves_order_and_reports_errors():
+    """Results come back in input order; a failed load does not stop the run."""
+    def load(i):
+        time.sleep(0.001 * (5 - i % 5))  # Later items finish first
+        if i == 3:
+            raise ValueError("bad file")
+        return i * 10
+
+    loader = PrefetchLoader(range(8), load, workers=4, depth=4)
+    results = list(loader)
+    assert [item for item, _, _ in results] == list(range(8))
+    assert results[3][1] is None and isinstance(results[3][2], ValueError)
+    assert results[7][1] == 70
+    assert loader.stats.loaded == 7 and loader.stats.failed == 1
+
+
+def test_prefetch_bounds_read_ahead():
+    """No more than `depth` items are loaded ahead of the consumer."""
+    started = []
+    lock = threading.Lock()
+
+    def load(i):
+        with lock:
+            started.append(i)
+        return i
+
+    loader = PrefetchLoader(range(100), load, workers=2, depth=3)
+    for item, _, _ in loader:
+        time.sleep(0.002)  # Let the threads run as far ahead as allowed
+        with lock:
+            assert max(started) <= item + 3
+        if item == 10:
+            break
+    assert max(started) <= 13
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
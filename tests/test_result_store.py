@@ -0,0 +1,79 @@
+"""
+Tests for the indexed SQLite result store.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import result_store
+from eval_pipeline.aggregate import EvalReport, MetricScores
+from eval_pipeline.result_store import ResultStore, SqliteReportSink, parse_filter
+from eval_pipeline.sinks import infer_format, open_sink
+
+
+def _report(i, status="success", tenant=None):
+    scores = None
+    if status == "success":
+        scores = MetricScores(relevance=0.8, completeness=0.7, groundedness=i / 10,
+                              toxicity=0.0, latency_ms=120.0 + i, estimated_cost=1e-6)
+    return EvalReport(status=status, chat_id=f"chat_{i}", evaluated_at=1700000000.0 + i,
+                      target_user_message=f"query {i}", target_ai_response=f"response {i}",
+                      scores=scores, error=None if scores else "skipped", tenant=tenant)
+
+
+def test_sink_batches_and_store_filters(tmp_path):
+    """Rows land in batches; queries combine time range, status and score thresholds."""
+    path = str(tmp_path / "results.db")
+    assert infer_format(path) == "sqlite"
+    with open_sink(path, batch_size=4) as sink:
+        for i in range(10):
+            sink.write(_report(i, tenant="clinic-a" if i % 2 else None))
+            if i == 4:
+                assert ResultStore(path).count() == 4  # The fifth row is still buffered
+        sink.write(_report(10, status="skipped"))
+
+    with ResultStore(path) as store:
+        assert store.count() == 11
+        low = list(store.query(columns=["chat_id", "groundedness"],
+                               filters=[parse_filter("groundedness<0.3")]))
+        assert [row["chat_id"] for row in low] == ["chat_0", "chat_1", "chat_2"]
+        assert store.count(since=1700000003.0, until=1700000006.0) == 3
+        assert store.count(status="skipped") == 1
+        assert store.count(tenant="clinic-a", filters=[("groundedness", "ge", 0.5)]) == 3
+        top = list(store.query(order_by="groundedness", descending=True, limit=1, status="success"))
+        assert top[0]["chat_id"] == "chat_9"
+
+        report = next(store.reports(chat_id="chat_7"))
+        assert report.scores.groundedness == pytest.approx(0.7)
+        assert report.target_ai_response == "response 7"
+
+        with pytest.raises(ValueError):
+            store.count(filters=[("groundedness; DROP TABLE reports", "lt", 1)])
+        with pytest.raises(ValueError):
+            parse_filter("groundedness ~ 0.5")
+
+
+def test_resume_drops_rows_after_checkpoint(tmp_path, monkeypatch):
+    """Resuming from a checkpoint removes rows written after it, and appends from there."""
+    synced = []
+    monkeypatch.setattr(result_store.os, "fsync", synced.append)
+    path = str(tmp_path / "results.db")
+    with SqliteReportSink(path) as sink:
+        for i in range(3):
+            sink.write(_report(i))
+        state = sink.checkpoint()
+        assert synced  # The write-ahead log is synced, not just committed
+        sink.write(_report(3))  # Lost to a crash before the next checkpoint
+
+    assert state == {"last_id": 3}
+    with SqliteReportSink(path, resume=state) as sink:
+        sink.write(_report(4))
+    with ResultStore(path) as store:
+        assert [row["chat_id"] for row in store.query(columns=["chat_id"])] == ["chat_0", "chat_1", "chat_2", "chat_4"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,88 @@
+"""
+Tests for retrieval-quality metrics.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+import numpy as np
+
+from eval_pipeline import config
+from eval_pipeline.aggregate import run_evaluation
+from eval_pipeline.metrics.retrieval import evaluate_retrieval, _spearman
+from eval_pipeline.schemas import Message, Conversation, ContextChunk, ContextData, EvalInput
+
+
+def test_context_precision_counts_relevant_chunks(fake_models):
+    """Only chunks similar to the query count towards precision."""
+    chunks = [
+        ContextChunk(text="clinic location mumbai", score=0.9),
+        ContextChunk(text="clinic location", score=0.8),
+        ContextChunk(text="zebra giraffe elephant", score=0.1),
+        ContextChunk(text="", score=0.5),  # Empty chunks are ignored
+    ]
+    result = evaluate_retrieval("clinic location mumbai", chunks, relevance_threshold=0.5)
+
+    assert result.chunks == 3
+    assert result.context_precision == pytest.approx(2 / 3)
+    assert result.score_calibration == pytest.approx(1.0)
+
+
+def test_redundancy_flags_duplicate_chunks(fake_models):
+    """Near-identical chunks raise redundancy; distinct ones keep it low."""
+    duplicated = [ContextChunk(text="clinic opens at nine"), ContextChunk(text="clinic opens at nine")]
+    distinct = [ContextChunk(text="clinic opens at nine"), ContextChunk(text="parking is free downstairs")]
+
+    assert evaluate_retrieval("when", duplicated).redundancy == pytest.approx(1.0)
+    assert evaluate_retrieval("when", distinct).redundancy < 0.5
+
+
+def test_redundancy_uses_stored_vectors(fake_models):
+    """Chunk-to-chunk similarity comes from the retriever vectors when all chunks have one."""
+    chunks = [ContextChunk(text="clinic opens", vector=[1.0, 0.0]),
+              ContextChunk(text="clinic opens", vector=[0.0, 2.0])]
+    assert evaluate_retrieval("when", chunks).redundancy == pytest.approx(0.0)
+
+
+def test_calibration_is_rank_based_and_handles_ties():
+    """Spearman correlation ignores scale and is undefined for constant scores."""
+    x = np.array([0.1, 0.2, 0.3, 0.4])
+    assert _spearman(x, x ** 3) == pytest.approx(1.0)
+    assert _spearman(x, -x) == pytest.approx(-1.0)
+    assert _spearman(np.ones(4), x) is None
+
+
+def test_empty_context_returns_no_scores(fake_models):
+    """Nothing to evaluate yields empty scores rather than errors."""
+    result = evaluate_retrieval("query", [])
+    assert result.chunks == 0
+    assert result.context_precision is None
+
+
+def test_pipeline_stage_is_opt_in(fake_models, monkeypatch):
+    """The pipeline encodes no chunks for retrieval metrics unless they are enabled."""
+    encoder, _ = fake_models
+    conv = Conversation(id="conv_1", messages=[
+        Message(role="user", content="Where is the clinic?", id="msg_u1"),
+        Message(role="assistant", content="In Mumbai.", id="msg_a1"),
+    ])
+    data = EvalInput(conversation=conv, context=ContextData(entries={"msg_u1": [
+        ContextChunk(text="The clinic is in Mumbai."), ContextChunk(text="Parking is free.")]}))
+
+    encoded = []
+    encode = encoder.encode
+    monkeypatch.setattr(encoder, "encode", lambda texts, **kw: encoded.extend(texts) or encode(texts, **kw))
+
+    report = run_evaluation(data)
+    assert report.scores.context_precision is None
+    assert "Parking is free." not in encoded
+
+    monkeypatch.setattr(config, "RETRIEVAL_METRICS", True)
+    assert run_evaluation(data).scores.context_precision is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
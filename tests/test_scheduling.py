@@ -0,0 +1,92 @@
+"""
+Tests for priority classes, aging and per-tenant fair queuing.
+"""
+import json
+import queue
+import pytest
+import sys
+from collections import Counter
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.aggregate import EvalReport
+from eval_pipeline.consumer import QueueConsumer
+from eval_pipeline.scheduling import RequestScheduler, priority_class
+from eval_pipeline.transport import SqliteTransport
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_priority_classes_from_records():
+    """Explicit priorities win; feedback and safety flags make a record urgent."""
+    assert priority_class({"priority": "bulk", "flags": ["safety"]}) == "bulk"
+    assert priority_class({"flags": ["user_feedback"]}) == "urgent"
+    assert priority_class({"flags": ["other"]}) == "normal"
+    assert priority_class("not a record") == "normal"
+
+
+def test_urgent_first_and_aging_prevents_starvation():
+    """Urgent work jumps the queue, but bulk work moves up once it has waited long enough."""
+    clock = FakeClock()
+    scheduler = RequestScheduler(aging_s=10, weight=lambda tenant: 1.0, clock=clock)
+    scheduler.put("bulk-1", "bulk")
+    for i in range(3):
+        scheduler.put(f"urgent-{i}", "urgent")
+    assert [scheduler.get_nowait() for _ in range(3)] == ["urgent-0", "urgent-1", "urgent-2"]
+
+    clock.now = 35.0  # Aged three levels: ahead even of new urgent work
+    scheduler.put("urgent-3", "urgent")
+    assert scheduler.get_nowait() == "bulk-1"
+    assert scheduler.stats["bulk"].aged == 1
+    assert scheduler.stats["bulk"].to_dict()["wait_max_ms"] == 35000
+    assert scheduler.get_nowait() == "urgent-3"
+    with pytest.raises(queue.Empty):
+        scheduler.get(timeout=0.01)
+
+
+def test_weighted_fair_share_between_tenants():
+    """A flooding tenant does not starve others; weights set the shares."""
+    weights = {"noisy": 1.0, "quiet": 1.0, "premium": 3.0}
+    scheduler = RequestScheduler(aging_s=0, weight=lambda tenant: weights[tenant])
+    for i in range(100):
+        scheduler.put(("noisy", i), "normal", "noisy")
+    for i in range(10):
+        scheduler.put(("quiet", i), "normal", "quiet")
+        scheduler.put(("premium", i), "normal", "premium")
+
+    served = Counter(scheduler.get_nowait()[0] for _ in range(15))
+    assert served["quiet"] == 3 and served["noisy"] == 3 and served["premium"] == 9
+
+
+def test_consumer_evaluates_urgent_messages_first(tmp_path, list_sink, queue_record):
+    """Urgent messages are leased and evaluated ahead of an earlier bulk backlog."""
+    order = []
+
+    def evaluate(data):
+        order.append(data.conversation.id)
+        return EvalReport(status="success", chat_id=data.conversation.id,
+                          target_user_message="q", target_ai_response="r")
+
+    flagged = json.loads(queue_record("flagged"))
+    flagged["flags"] = ["safety"]
+    bodies = [queue_record(f"bulk_{i}") for i in range(20)] + [json.dumps(flagged)]
+    with SqliteTransport(str(tmp_path / "q.db")) as transport:
+        transport.publish(bodies, [2] * 20 + [0])
+        consumer = QueueConsumer(transport, list_sink, prefetch=4, fetch_batch=4,
+                                 poll_interval=0.01, evaluate=evaluate)
+        consumer.run(idle_timeout=0.1)
+
+    assert order[0] == "flagged" and len(order) == 21
+    assert consumer.scheduler.stats["urgent"].wait_ms.count == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -8,7 +8,7 @@ from pathlib import Path
 # Add src to path
 sys.path.append(str(Path(__file__).parent.parent / "src"))
 
-from eval_pipeline.schemas import Message, Conversation, ContextChunk, ContextData, EvalInput
+from eval_pipeline.schemas import Message, Conversation, ContextChunk, ContextData, EvalInput, TrustedMessage, TrustedContextChunk
 
 
 def test_message_creation():
@@ -99,5 +99,15 @@ def test_invalid_message_missing_content():
         Message(role="user")
 
 
+def test_trusted_objects_are_slotted():
+    """Test that trusted-path objects carry no per-instance __dict__."""
+    msg = TrustedMessage("user", "Hello", id="msg_1")
+    chunk = TrustedContextChunk("Some context")
+    assert not hasattr(msg, "__dict__")
+    assert msg.timestamp is None
+    assert chunk.vector == []
+    assert chunk.score is None
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,122 @@
+"""
+Tests for the approximate (semantic) groundedness cache.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.semantic_cache import SemanticCache, context_fingerprint
+from eval_pipeline.metrics import groundedness
+from eval_pipeline.schemas import ContextChunk
+
+
+def _unit(vec):
+    vec = np.asarray(vec, dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def test_lookup_hits_near_duplicate():
+    """A vector within max_distance returns the cached score."""
+    cache = SemanticCache(max_distance=0.05)
+    base = _unit(np.arange(1, 33))
+    cache.insert("ctx", base, 0.8)
+
+    near = _unit(np.arange(1, 33) + 0.01)
+    hit = cache.lookup("ctx", near)
+
+    assert hit is not None
+    score, distance = hit
+    assert score == pytest.approx(0.8)
+    assert distance <= 0.05
+
+
+def test_lookup_misses_distant_vector():
+    """A dissimilar vector is not served from cache."""
+    cache = SemanticCache(max_distance=0.05)
+    cache.insert("ctx", _unit(np.arange(1, 33)), 0.8)
+    assert cache.lookup("ctx", -_unit(np.arange(1, 33))) is None
+
+
+def test_lookup_is_partitioned_by_context():
+    """Entries for another context set are never reused."""
+    cache = SemanticCache(max_distance=0.05)
+    vec = _unit(np.arange(1, 33))
+    cache.insert("ctx_a", vec, 0.8)
+    assert cache.lookup("ctx_b", vec) is None
+
+
+def test_memory_is_bounded():
+    """The cache evicts least-recently-used entries beyond max_entries."""
+    cache = SemanticCache(max_entries=3)
+    rng = np.random.default_rng(1)
+    for i in range(10):
+        cache.insert("ctx", _unit(rng.standard_normal(16)), float(i))
+    assert len(cache) == 3
+    assert sum(len(ids) for ids in cache._buckets.values()) == 3 * cache.num_tables
+
+
+def test_context_fingerprint_order_independent():
+    """The same chunks in any order share a fingerprint."""
+    assert context_fingerprint(["a", "b"]) == context_fingerprint(["b", "a"])
+    assert context_fingerprint(["a", "b"]) != context_fingerprint(["a", "c"])
+
+
+def test_groundedness_flags_approximate_hit(fake_models):
+    """A paraphrased response reuses the cached score and is flagged approximate."""
+    _, cross_encoder = fake_models
+    cache = groundedness.configure_semantic_cache(max_distance=0.2, audit_rate=0.0)
+    try:
+        chunks = [ContextChunk(text="Happy Home Hotel offers single rooms for Rs 1400 near the clinic.")]
+        first = groundedness.evaluate_groundedness("Happy Home Hotel offers single rooms for Rs 1400.", chunks)
+        calls = cross_encoder.calls
+        second = groundedness.evaluate_groundedness("Happy Home Hotel has single rooms for Rs 1400.", chunks)
+
+        assert not first.approximate
+        assert second.approximate
+        assert second.score == pytest.approx(first.score)
+        assert cross_encoder.calls == calls
+        assert cache.stats()["hits"] == 1
+    finally:
+        groundedness.configure_semantic_cache(enabled=False)
+
+
+def test_groundedness_never_reuses_a_score_across_figures(fake_models):
+    """A near-duplicate response stating a different number is scored exactly."""
+    _, cross_encoder = fake_models
+    cache = groundedness.configure_semantic_cache(max_distance=0.2, audit_rate=0.0)
+    try:
+        chunks = [ContextChunk(text="Refunds are processed in 5 days after cancellation.")]
+        groundedness.evaluate_groundedness("Refunds are processed in 5 days.", chunks)
+        calls = cross_encoder.calls
+        result = groundedness.evaluate_groundedness("Refunds are processed in 50 days.", chunks)
+
+        assert not result.approximate
+        assert cross_encoder.calls == calls + 1
+        assert cache.stats()["hits"] == 0
+    finally:
+        groundedness.configure_semantic_cache(enabled=False)
+
+
+def test_groundedness_audit_records_error(fake_models):
+    """Audited hits are re-scored exactly and the error is recorded."""
+    cache = groundedness.configure_semantic_cache(max_distance=0.2, audit_rate=1.0)
+    try:
+        chunks = [ContextChunk(text="Happy Home Hotel offers single rooms for Rs 1400 near the clinic.")]
+        groundedness.evaluate_groundedness("Happy Home Hotel offers single rooms for Rs 1400.", chunks)
+        result = groundedness.evaluate_groundedness("Happy Home Hotel has single rooms for Rs 1400.", chunks)
+
+        assert not result.approximate
+        stats = cache.stats()
+        assert stats["hits"] == stats["audits"] == 1
+        assert stats["est_saved_ms"] == 0.0  # The audited hit was recomputed
+    finally:
+        groundedness.configure_semantic_cache(enabled=False)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
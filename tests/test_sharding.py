@@ -0,0 +1,109 @@
+"""
+Tests for shard planning and merging.
+"""
+import json
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.aggregate import EvalReport
+from eval_pipeline.sharding import ShardPlan, plan_shards, merge_shards, record_cost, iter_keyed_records
+from eval_pipeline.summary import RunSummary
+
+
+def _record(i, chat, turns=1, chunks=1):
+    messages = []
+    for t in range(turns):
+        messages += [{"role": "user", "content": "q", "id": f"u{t}"},
+                     {"role": "assistant", "content": "a", "id": f"a{t}"}]
+    return {"id": f"r{i}", "conversation": {"id": chat, "messages": messages},
+            "context": {"u0": [{"text": "x"}] * chunks}}
+
+
+def _write_corpus(path, records):
+    path.write_text("\n".join(json.dumps(r) for r in records) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def _run_shard(plan, corpus, shard, path):
+    """Writes the reports a node running `shard` would produce."""
+    with open(path, "w", encoding="utf-8") as f:
+        for line_no, _, _, key, chat_id in iter_keyed_records(corpus):
+            if plan.shard_of(chat_id) == shard:
+                report = EvalReport(status="skipped", chat_id=chat_id, record_id=key,
+                                    target_user_message="", target_ai_response="")
+                f.write(report.model_dump_json() + "\n")
+    return str(path)
+
+
+def test_record_cost_is_turns_times_chunks():
+    """Cost grows with both conversation length and retrieved context."""
+    assert record_cost(_record(0, "c", turns=3, chunks=4)) == 6 * 4
+    assert record_cost("not a record") == 1
+
+
+def test_plan_is_deterministic_and_keeps_chats_together(tmp_path):
+    """The same corpus always yields the same plan; a chat never spans shards."""
+    corpus = _write_corpus(tmp_path / "c.jsonl", [_record(i, f"chat{i % 7}") for i in range(50)])
+    plan = plan_shards(corpus, 3, buckets_per_shard=4)
+    again = ShardPlan.from_dict(json.loads(json.dumps(plan_shards(corpus, 3, buckets_per_shard=4).to_dict())))
+
+    assert plan.bucket_shards == again.bucket_shards
+    assert plan.shard_checksums == again.shard_checksums
+    assert sum(plan.shard_records) == 50
+    shards_per_chat = {}
+    for _, _, _, _, chat_id in iter_keyed_records(corpus):
+        shards_per_chat.setdefault(chat_id, set()).add(plan.shard_of(chat_id))
+    assert all(len(s) == 1 for s in shards_per_chat.values())
+
+
+def test_plan_balances_by_cost_not_count(tmp_path):
+    """A few expensive chats are spread so shard costs, not record counts, even out."""
+    records = [_record(i, f"big{i}", turns=10, chunks=10) for i in range(4)]
+    records += [_record(100 + i, f"small{i}") for i in range(400)]
+    corpus = _write_corpus(tmp_path / "c.jsonl", records)
+
+    plan = plan_shards(corpus, 4, buckets_per_shard=32)
+    assert plan.imbalance() < 1.2
+    # Each expensive chat gets its own shard, however few records it has
+    assert len({plan.shard_of(f"big{i}") for i in range(4)}) == 4
+
+
+def test_merge_verifies_complete_shard_outputs(tmp_path):
+    """Merged shards cover every record exactly once and feed one summary."""
+    corpus = _write_corpus(tmp_path / "c.jsonl", [_record(i, f"chat{i % 9}") for i in range(30)])
+    plan = plan_shards(corpus, 3, buckets_per_shard=4)
+    outputs = [_run_shard(plan, corpus, s, tmp_path / f"s{s}.jsonl") for s in range(3)]
+
+    merged = []
+    summary = RunSummary()
+
+    class ListSink:
+        def write(self, report):
+            merged.append(report)
+
+    result = merge_shards(plan, outputs, sink=ListSink(), summary=summary)
+    assert result.ok
+    assert result.shard_reports == plan.shard_records
+    assert sorted(r.record_id for r in merged) == sorted(f"r{i}" for i in range(30))
+    assert summary.overall.reports == 30
+
+
+def test_merge_detects_missing_and_duplicate_shards(tmp_path):
+    """A shard merged twice in place of another is caught, with the exact missing keys."""
+    corpus = _write_corpus(tmp_path / "c.jsonl", [_record(i, f"chat{i}") for i in range(20)])
+    plan = plan_shards(corpus, 2, buckets_per_shard=4)
+    first = _run_shard(plan, corpus, 0, tmp_path / "s0.jsonl")
+
+    result = merge_shards(plan, [first, first], corpus=corpus)
+    assert not result.ok
+    assert len(result.duplicates) == plan.shard_records[0]
+    assert len(result.missing) == plan.shard_records[1]
+    assert all(plan.shard_of(k.replace("r", "chat")) == 1 for k in result.missing)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,120 @@
+"""
+Tests for report sinks.
+"""
+import pytest
+import sys
+import json
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.aggregate import EvalReport, MetricScores
+from eval_pipeline.sinks import (
+    ColumnarReportSink, JsonReportSink, JsonlReportSink, infer_format, load_npz_part, open_sink,
+)
+
+
+def _report(i, status="success", response=None, tenant=None):
+    scores = None
+    if status == "success":
+        scores = MetricScores(relevance=0.8, completeness=0.7, groundedness=i / 10,
+                              toxicity=0.0, latency_ms=120.0 + i, estimated_cost=1e-6)
+    return EvalReport(status=status, chat_id=f"chat_{i}", evaluated_at=1700000000.0 + i,
+                      target_user_message=f"query {i}", target_ai_response=response or f"response {i}",
+                      scores=scores, error=None if scores else "skipped", tenant=tenant)
+
+
+def test_jsonl_sink_writes_one_report_per_line(tmp_path):
+    """Each report is one compact JSON line."""
+    path = tmp_path / "reports.jsonl"
+    with JsonlReportSink(str(path), flush_every=2) as sink:
+        for i in range(3):
+            sink.write(_report(i))
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 3
+    assert json.loads(lines[2])["chat_id"] == "chat_2"
+    assert "\n  " not in path.read_text()
+
+
+def test_json_sink_single_report_is_object(tmp_path):
+    """A single report keeps the original indented-object layout."""
+    path = tmp_path / "report.json"
+    with JsonReportSink(str(path)) as sink:
+        sink.write(_report(1))
+    assert json.loads(path.read_text())["status"] == "success"
+
+
+def test_npz_sink_flushes_row_groups(tmp_path):
+    """The .npz fallback writes one typed part file per row group."""
+    path = tmp_path / "reports.npz"
+    with ColumnarReportSink(str(path), format="npz", row_group_size=2) as sink:
+        for i in range(3):
+            sink.write(_report(i))
+        sink.write(_report(3, status="skipped"))
+
+    parts = sorted(tmp_path.glob("reports.*.npz"))
+    assert len(parts) == 2
+    first = load_npz_part(str(parts[0]))
+    assert first["groundedness"].dtype == np.float64
+    assert list(first["chat_id"]) == ["chat_0", "chat_1"]
+    second = load_npz_part(str(parts[1]))
+    assert np.isnan(second["groundedness"][1])
+    assert second["groundedness_approx"][1] == -1
+
+
+def test_npz_text_is_variable_length(tmp_path):
+    """One long response does not widen every row; text and tenants round-trip."""
+    path = tmp_path / "reports.npz"
+    long_response = "Our fertility specialists \u2014 d\u00e9tails inclus \u2014 " * 500
+    with ColumnarReportSink(str(path), format="npz") as sink:
+        sink.write(_report(0, response=long_response, tenant="clinic-a"))
+        for i in range(1, 50):
+            sink.write(_report(i))
+
+    part = next(tmp_path.glob("reports.*.npz"))
+    with np.load(part) as raw:
+        assert raw["target_ai_response.data"].nbytes < 2 * len(long_response.encode("utf-8"))
+    columns = load_npz_part(str(part))
+    assert columns["target_ai_response"][0] == long_response
+    assert columns["target_ai_response"][7] == "response 7"
+    assert list(columns["tenant"][:2]) == ["clinic-a", ""]
+
+
+def test_columnar_sink_can_skip_text(tmp_path):
+    """Text columns are optional."""
+    sink = ColumnarReportSink(str(tmp_path / "r.npz"), format="npz", include_text=False)
+    assert "target_ai_response" not in sink.columns
+    assert "relevance" in sink.columns
+
+
+def test_parquet_falls_back_without_pyarrow(tmp_path, monkeypatch):
+    """Requesting Parquet without pyarrow writes .npz parts instead."""
+    from eval_pipeline import sinks
+    monkeypatch.setattr(sinks, "HAS_PYARROW", False)
+    with warnings.catch_warnings(record=True):
+        warnings.simplefilter("always")
+        sink = ColumnarReportSink(str(tmp_path / "r.parquet"), format="parquet")
+    assert sink.format == "npz"
+
+
+def test_infer_format_from_extension():
+    """Output extension selects the sink."""
+    assert infer_format("out.jsonl") == "jsonl"
+    assert infer_format("out.parquet") == "parquet"
+    assert infer_format("out.json") == "json"
+
+
+def test_open_sink_jsonl(tmp_path):
+    """open_sink picks the sink class from the format."""
+    sink = open_sink(str(tmp_path / "out.jsonl"))
+    assert isinstance(sink, JsonlReportSink)
+    sink.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,99 @@
+"""
+Tests for the stage-tagged stack profiler.
+"""
+import time
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import aggregate, stack_profiler
+from eval_pipeline.aggregate import run_evaluation
+from eval_pipeline.schemas import Message, Conversation, ContextChunk, ContextData, EvalInput
+from eval_pipeline.stack_profiler import StackProfiler, profile_request, profile_stage
+
+
+def _make_input():
+    conv = Conversation(id="conv_1", messages=[
+        Message(role="user", content="Where is the clinic located?", id="msg_u1"),
+        Message(role="assistant", content="The clinic is located in Mumbai.", id="msg_a1"),
+    ])
+    chunks = [ContextChunk(text="The clinic is in Mumbai."), ContextChunk(text="Parking is free.")]
+    return EvalInput(conversation=conv, context=ContextData(entries={"msg_u1": chunks}))
+
+
+def slow_toxicity(text):
+    end = time.perf_counter() + 0.05
+    while time.perf_counter() < end:
+        pass
+    return 0.0
+
+
+@pytest.fixture
+def profiled(monkeypatch):
+    """Starts a process profiler for the test; stops it afterwards."""
+    monkeypatch.setattr(aggregate, "score_toxicity", slow_toxicity)
+
+    def start(**kwargs):
+        return stack_profiler.start_profiling(**kwargs)
+
+    yield start
+    stack_profiler.stop_profiling()
+
+
+def test_samples_are_tagged_by_stage(fake_models, profiled, tmp_path):
+    """Samples taken inside a metric carry its stage as the root frame."""
+    profiler = profiled(interval_ms=1.0)
+    with profile_request(), profile_stage("loading"):
+        data = _make_input()
+    for _ in range(3):
+        assert run_evaluation(data).status == "success"
+    stack_profiler.stop_profiling()
+
+    assert profiler.requests_seen == 4 and profiler.samples > 0
+    toxicity = [s for s in profiler.collapsed() if s.startswith("stage:toxicity;")]
+    assert any(s.endswith(";slow_toxicity (tests/test_stack_profiler.py:27)") for s in toxicity)
+    assert next(iter(profiler.stage_totals())) == "toxicity"
+
+    path = tmp_path / "profile.folded"
+    assert profiler.write(str(path)) == len(profiler.collapsed())
+    stack, count = path.read_text().splitlines()[0].rsplit(" ", 1)
+    assert stack.startswith("stage:") and int(count) > 0
+
+
+def test_fraction_limits_profiled_requests():
+    """Unsampled requests are counted but never tag or record anything."""
+    profiler = StackProfiler(fraction=0.0)
+    with profiler.request() as sampled:
+        with profiler.request() as nested, profiler.stage("relevance"):
+            assert not sampled and not nested
+    assert profiler.requests_seen == 1 and profiler.requests_profiled == 0
+    assert profiler.collapsed() == {}
+
+
+@pytest.mark.skipif(not stack_profiler.CPROFILE_PER_THREAD, reason="cProfile mode falls back to sampling")
+def test_cprofile_fallback_keeps_stage_tags(fake_models, profiled, tmp_path):
+    """cProfile mode attributes own time to caller -> callee pairs per stage."""
+    profiler = profiled(mode="cprofile")
+    run_evaluation(_make_input())
+    stack_profiler.stop_profiling()
+
+    stacks = profiler.collapsed()
+    assert any(s.startswith("stage:toxicity;") and s.endswith(";slow_toxicity (tests/test_stack_profiler.py:27)")
+               for s in stacks)
+    assert "targeting" in profiler.stage_totals()
+    profiler.write(str(tmp_path / "profile.folded"))
+    assert (tmp_path / "profile.folded.pstats").exists()
+
+
+def test_cprofile_mode_falls_back_where_threads_would_clash(monkeypatch):
+    """Without per-thread cProfile (Python 3.12+), cprofile mode samples instead."""
+    monkeypatch.setattr(stack_profiler, "CPROFILE_PER_THREAD", False)
+    with pytest.warns(UserWarning):
+        assert StackProfiler(mode="cprofile").mode == "sample"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
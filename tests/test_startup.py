@@ -0,0 +1,71 @@
+"""
+Tests for startup cost: lazy imports, warm-up and cold-start accounting.
+"""
+import pytest
+import subprocess
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import aggregate, profiling
+from eval_pipeline.aggregate import run_evaluation, warmup
+from eval_pipeline.schemas import Message, Conversation, ContextChunk, ContextData, EvalInput
+
+SRC = str(Path(__file__).parent.parent / "src")
+
+
+def _make_input():
+    conv = Conversation(id="conv_1", messages=[
+        Message(role="user", content="Where is the clinic located?", id="msg_u1"),
+        Message(role="assistant", content="The clinic is located in Mumbai.", id="msg_a1"),
+    ])
+    context = ContextData(entries={"msg_u1": [ContextChunk(text="The clinic is in Mumbai.")]})
+    return EvalInput(conversation=conv, context=context)
+
+
+def test_import_does_not_load_heavy_dependencies():
+    """Importing the pipeline must not import sentence_transformers or torch."""
+    code = (
+        "import sys; sys.path.insert(0, %r); "
+        "import eval_pipeline.aggregate; "
+        "heavy = [m for m in ('sentence_transformers', 'torch', 'transformers') if m in sys.modules]; "
+        "print(','.join(heavy))" % SRC
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ""
+
+
+def test_warmup_runs_dummy_batches(fake_models):
+    """warmup() touches every model and reports per-model timings."""
+    encoder, cross_encoder = fake_models
+    timings = warmup()
+    assert set(timings) == {"relevance", "groundedness"}
+    assert encoder.calls >= 1
+    assert cross_encoder.calls >= 1
+
+
+def test_cold_start_excluded_from_latency(fake_models, monkeypatch):
+    """Model load time recorded during a run is reported as cold_start_ms."""
+    loads = iter([0.0, 250.0])
+    monkeypatch.setattr(aggregate, "total_model_load_ms", lambda: next(loads))
+
+    report = run_evaluation(_make_input())
+
+    assert report.status == "success"
+    assert report.scores.cold_start_ms == pytest.approx(250.0)
+    assert report.scores.latency_ms >= 0.0
+
+
+def test_track_model_load_accumulates():
+    """track_model_load records time per model name."""
+    before = profiling.get_model_load_times().get("dummy-model", 0.0)
+    with profiling.track_model_load("dummy-model"):
+        pass
+    assert profiling.get_model_load_times()["dummy-model"] >= before
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,111 @@
+"""
+Tests for streaming score-distribution summaries.
+"""
+import pytest
+import sys
+import random
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline.aggregate import EvalReport, MetricScores
+from eval_pipeline.summary import KLLSketch, RunSummary
+
+
+def _report(chat_id, latency, toxicity=0.0, status="success"):
+    scores = None
+    if status == "success":
+        scores = MetricScores(relevance=0.8, completeness=0.7, groundedness=0.6,
+                              toxicity=toxicity, latency_ms=latency, estimated_cost=1e-6)
+    return EvalReport(status=status, chat_id=chat_id, target_user_message="q",
+                      target_ai_response="r", scores=scores)
+
+
+def test_kll_quantiles_are_accurate():
+    """Sketch quantiles stay within a small rank error of the exact values."""
+    rng = random.Random(7)
+    values = [rng.random() for _ in range(50000)]
+    sketch = KLLSketch(k=200, seed=1)
+    for v in values:
+        sketch.update(v)
+
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.99):
+        estimate = sketch.quantile(q)
+        rank = sum(1 for v in ordered if v <= estimate) / len(ordered)
+        assert abs(rank - q) < 0.02
+    assert sketch.count == 50000
+    assert sum(len(c) for c in sketch.compactors) < 2000
+
+
+def test_kll_merge_matches_single_stream():
+    """Merging shard sketches approximates a sketch of the combined stream."""
+    a, b = KLLSketch(seed=1), KLLSketch(seed=2)
+    for i in range(10000):
+        (a if i % 2 else b).update(float(i))
+    a.merge(b)
+    assert a.count == 10000
+    assert a.min == 0.0 and a.max == 9999.0
+    assert abs(a.quantile(0.5) - 5000) < 300
+
+
+def test_kll_round_trips_through_dict():
+    """Serialized sketches answer the same queries."""
+    sketch = KLLSketch(seed=3)
+    for i in range(5000):
+        sketch.update(float(i))
+    restored = KLLSketch.from_dict(sketch.to_dict())
+    assert restored.quantile(0.9) == sketch.quantile(0.9)
+    restored.update(1.0)
+    assert restored.count == 5001
+
+
+def test_run_summary_counts_and_cohorts():
+    """Status counts, toxicity rate and per-chat cohorts are tracked."""
+    summary = RunSummary(cohort_key="chat_id")
+    summary.update(_report("a", 100.0))
+    summary.update(_report("a", 200.0, toxicity=1.0))
+    summary.update(_report("b", 300.0))
+    summary.update(_report("b", 0.0, status="skipped"))
+
+    overall = summary.overall.describe()
+    assert overall["reports"] == 4
+    assert overall["status_counts"] == {"success": 3, "skipped": 1}
+    assert overall["toxicity_rate"] == pytest.approx(1 / 3)
+    assert overall["metrics"]["latency_ms"]["max"] == 300.0
+    assert set(summary.cohorts) == {"a", "b"}
+    assert summary.cohorts["a"].metrics["latency_ms"].count == 2
+
+
+def test_run_summary_merge_and_serialize():
+    """Worker summaries merge and survive JSON round trips."""
+    left, right = RunSummary(cohort_key="chat_id"), RunSummary(cohort_key="chat_id")
+    for i in range(100):
+        left.update(_report("a", float(i)))
+        right.update(_report("b", float(100 + i)))
+
+    merged = RunSummary.from_json(left.to_json()).merge(RunSummary.from_json(right.to_json()))
+
+    overall = merged.overall.describe()
+    assert overall["reports"] == 200
+    assert overall["metrics"]["latency_ms"]["min"] == 0.0
+    assert overall["metrics"]["latency_ms"]["max"] == 199.0
+    assert abs(overall["metrics"]["latency_ms"]["p99"] - 197) <= 2
+    assert set(merged.cohorts) == {"a", "b"}
+    assert merged.cohort_by == "chat_id"
+
+
+def test_cohorts_are_opt_in():
+    """By default only the overall summary is kept, so memory does not grow with chats."""
+    summary = RunSummary()
+    for i in range(50):
+        summary.update(_report(f"chat_{i}", float(i)))
+    assert summary.cohorts == {} and summary.overall.reports == 50
+    assert RunSummary.from_json(summary.to_json()).cohort_key is None
+    with pytest.raises(ValueError):
+        RunSummary(cohort_key="record_id")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
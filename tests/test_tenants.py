@@ -0,0 +1,152 @@
+"""
+Tests for the shared model registry and per-tenant configuration.
+"""
+import json
+import os
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from eval_pipeline import models, tenants
+from eval_pipeline.aggregate import run_evaluation
+from eval_pipeline.models import ModelKey, ModelRegistry
+from eval_pipeline.schemas import Message, Conversation, ContextChunk, ContextData, EvalInput
+from eval_pipeline.tenants import TenantConfig, TenantDirectory
+from tests.conftest import FakeEncoder
+
+
+class _Weights:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+    def numel(self):
+        return self.nbytes
+
+    def element_size(self):
+        return 1
+
+
+class SizedModel:
+    """Stands in for a torch model holding `nbytes` of parameters."""
+
+    def __init__(self, name, nbytes=100):
+        self.name = name
+        self._weights = [_Weights(nbytes)]
+
+    def parameters(self):
+        return self._weights
+
+
+class SizedEncoder(FakeEncoder):
+    def parameters(self):
+        return [_Weights(100)]
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A fresh process registry with a fake backend that counts loads."""
+    loaded = []
+    monkeypatch.setitem(models._backends, "fake", lambda name: loaded.append(name) or SizedModel(name))
+    monkeypatch.setitem(models._backends, "fake-encoder", lambda name: loaded.append(name) or SizedEncoder())
+    fresh = ModelRegistry()
+    monkeypatch.setattr(models, "_registry", fresh)
+    fresh.loaded_names = loaded
+    return fresh
+
+
+def _make_input(tenant=None):
+    conv = Conversation(id="conv_1", messages=[
+        Message(role="user", content="Where is the clinic located?", id="msg_u1"),
+        Message(role="assistant", content="The clinic is located in Mumbai.", id="msg_a1"),
+    ])
+    chunks = [ContextChunk(text="The clinic is in Mumbai."), ContextChunk(text="Parking is free.")]
+    return EvalInput(conversation=conv, context=ContextData(entries={"msg_u1": chunks}), tenant=tenant)
+
+
+def test_tenants_share_one_instance_per_key(registry):
+    """Same (name, backend, precision) loads once; a different precision is another model."""
+    key = ModelKey("m", "fake")
+    with models.use_models({"relevance": key}) as a, models.use_models({"relevance": key}) as b:
+        assert a.model("relevance") is b.model("relevance")
+        assert registry.refs(key) == 2
+    assert registry.refs(key) == 0
+    assert registry.loaded_names == ["m"]
+
+    with pytest.raises(ValueError):
+        registry.get(ModelKey("m", "fake", "fp8"))
+    assert registry.loads == 1 and registry.hits == 1
+
+
+def test_idle_models_unloaded_lru_first(registry):
+    """Over the byte limit, the least recently used idle model goes; models in use stay."""
+    registry.max_bytes = 250
+    a, b, c = ModelKey("a", "fake"), ModelKey("b", "fake"), ModelKey("c", "fake")
+    registry.acquire(a)  # In use throughout
+    registry.get(b)
+    registry.get(c)  # 300 bytes: b is the only idle model besides the new one
+    assert registry.loaded() == [a, c]
+    assert registry.unloads == 1
+
+    registry.release(a)
+    assert registry.shrink_bytes(1) == 100  # The memory budget can now reclaim a
+    assert registry.loaded() == [c]
+
+
+def test_tenant_file_hot_reload(tmp_path):
+    """Edits apply without a restart; a broken edit keeps the last good tenants."""
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps({"tenants": {"clinic-a": {"groundedness_threshold": 0.7}}}))
+    directory = TenantDirectory(str(path))
+    assert directory.get("clinic-a").groundedness_threshold == 0.7
+    assert directory.get("unknown").groundedness_threshold == TenantConfig.from_config().groundedness_threshold
+
+    def rewrite(text, bump):
+        path.write_text(text)
+        stat = path.stat()
+        os.utime(path, (stat.st_atime, stat.st_mtime + bump))
+
+    rewrite(json.dumps({"clinic-a": {"groundedness_threshold": 0.9}}), 10)
+    assert directory.get("clinic-a").groundedness_threshold == 0.9
+    rewrite("{not json", 20)
+    assert directory.get("clinic-a").groundedness_threshold == 0.9
+    assert directory.error and directory.reloads == 2
+
+
+def test_verdicts_follow_tenant_thresholds(fake_models, monkeypatch):
+    """The same scores pass for one tenant and fail for a stricter one."""
+    directory = TenantDirectory()
+    directory.set(TenantConfig.from_config("strict", groundedness_threshold=1.01, toxicity_threshold=-1.0))
+    monkeypatch.setattr(tenants, "_directory", directory)
+
+    default = run_evaluation(_make_input())
+    strict = run_evaluation(_make_input("strict"))
+    assert default.tenant is None and strict.tenant == "strict"
+    assert default.scores.groundedness == strict.scores.groundedness
+    assert default.verdicts["groundedness"] and not strict.verdicts["groundedness"]
+    assert default.verdicts["toxicity"] and not strict.verdicts["toxicity"]
+
+
+def test_tenant_model_is_scoped_and_cached_apart(fake_models, registry, monkeypatch):
+    """A tenant's encoder serves only its evaluations, and its embeddings are cached separately."""
+    encoder, _ = fake_models
+    directory = TenantDirectory()
+    directory.set(TenantConfig.from_config("mpnet", relevance_model="mpnet", relevance_backend="fake-encoder"))
+    monkeypatch.setattr(tenants, "_directory", directory)
+
+    report = run_evaluation(_make_input("mpnet"))
+    assert report.status == "success"
+    assert encoder.texts_encoded == 0
+    key = ModelKey("mpnet", "fake-encoder")
+    assert registry.loaded() == [key] and registry.refs(key) == 0
+
+    run_evaluation(_make_input())
+    assert encoder.texts_encoded > 0  # Nothing reused from the tenant's embeddings
+    run_evaluation(_make_input("mpnet"))
+    assert registry.loads == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])